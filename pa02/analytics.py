@@ -0,0 +1,122 @@
+'''
+analytics.py loads transactions into NumPy arrays for vectorized analysis
+
+to_columns returns a dict of contiguous arrays, one entry per row:
+
+    {'rowid': int64, 'item_num': float64, 'amount': float64,
+     'category': int32 codes into 'categories', 'date': datetime64[D]}
+
+'categories' is the sorted list of category names, so the name of row i
+is columns['categories'][columns['category'][i]].  Rows without a
+readable date get NaT.
+
+NumPy is optional for the rest of the app, it is only imported here.
+
+'''
+from transaction import CATEGORY, to_filter
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+CHUNK_SIZE = 65536
+
+# the int64 value NumPy uses for NaT
+NAT = -2**63
+
+
+def require_numpy():
+    ''' raise ImportError if NumPy is not installed '''
+    if np is None:
+        raise ImportError('analytics needs NumPy, install it with "pip install numpy"')
+
+
+def to_columns(transaction, start=None, end=None, category=None, chunk_size=CHUNK_SIZE):
+    ''' return the transactions as a dict of NumPy arrays, optionally only
+        those between the MM-DD-YYYY dates start and end or in one category
+    '''
+    require_numpy()
+    where, params = to_filter(start, end, category)
+    with transaction.pool.connection(private=True) as con:
+        # sqlite3 does not begin a transaction for a SELECT, so without this
+        # each statement would see the table as it is when it runs, and a
+        # row added after the count would not fit in the arrays.  a caller
+        # that is already in a transaction is read in it
+        if not con.in_transaction:
+            con.execute("BEGIN")
+        count = con.execute("SELECT count(*) FROM transactions "+where, params).fetchone()[0]
+        categories = [row[0] for row in con.execute(
+            "SELECT DISTINCT "+CATEGORY+" FROM transactions "+where+" ORDER BY 1", params)]
+        codes = {name: code for code, name in enumerate(categories)}
+        columns = {'rowid': np.empty(count, dtype=np.int64),
+                   'item_num': np.empty(count, dtype=np.float64),
+                   'amount': np.empty(count, dtype=np.float64),
+                   'category': np.empty(count, dtype=np.int32),
+                   'date': np.empty(count, dtype='datetime64[D]')}
+        # dates arrive as days since 1970-01-01, which is what datetime64[D] stores
+        cur = con.execute('''SELECT rowid, item_num, amount, '''+CATEGORY+''',
+                                    ifnull(CAST(julianday(iso_date) - 2440587.5 AS INTEGER), ?)
+                             FROM transactions '''+where, (NAT,)+params)
+        filled = 0
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            rowids, item_nums, amounts, names, dates = zip(*rows)
+            end_row = filled + len(rows)
+            columns['rowid'][filled:end_row] = rowids
+            columns['item_num'][filled:end_row] = item_nums
+            columns['amount'][filled:end_row] = amounts
+            columns['category'][filled:end_row] = [codes[name] for name in names]
+            columns['date'][filled:end_row] = np.array(dates, dtype=np.int64).view(
+                'datetime64[D]')
+            filled = end_row
+    for name in ('rowid', 'item_num', 'amount', 'category', 'date'):
+        columns[name] = columns[name][:filled]
+    columns['categories'] = categories
+    return columns
+
+
+def group_sum(codes, values, groups):
+    ''' return the sum of values for each integer code in range(groups) '''
+    require_numpy()
+    return np.bincount(codes, weights=values, minlength=groups)
+
+
+def sum_by_category(columns):
+    ''' return {category name: total amount} '''
+    totals = group_sum(columns['category'], columns['amount'], len(columns['categories']))
+    return dict(zip(columns['categories'], totals.tolist()))
+
+
+def monthly_spend(columns):
+    ''' return (months, totals) where months is every month from the first
+        to the last dated transaction as datetime64[M] and totals is the
+        amount spent in each '''
+    require_numpy()
+    dated = ~np.isnat(columns['date'])
+    months = columns['date'][dated].astype('datetime64[M]')
+    if len(months) == 0:
+        return np.array([], dtype='datetime64[M]'), np.array([], dtype=np.float64)
+    first = months.min()
+    offsets = (months - first).astype(np.int64)
+    totals = np.bincount(offsets, weights=columns['amount'][dated])
+    return first + np.arange(len(totals)), totals
+
+
+def rolling_monthly_spend(columns, window=3):
+    ''' return (months, totals) where each total is the amount spent in that
+        month and the window-1 months before it '''
+    months, totals = monthly_spend(columns)
+    sums = np.cumsum(totals)
+    sums[window:] = sums[window:] - sums[:-window]
+    return months, sums
+
+
+def percentiles(values, q=(50, 90, 99)):
+    ''' return {percentile: value} for the array of values '''
+    require_numpy()
+    if len(values) == 0:
+        return {p: None for p in q}
+    return dict(zip(q, np.percentile(values, q).tolist()))
@@ -0,0 +1,179 @@
+'''
+async_orm.py wraps the Transaction and Category ORMs for asyncio code
+
+AsyncTransaction and AsyncCategory have the same methods as the classes
+they wrap, as coroutines.  Every database call runs on one dedicated
+thread so the event loop never waits on sqlite3.
+
+Calls to add() are not written one by one.  They are queued, and the
+queue is written with add_many in a single commit, so the inserts of
+many coroutines share one commit.  While one batch is being written the
+next one collects, so the busier the service the bigger the batches.  A
+batch that fails is added again a row at a time, so only the coroutines
+whose rows fail on their own get the exception.
+
+    async with AsyncTransaction('tracker.db') as trans:
+        rowids = await asyncio.gather(*(trans.add(t) for t in transactions))
+
+'''
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from category import Category
+from transaction import Transaction, to_trans_row
+
+MAX_BATCH = 1000
+
+
+class AsyncORM():
+    ''' AsyncORM runs the methods of a synchronous ORM on a database thread
+        and batches its adds.  batches counts the add_many calls made.
+    '''
+
+    def __init__(self, orm, max_batch=MAX_BATCH):
+        self.orm = orm
+        self.max_batch = max_batch
+        self.batches = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tracker-db')
+        self._pending = []
+        self._flushing = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _run(self, func, *args):
+        ''' call func(*args) on the database thread '''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    def _check(self, item):
+        ''' return the INSERT parameters for item, so a missing column
+            raises KeyError in the caller rather than failing a batch '''
+        return item
+
+    async def add(self, item):
+        ''' queue item to be added and return its rowid once it is committed '''
+        self._check(item)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if self._flushing is None:
+            self._flushing = asyncio.ensure_future(self._flush())
+        return await future
+
+    async def _flush(self):
+        ''' write the queued adds, max_batch at a time, until the queue is empty '''
+        try:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                await self._write(batch)
+        finally:
+            self._flushing = None
+
+    async def _write(self, batch):
+        ''' add a batch in one commit and resolve its futures.  add_many
+            rolls back a batch that fails, its rows are then written one by
+            one so that only the coroutine of a bad row gets the exception '''
+        self.batches += 1
+        try:
+            first, _ = await self._run(self.orm.add_many, [item for item, _ in batch])
+        except Exception as error:  # pylint: disable=broad-except
+            if len(batch) > 1:
+                for entry in batch:
+                    await self._write([entry])
+            elif not batch[0][1].done():
+                batch[0][1].set_exception(error)
+            return
+        for offset, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(first + offset)
+
+    async def flush(self):
+        ''' wait until every queued add is committed '''
+        while self._flushing is not None:
+            await asyncio.shield(self._flushing)
+
+    async def add_many(self, items):
+        ''' add an iterable of items in one commit, see the synchronous add_many '''
+        return await self._run(self.orm.add_many, list(items))
+
+    async def delete(self, rowid):
+        ''' delete the row with a specified rowid '''
+        return await self._run(self.orm.delete, rowid)
+
+    async def select_all(self):
+        ''' return all of the rows '''
+        return await self._run(self.orm.select_all)
+
+    async def close(self):
+        ''' write any queued adds, then stop the database thread and close the ORM '''
+        await self.flush()
+        await self._run(self.orm.close)
+        self.executor.shutdown(wait=False)
+
+
+class AsyncTransaction(AsyncORM):
+    ''' AsyncTransaction is the asyncio version of Transaction.
+        the keyword arguments are passed on to Transaction
+    '''
+
+    def __init__(self, dbfile, max_batch=MAX_BATCH, **kwargs):
+        super().__init__(Transaction(dbfile, **kwargs), max_batch)
+
+    def _check(self, item):
+        return to_trans_row(item)
+
+    async def summarize_by_date(self, date):
+        ''' return a list of transactions on a date '''
+        return await self._run(self.orm.summarize_by_date, date)
+
+    async def summarize_by_month(self, month):
+        ''' return a list of transactions in a month '''
+        return await self._run(self.orm.summarize_by_month, month)
+
+    async def summarize_by_year(self, year):
+        ''' return a list of transactions in a year '''
+        return await self._run(self.orm.summarize_by_year, year)
+
+    async def summarize_by_category(self, category):
+        ''' return a list of transactions in a category '''
+        return await self._run(self.orm.summarize_by_category, category)
+
+    async def totals_by_month(self, year):
+        ''' return (month, count, sum, avg, min, max) for each month of a year '''
+        return await self._run(self.orm.totals_by_month, year)
+
+    async def totals_by_year(self):
+        ''' return (year, count, sum, avg, min, max) for each year '''
+        return await self._run(self.orm.totals_by_year)
+
+    async def totals_by_category(self, start=None, end=None):
+        ''' return (category, count, sum, avg, min, max) for each category '''
+        return await self._run(self.orm.totals_by_category, start, end)
+
+    async def daily_totals(self, start, end):
+        ''' return (date, count, sum, avg, min, max) for each day '''
+        return await self._run(self.orm.daily_totals, start, end)
+
+
+class AsyncCategory(AsyncORM):
+    ''' AsyncCategory is the asyncio version of Category.
+        the keyword arguments are passed on to Category
+    '''
+
+    def __init__(self, dbfile, max_batch=MAX_BATCH, **kwargs):
+        super().__init__(Category(dbfile, **kwargs), max_batch)
+
+    def _check(self, item):
+        return (item['name'], item['desc'])
+
+    async def select_one(self, rowid):
+        ''' return the category with a specified rowid '''
+        return await self._run(self.orm.select_one, rowid)
+
+    async def update(self, rowid, item):
+        ''' change the name and description of a category '''
+        return await self._run(self.orm.update, rowid, item)
@@ -0,0 +1,6 @@
+'''
+benchmarks for the tracker ORMs
+
+Run them from the pa02 directory as modules, e.g.
+    python -m benchmarks.bench_pool
+'''
@@ -0,0 +1,75 @@
+'''
+bench_analytics compares summing amount by category with a Python loop
+over select_all() dicts against the NumPy helpers in analytics
+
+The NumPy side is also timed on synthetic arrays of --array-rows rows,
+which is bigger than is practical to load through SQLite here.
+
+    python -m benchmarks.bench_analytics --rows 1000000 --array-rows 10000000
+'''
+import argparse
+import time
+import numpy as np
+import analytics
+from transaction import Transaction
+from benchmarks.common import CATEGORIES, make_transactions, temp_dbfile
+
+
+def timed(func):
+    ''' return (result, ms) for func() '''
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def python_sum_by_category(rows):
+    ''' sum amount by category in a Python loop '''
+    totals = {}
+    for row in rows:
+        totals[row['category']] = totals.get(row['category'], 0) + row['amount']
+    return totals
+
+
+def synthetic_columns(count, seed=0):
+    ''' return random columns shaped like analytics.to_columns '''
+    rng = np.random.default_rng(seed)
+    return {'amount': rng.lognormal(3, 1, count),
+            'category': rng.integers(0, len(CATEGORIES), count, dtype=np.int32),
+            'date': np.datetime64('2015-01-01') + rng.integers(0, 3650, count),
+            'categories': sorted(CATEGORIES)}
+
+
+def main():
+    ''' print the time of each way of aggregating '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--array-rows', type=int, default=10000000)
+    args = parser.parse_args()
+
+    print("%-40s %10s" % ('step', 'ms'))
+    print('-'*52)
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile) as trans:
+            trans.add_many(make_transactions(args.rows))
+            rows, load_ms = timed(trans.select_all)
+            print("%-40s %10.1f" % ('select_all (%d rows)' % args.rows, load_ms))
+            print("%-40s %10.1f" % ('Python loop sum by category',
+                                    timed(lambda: python_sum_by_category(rows))[1]))
+            del rows
+            columns, load_ms = timed(trans.to_columns)
+            print("%-40s %10.1f" % ('to_columns (%d rows)' % args.rows, load_ms))
+            print("%-40s %10.1f" % ('sum_by_category',
+                                    timed(lambda: analytics.sum_by_category(columns))[1]))
+
+    columns = synthetic_columns(args.array_rows)
+    label = ' (%d rows)' % args.array_rows
+    print("%-40s %10.1f" % ('sum_by_category'+label,
+                            timed(lambda: analytics.sum_by_category(columns))[1]))
+    print("%-40s %10.1f" % ('rolling_monthly_spend'+label,
+                            timed(lambda: analytics.rolling_monthly_spend(columns))[1]))
+    print("%-40s %10.1f" % ('percentiles'+label,
+                            timed(lambda: analytics.percentiles(columns['amount']))[1]))
+
+
+if __name__ == '__main__':
+    main()
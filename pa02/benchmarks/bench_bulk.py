@@ -0,0 +1,41 @@
+'''
+bench_bulk times loading transactions with add() against add_many()
+
+add() commits every row, so it is timed on a sample and extrapolated.
+
+    python -m benchmarks.bench_bulk --rows 1000000
+'''
+import argparse
+import time
+from transaction import Transaction
+from benchmarks.common import make_transactions, temp_dbfile, ops_per_sec
+
+
+def main():
+    ''' print rows/sec for add and add_many '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--sample', type=int, default=2000,
+                        help='rows to load one at a time with add()')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile) as trans:
+            items = make_transactions(args.sample)
+            add_rate = ops_per_sec(lambda: trans.add(next(items)), args.sample)
+
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile) as trans:
+            start = time.perf_counter()
+            trans.add_many(make_transactions(args.rows), batch_size=args.batch_size)
+            elapsed = time.perf_counter() - start
+
+    print("%-10s %12s %14s" % ('method', 'rows/sec', 'time for rows'))
+    print('-'*38)
+    print("%-10s %12.0f %13.1fs" % ('add', add_rate, args.rows / add_rate))
+    print("%-10s %12.0f %13.1fs" % ('add_many', args.rows / elapsed, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+'''
+bench_delete times removing a bad import with delete() against
+delete_many() and delete_where(), and the longest the write lock is held
+
+delete() commits every row, so it is timed on a sample and extrapolated.
+
+    python -m benchmarks.bench_delete --rows 100000
+'''
+import argparse
+import time
+from contextlib import contextmanager
+from transaction import Transaction
+from benchmarks.common import make_transactions, temp_dbfile
+
+
+def timed_batches(trans):
+    ''' make the pool of trans record how long each outermost connection,
+        a database transaction, was held, and return the list of times '''
+    held = []
+    connection = trans.pool.connection
+
+    @contextmanager
+    def timed_connection(private=False):
+        outer = private or trans.pool.held() is None
+        start = time.perf_counter()
+        with connection(private) as con:
+            yield con
+        if outer:
+            held.append(time.perf_counter() - start)
+
+    trans.pool.connection = timed_connection
+    return held
+
+
+def main():
+    ''' print rows/sec and the longest lock hold for each way of deleting '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--sample', type=int, default=2000,
+                        help='rows to delete one at a time with delete()')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    print("%-14s %12s %14s %14s" % ('method', 'rows/sec', 'time for rows', 'longest ms'))
+    print('-'*57)
+    for method in ('delete', 'delete_many', 'delete_where'):
+        with temp_dbfile() as dbfile:
+            with Transaction(dbfile) as trans:
+                trans.add_many(make_transactions(args.rows))
+                held = timed_batches(trans)
+                count = args.sample if method == 'delete' else args.rows
+                start = time.perf_counter()
+                if method == 'delete':
+                    for rowid in range(1, count + 1):
+                        trans.delete(rowid)
+                elif method == 'delete_many':
+                    trans.delete_many(range(1, count + 1), args.batch_size)
+                else:
+                    trans.delete_where(trans.query(), args.batch_size)
+                rate = count / (time.perf_counter() - start)
+        print("%-14s %12.0f %13.1fs %14.2f" % (method, rate, args.rows / rate,
+                                               max(held) * 1000))
+
+
+if __name__ == '__main__':
+    main()
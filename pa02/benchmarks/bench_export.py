@@ -0,0 +1,53 @@
+'''
+bench_export builds a synthetic database and times exporting it in each
+format, reporting rows/sec, MB/s written and the peak memory of the process
+
+    python -m benchmarks.bench_export --rows 1000000 --formats csv jsonl binary
+'''
+import argparse
+import os
+import resource
+import time
+import exporter
+from transaction import Transaction
+from benchmarks.common import make_transactions, temp_dbfile
+
+# (format, file name)
+TARGETS = {'csv': 'out.csv', 'csv.gz': 'out.csv.gz', 'jsonl': 'out.jsonl',
+           'binary': 'out.trx', 'binary.gz': 'out.trx.gz',
+           'parquet': 'out.parquet', 'arrow': 'out.arrow'}
+
+
+def main():
+    ''' print the export rate for each format '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--formats', nargs='+', choices=sorted(TARGETS),
+                        default=['csv', 'csv.gz', 'jsonl', 'binary', 'parquet'])
+    parser.add_argument('--chunk-size', type=int, default=exporter.CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile, profile='fast') as trans:
+            trans.add_many(make_transactions(args.rows))
+            print('%d rows' % args.rows)
+            print("%-10s %12s %10s %10s %14s" % ('format', 'rows/sec', 'MB', 'MB/s',
+                                                'peak RSS MB'))
+            print('-'*60)
+            for name in args.formats:
+                if name in ('parquet', 'arrow') and exporter.pyarrow is None:
+                    print('%-10s skipped, pyarrow is not installed' % name)
+                    continue
+                path = os.path.join(os.path.dirname(dbfile), TARGETS[name])
+                start = time.perf_counter()
+                exporter.export(trans, path, chunk_size=args.chunk_size)
+                elapsed = time.perf_counter() - start
+                size = os.path.getsize(path) / 2**20
+                peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                print("%-10s %12.0f %10.1f %10.1f %14.0f" % (name, args.rows / elapsed, size,
+                                                             size / elapsed, peak))
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+'''
+bench_group_commit compares threads calling add() directly against the
+same threads in group commit mode
+
+    python -m benchmarks.bench_group_commit --threads 64 --adds 50 --profile durable
+'''
+import argparse
+import random
+import threading
+import time
+from transaction import Transaction
+from benchmarks.common import make_transaction, temp_dbfile
+
+
+def run(args, group):
+    ''' return (adds/sec, commits/sec) for one mode '''
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile, profile=args.profile) as trans:
+            if group:
+                trans.enable_group_commit(args.max_rows, args.max_delay_ms)
+
+            def worker(seed):
+                rng = random.Random(seed)
+                for _ in range(args.adds):
+                    trans.add(make_transaction(rng))
+
+            threads = [threading.Thread(target=worker, args=(seed,))
+                       for seed in range(args.threads)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            total = args.threads * args.adds
+            commits = trans.writer.batches if group else total
+    return total / elapsed, commits / elapsed
+
+
+def main():
+    ''' print adds/sec and commits/sec with and without group commit '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--adds', type=int, default=50, help='adds per thread')
+    parser.add_argument('--max-rows', type=int, default=500)
+    parser.add_argument('--max-delay-ms', type=float, default=5)
+    parser.add_argument('--profile', default='durable')
+    args = parser.parse_args()
+
+    print("%-14s %12s %14s" % ('mode', 'adds/sec', 'commits/sec'))
+    print('-'*42)
+    for label, group in (('add', False), ('group commit', True)):
+        print("%-14s %12.0f %14.0f" % ((label,) + run(args, group)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+'''
+bench_import writes a synthetic CSV statement and times importing it,
+reporting rows/sec and the peak memory of the importing process
+
+    python -m benchmarks.bench_import --rows 1000000 --workers 0 2 4
+'''
+import argparse
+import csv
+import os
+import resource
+import time
+import importer
+from transaction import Transaction
+from benchmarks.common import make_transactions, temp_dbfile
+
+
+def write_statement(path, rows):
+    ''' write rows synthetic transactions as a bank style CSV '''
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        writer.writerow(['Posted Date', 'Payee', 'Amount', 'Category'])
+        for item in make_transactions(rows):
+            month, day, year = item['date'].split('-')
+            writer.writerow(['%s-%s-%s' % (year, month, day), item['description'],
+                             item['amount'], item['category']])
+
+
+def main():
+    ''' print the import rate for each worker count '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2])
+    parser.add_argument('--chunk-size', type=int, default=importer.CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with temp_dbfile('statement.csv') as statement:
+        write_statement(statement, args.rows)
+        size = os.path.getsize(statement) / 2**20
+        print('%d rows, %.0f MB statement' % (args.rows, size))
+        print("%8s %12s %10s %14s" % ('workers', 'rows/sec', 'seconds', 'peak RSS MB'))
+        print('-'*47)
+        for workers in args.workers:
+            with temp_dbfile() as dbfile:
+                with Transaction(dbfile, profile='fast') as trans:
+                    start = time.perf_counter()
+                    importer.import_statements(trans, [statement], workers, args.chunk_size)
+                    elapsed = time.perf_counter() - start
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print("%8d %12.0f %10.1f %14.0f" % (workers, args.rows / elapsed, elapsed, peak))
+
+
+if __name__ == '__main__':
+    main()
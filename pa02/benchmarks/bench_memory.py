@@ -0,0 +1,55 @@
+'''
+bench_memory compares the SQLite and in-memory storage engines
+
+    python -m benchmarks.bench_memory --rows 100000
+'''
+import argparse
+import os
+import time
+from engines import ENGINES, open_category, open_transaction
+from benchmarks.common import make_transactions, temp_dbfile
+from benchmarks.bench_summarize import best_of
+
+
+def main():
+    ''' print the time of each operation on each engine '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        opened = {}
+        for engine in ENGINES:
+            path = dbfile if engine == 'sqlite' else dbfile+'.snapshot'
+            trans = open_transaction(path, engine)
+            start = time.perf_counter()
+            trans.add_many(make_transactions(args.rows))
+            print('%-7s add_many %8.0f rows/s' % (
+                engine, args.rows / (time.perf_counter() - start)))
+            opened[engine] = (trans, open_category(path, engine))
+        queries = {
+            'select_one category': lambda trans, cats: cats.select_one(3),
+            'summarize_by_date': lambda trans, cats: trans.summarize_by_date('06-15-2020'),
+            'summarize_by_month': lambda trans, cats: trans.summarize_by_month('06'),
+            'summarize_by_category': lambda trans, cats: trans.summarize_by_category('rent'),
+            'select_page by date': lambda trans, cats: trans.select_page(20, order='date'),
+            'totals_by_category': lambda trans, cats: trans.totals_by_category(),
+            'select_all': lambda trans, cats: trans.select_all(),
+        }
+        print()
+        print('%-22s %10s %10s' % ('query', 'sqlite ms', 'memory ms'))
+        print('-'*44)
+        for name, query in queries.items():
+            print('%-22s %10.3f %10.3f' % (name, *(
+                best_of(lambda engine=engine: query(*opened[engine]), args.repeat)
+                for engine in ENGINES)))
+        for trans, _ in opened.values():
+            trans.close()
+        print()
+        print('snapshot %.1f MB, database %.1f MB' % (
+            os.path.getsize(dbfile+'.snapshot') / 2**20, os.path.getsize(dbfile) / 2**20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+'''
+bench_page compares fetching deep pages with OFFSET against the keyset
+cursors of select_page, for each page order
+
+    python -m benchmarks.bench_page --rows 1000000 --pages 1 100 10000
+'''
+import argparse
+from transaction import COLUMNS, ORDERS, Transaction
+from benchmarks.common import make_transactions, temp_dbfile
+from benchmarks.bench_summarize import best_of
+
+
+def offset_page(trans, order, page, limit):
+    ''' fetch a page the usual way, skipping the rows before it '''
+    with trans.pool.connection() as con:
+        return con.execute("SELECT "+COLUMNS+" FROM transactions ORDER BY "+
+                           ', '.join(ORDERS[order])+" LIMIT ? OFFSET ?",
+                           (limit, page * limit)).fetchall()
+
+
+def main():
+    ''' print the time to fetch each page both ways '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 100, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile) as trans:
+            trans.add_many(make_transactions(args.rows))
+            print("%-8s %8s %12s %12s" % ('order', 'page', 'offset ms', 'keyset ms'))
+            print('-'*43)
+            for order in ORDERS:
+                for page in args.pages:
+                    # the cursor is the last row of the page before, as a reader would have it
+                    before = offset_page(trans, order, page - 1, args.limit) if page else []
+                    after_rowid = before[-1][0] if before else None
+                    offset = best_of(lambda: offset_page(trans, order, page, args.limit),
+                                     args.repeat)
+                    keyset = best_of(lambda: trans.select_page(args.limit, after_rowid, order),
+                                     args.repeat)
+                    print("%-8s %8d %12.3f %12.3f" % (order, page, offset, keyset))
+
+
+if __name__ == '__main__':
+    main()
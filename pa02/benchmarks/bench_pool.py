@@ -0,0 +1,45 @@
+'''
+bench_pool compares connect-per-call against the pooled connections
+
+A pool of size 0 closes every connection after use, which is what the
+ORMs did before they shared a ConnectionPool.
+
+    python -m benchmarks.bench_pool --adds 2000 --selects 500
+'''
+import argparse
+from connection import ConnectionPool
+from transaction import Transaction
+from benchmarks.common import make_transactions, temp_dbfile, ops_per_sec
+
+
+def run(pool_size, adds, selects, rows):
+    ''' return (add ops/sec, select_all ops/sec) for one pool size '''
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile, pool=ConnectionPool(dbfile, size=pool_size)) as trans:
+            items = make_transactions(adds)
+            add_rate = ops_per_sec(lambda: trans.add(next(items)), adds)
+            for rowid in range(rows + 1, adds + 1):
+                trans.delete(rowid)
+            select_rate = ops_per_sec(trans.select_all, selects)
+    return add_rate, select_rate
+
+
+def main():
+    ''' print ops/sec for add and select_all with and without pooling '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--adds', type=int, default=2000)
+    parser.add_argument('--selects', type=int, default=500)
+    parser.add_argument('--rows', type=int, default=100,
+                        help='table size for the select_all runs')
+    parser.add_argument('--pool-size', type=int, default=4)
+    args = parser.parse_args()
+
+    print("%-22s %14s %18s" % ('mode', 'add ops/sec', 'select_all ops/sec'))
+    print('-'*56)
+    for label, size in (('connect per call', 0), ('pooled', args.pool_size)):
+        add_rate, select_rate = run(size, args.adds, args.selects, args.rows)
+        print("%-22s %14.0f %18.0f" % (label, add_rate, select_rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+'''
+bench_profile measures what profiling adds to small and large ORM calls,
+and prints the profile of the large ones
+
+    python -m benchmarks.bench_profile --rows 100000
+'''
+import argparse
+from transaction import Transaction
+from benchmarks.common import make_transactions, temp_dbfile
+from benchmarks.bench_summarize import best_of
+
+
+def main():
+    ''' print the time of each call with profiling off and on '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile) as trans:
+            trans.add_many(make_transactions(args.rows))
+            calls = {
+                'select_page': lambda: trans.select_page(20, args.rows // 2),
+                'summarize_by_date': lambda: trans.summarize_by_date('03-01-2020'),
+                'totals_by_month': lambda: trans.totals_by_month('2020'),
+                'select_all': lambda: trans.select_all(),  # pylint: disable=unnecessary-lambda
+                'iter_all': lambda: sum(1 for _ in trans.iter_all()),
+            }
+            print("%-20s %12s %12s %10s" % ('call', 'off ms', 'on ms', 'overhead'))
+            print('-'*57)
+            off = {name: best_of(call, args.repeat) for name, call in calls.items()}
+            profiler = trans.enable_profiling(slow_ms=1000)
+            for name, call in calls.items():
+                # the lambdas look the methods up again and get the profiled ones
+                on = best_of(call, args.repeat)
+                print("%-20s %12.3f %12.3f %9.0f%%" % (name, off[name], on,
+                                                        100 * (on - off[name]) / off[name]))
+            print()
+            print(profiler.report(statements=5))
+
+
+if __name__ == '__main__':
+    main()
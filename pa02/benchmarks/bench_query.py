@@ -0,0 +1,47 @@
+'''
+bench_query compares filtering a year of transactions in Python with the
+same filters in one query
+
+    python -m benchmarks.bench_query --rows 1000000
+'''
+import argparse
+from transaction import Transaction, to_iso_date
+from benchmarks.common import make_transactions, temp_dbfile
+from benchmarks.bench_summarize import best_of
+
+
+def in_python(trans, category, start, end, minimum):
+    ''' read the year and filter it the way the summarize methods allow '''
+    return [row for row in trans.summarize_by_year(start[6:])
+            if row['category'] == category and row['amount'] >= minimum and
+            to_iso_date(start) <= to_iso_date(row['date']) <= to_iso_date(end)]
+
+
+def main():
+    ''' print the time of each filter both ways '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    filters = [('food', '01-01-2020', '03-31-2020', 50),
+               ('travel', '01-01-2020', '12-31-2020', 500),
+               ('rent', '06-01-2020', '06-30-2020', 0)]
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile) as trans:
+            trans.add_many(make_transactions(args.rows))
+            print("%-30s %8s %12s %12s" % ('filter', 'rows', 'python ms', 'query ms'))
+            print('-'*65)
+            for category, start, end, minimum in filters:
+                query = trans.query().category(category).between(start, end).amount(minimum)
+                rows = query.all()
+                assert rows == in_python(trans, category, start, end, minimum)
+                print("%-30s %8d %12.1f %12.1f" % (
+                    '%s %s..%s >= %d' % (category, start[:5], end[:5], minimum), len(rows),
+                    best_of(lambda: in_python(trans, category, start, end, minimum),
+                            args.repeat),
+                    best_of(query.all, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+'''
+bench_render compares printing transactions a row at a time, as
+tracker.py did, with the batched render.Renderer
+
+The output goes to os.devnull, line buffered like a terminal, so every
+line of the row at a time printer is a write call, and block buffered
+like a pipe or a file.
+
+    python -m benchmarks.bench_render --rows 1000000
+'''
+import argparse
+import contextlib
+import os
+import time
+import render
+from transaction import to_trans_dict
+from benchmarks.common import make_transactions
+
+
+def print_transactions(items):
+    ''' the print_transactions of tracker.py before render.py '''
+    count = 0
+    for item in items:
+        if count == 0:
+            print('\n')
+            print("%-3s %-10s %-10s %-10s %-10s %-30s"%(
+                'id', 'item #','amount','category','date','description'))
+            print('-'*60)
+        values = tuple(item.values())
+        print("%-3s %-10d %-10d %-10s %-10s %-30s"%values)
+        count += 1
+    if count == 0:
+        print('no items to print')
+
+
+def main():
+    ''' print rows/sec for each printer and buffering '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    rows = [to_trans_dict((rowid, trans['item_num'], trans['amount'], trans['category'],
+                           trans['date'], trans['description']))
+            for rowid, trans in enumerate(make_transactions(args.rows), 1)]
+    print("%-12s %-10s %12s" % ('printer', 'buffering', 'rows/sec'))
+    print('-'*36)
+    for buffering, name in ((1, 'line'), (-1, 'block')):
+        with open(os.devnull, 'w', buffering=buffering, encoding='utf-8') as out:
+            printers = {
+                'row at once': lambda: print_transactions(rows),
+                'render': lambda: render.Renderer(out).print_table(render.TRANSACTIONS, rows),
+                'count only': lambda: render.Renderer(out, count_only=True).print_table(
+                    render.TRANSACTIONS, rows),
+            }
+            for printer, func in printers.items():
+                with contextlib.redirect_stdout(out):
+                    start = time.perf_counter()
+                    func()
+                    elapsed = time.perf_counter() - start
+                print("%-12s %-10s %12.0f" % (printer, name, args.rows / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''
+bench_rollup compares dashboard queries over the transactions with the
+same queries over the rollup table, and measures what the rollup
+triggers add to the cost of inserting
+
+    python -m benchmarks.bench_rollup --rows 1000000
+'''
+import argparse
+import time
+from transaction import Transaction
+from benchmarks.common import make_transactions, temp_dbfile
+from benchmarks.bench_summarize import best_of
+
+
+def insert_rate(rows, rollups):
+    ''' return the rows/sec of add_many into a fresh table '''
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile, rollups=rollups) as trans:
+            items = list(make_transactions(rows, seed=1))
+            start = time.perf_counter()
+            trans.add_many(items)
+            return rows / (time.perf_counter() - start)
+
+
+def main():
+    ''' print the query times with and without rollups and the insert rates '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--insert-rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile) as trans:
+            trans.add_many(make_transactions(args.rows))
+            queries = [('by month of 2020', lambda: trans.rollup_by_month('2020')),
+                       ('by year', trans.rollup_by_year),
+                       ('by category', trans.rollup_by_category),
+                       ('by category in 2020', lambda: trans.rollup_by_category('2020'))]
+            grouped = [best_of(query, args.repeat) for _, query in queries]
+            trans.enable_rollups()
+            with trans.pool.connection() as con:
+                count = con.execute("SELECT count(*) FROM transaction_rollups").fetchone()[0]
+            print('%d transactions, %d rollup rows' % (args.rows, count))
+            print("%-24s %14s %14s" % ('query', 'grouped ms', 'rollup ms'))
+            print('-'*54)
+            for (name, query), before in zip(queries, grouped):
+                print("%-24s %14.2f %14.2f" % (name, before, best_of(query, args.repeat)))
+            start = time.perf_counter()
+            trans.rebuild_rollups()
+            print('\nrebuild %.0f ms' % ((time.perf_counter() - start) * 1000))
+            start = time.perf_counter()
+            errors = trans.check_rollups()
+            print('check %.0f ms, %d errors' % ((time.perf_counter() - start) * 1000,
+                                                 len(errors)))
+
+    print('\nadd_many %d rows: %.0f rows/sec without rollups, %.0f with'
+          % (args.insert_rows, insert_rate(args.insert_rows, False),
+             insert_rate(args.insert_rows, True)))
+
+
+if __name__ == '__main__':
+    main()
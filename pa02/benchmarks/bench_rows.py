@@ -0,0 +1,52 @@
+'''
+bench_rows compares the dict rows with the compact TransactionRecord rows
+for memory held by select_all() and rows read per second by iter_all()
+
+    python -m benchmarks.bench_rows --rows 500000
+'''
+import argparse
+import gc
+import time
+import tracemalloc
+from transaction import Transaction
+from benchmarks.common import make_transactions, temp_dbfile
+
+
+def held_memory(func):
+    ''' return the MB still allocated by the result of func() '''
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return held / 2**20
+
+
+def rows_per_sec(trans):
+    ''' return how many rows per second iter_all() produces '''
+    start = time.perf_counter()
+    count = sum(1 for _ in trans.iter_all())
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    ''' print memory and throughput for both row types '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=500000)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        Transaction(dbfile).add_many(make_transactions(args.rows))
+        print("%-10s %16s %12s %14s" % ('rows', 'select_all MB', 'bytes/row', 'rows/sec'))
+        print('-'*56)
+        for label, compact in (('dict', False), ('compact', True)):
+            trans = Transaction(dbfile, compact=compact)
+            memory = held_memory(trans.select_all)
+            print("%-10s %16.1f %12.0f %14.0f" % (label, memory, memory * 2**20 / args.rows,
+                                                 rows_per_sec(trans)))
+        trans.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+'''
+bench_search compares full-text search of the descriptions with a LIKE
+scan, for rare and common words, prefixes and phrases
+
+    python -m benchmarks.bench_search --rows 1000000
+'''
+import argparse
+import time
+from transaction import COLUMNS, Transaction
+from benchmarks.common import make_transactions, temp_dbfile
+from benchmarks.bench_summarize import best_of
+
+# (name, FTS5 query, LIKE pattern), the rare number is filled in from the data
+QUERIES = [('rare number', '{number}', '%{number}%'),
+           ('common word', 'pharmacy', '%pharmacy%'),
+           ('prefix', 'pharm*', '%pharm%'),
+           ('phrase', '"corner cafe"', '%corner cafe%'),
+           ('very common word', 'food', '%food%')]
+
+
+def like_search(trans, pattern, limit):
+    ''' find descriptions with LIKE, which reads every row '''
+    with trans.pool.connection() as con:
+        return con.execute("SELECT "+COLUMNS+" FROM transactions WHERE description LIKE ? "
+                           "LIMIT ?", (pattern, limit)).fetchall()
+
+
+def main():
+    ''' print the time of each query both ways '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile) as trans:
+            trans.add_many(make_transactions(args.rows))
+            start = time.perf_counter()
+            trans.enable_search()
+            print('%d rows, indexed in %.1fs' % (args.rows, time.perf_counter() - start))
+            number = trans.select_page(1)[0]['description'].split('#')[-1]
+            print("%-18s %10s %10s %10s %10s" % ('query', 'matches', 'LIKE ms', 'rank ms',
+                                                 'newest ms'))
+            print('-'*62)
+            for name, query, pattern in QUERIES:
+                query, pattern = query.format(number=number), pattern.format(number=number)
+                matches = len(trans.search(query, args.rows, 'newest'))
+                like = best_of(lambda: like_search(trans, pattern, args.limit), args.repeat)
+                ranked = best_of(lambda: trans.search(query, args.limit), args.repeat)
+                newest = best_of(lambda: trans.search(query, args.limit, 'newest'), args.repeat)
+                print("%-18s %10d %10.2f %10.2f %10.2f" % (name, matches, like, ranked, newest))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+'''
+bench_shard compares one database file with year shards queried in this
+process and with a pool of worker processes
+
+    python -m benchmarks.bench_shard --rows 1000000 --workers 4
+'''
+import argparse
+import os
+import time
+from sharding import ShardedTransaction
+from transaction import Transaction
+from benchmarks.common import make_transactions, temp_dbfile
+from benchmarks.bench_summarize import best_of
+
+
+def main():
+    ''' print the time of each query on each layout '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        one = Transaction(dbfile.replace('.db', '-one.db'))
+        serial = ShardedTransaction(dbfile, workers=0)
+        for name, trans in (('one file', one), ('shards', serial)):
+            start = time.perf_counter()
+            trans.add_many(make_transactions(args.rows))
+            print('%-10s add_many %8.0f rows/s' % (
+                name, args.rows / (time.perf_counter() - start)))
+        parallel = ShardedTransaction(dbfile, workers=args.workers)
+        queries = {
+            'summarize_by_year': lambda trans: trans.summarize_by_year('2020'),
+            'summarize_by_category': lambda trans: trans.summarize_by_category('rent'),
+            'totals_by_category': lambda trans: trans.totals_by_category(),
+            'totals_by_year': lambda trans: trans.totals_by_year(),
+            'select_all': lambda trans: trans.select_all(),
+        }
+        print()
+        print("%-22s %12s %12s %12s" % ('query', 'one file ms', 'shards ms',
+                                         '%d workers ms' % args.workers))
+        print('-'*61)
+        for name, query in queries.items():
+            print("%-22s %12.1f %12.1f %12.1f" % (
+                name, best_of(lambda: query(one), args.repeat),
+                best_of(lambda: query(serial), args.repeat),
+                best_of(lambda: query(parallel), args.repeat)))
+        for trans in (one, serial, parallel):
+            trans.close()
+
+
+if __name__ == '__main__':
+    main()
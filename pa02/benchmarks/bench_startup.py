@@ -0,0 +1,83 @@
+'''
+bench_startup times tracker.py commands as separate processes, the way a
+shell script runs them, and compares adding rows one process per row
+with adding them all from one run-script
+
+    python -m benchmarks.bench_startup --repeat 20 --adds 200
+'''
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks.common import make_transactions, percentile, temp_dbfile
+
+TRACKER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'tracker.py')
+
+
+def add_words(item):
+    ''' return the tracker.py add arguments for a transaction dict '''
+    return ['add', '--amount', str(item['amount']), '--category', item['category'],
+            '--date', item['date'], '--description', item['description'],
+            '--item-num', str(item['item_num'])]
+
+
+def time_process(args, repeat):
+    ''' run a command repeat times, return the sorted wall times in ms '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)
+
+
+def main():
+    ''' print the startup cost of each command and the run-script speedup '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--adds', type=int, default=200)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        tracker = [sys.executable, TRACKER, '--db', dbfile]
+        commands = [('python -c pass', [sys.executable, '-c', 'pass']),
+                    ('tracker.py --help', tracker + ['--help']),
+                    ('tracker.py add', tracker + add_words(next(make_transactions(1)))),
+                    ('tracker.py summarize', tracker + ['summarize', '--date', '01-01-2000'])]
+        print("%-24s %10s %10s %14s" % ('command', 'p50 ms', 'p90 ms', 'over python'))
+        print('-'*61)
+        baseline = None
+        for name, command in commands:
+            times = time_process(command, args.repeat)
+            median = statistics.median(times)
+            baseline = median if baseline is None else baseline
+            print("%-24s %10.1f %10.1f %14.1f" % (name, median, percentile(times, 90),
+                                                  median - baseline))
+
+        items = list(make_transactions(args.adds, seed=1))
+        start = time.perf_counter()
+        for item in items:
+            subprocess.run(tracker + add_words(item), check=True, stdout=subprocess.DEVNULL)
+        separate = time.perf_counter() - start
+        script = os.path.join(os.path.dirname(dbfile), 'adds.txt')
+        with open(script, 'w', encoding='utf-8') as output:
+            for item in items:
+                output.write(' '.join(map(quote, add_words(item)))+'\n')
+        start = time.perf_counter()
+        subprocess.run(tracker + ['run-script', script], check=True, stdout=subprocess.DEVNULL)
+        together = time.perf_counter() - start
+        print()
+        print('%d adds: %.2fs as separate processes, %.3fs with run-script, %.0fx faster'
+              % (args.adds, separate, together, separate / together))
+
+
+def quote(word):
+    ''' quote a word for a run-script line '''
+    return "'%s'" % word.replace("'", "'\"'\"'")
+
+
+if __name__ == '__main__':
+    main()
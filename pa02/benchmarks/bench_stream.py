@@ -0,0 +1,46 @@
+'''
+bench_stream compares select_all() with iter_all() for peak memory and
+the time until the first row is available
+
+    python -m benchmarks.bench_stream --rows 500000
+'''
+import argparse
+import time
+import tracemalloc
+from transaction import Transaction
+from benchmarks.common import make_transactions, temp_dbfile
+
+
+def measure(rows_func):
+    ''' return (ms to first row, ms for all rows, peak MB) for consuming rows_func() '''
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    for _ in rows_func():
+        if first is None:
+            first = time.perf_counter() - start
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first * 1000, total * 1000, peak / 2**20
+
+
+def main():
+    ''' print first-row latency and peak memory for both read paths '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile) as trans:
+            trans.add_many(make_transactions(args.rows))
+            print("%-12s %14s %12s %10s" % ('method', 'first row ms', 'total ms', 'peak MB'))
+            print('-'*52)
+            print("%-12s %14.1f %12.1f %10.1f" % (('select_all',) + measure(trans.select_all)))
+            print("%-12s %14.1f %12.1f %10.1f" % (('iter_all',) + measure(
+                lambda: trans.iter_all(args.chunk_size))))
+
+
+if __name__ == '__main__':
+    main()
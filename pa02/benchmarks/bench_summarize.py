@@ -0,0 +1,58 @@
+'''
+bench_summarize times the summarize_by_* methods against the leading
+wildcard LIKE scans they used before the iso_date column and indexes
+
+    python -m benchmarks.bench_summarize --rows 1000000
+'''
+import argparse
+import time
+from transaction import Transaction, to_trans_dict_list
+from benchmarks.common import make_transactions, temp_dbfile
+
+LIKE_QUERIES = {
+    'date': ("date LIKE ?", lambda: ('%06-15-2020%',)),
+    'month': ("date LIKE ?", lambda: ('06-%',)),
+    'year': ("date LIKE ?", lambda: ('%-2020',)),
+    'category': ("category=?", lambda: ('travel',)),
+}
+
+def best_of(func, repeat):
+    ''' return the fastest of repeat calls to func in milliseconds '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    ''' print the time of each summary before and after indexing '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile) as trans:
+            trans.add_many(make_transactions(args.rows))
+            methods = {'date': lambda: trans.summarize_by_date('06-15-2020'),
+                       'month': lambda: trans.summarize_by_month('06'),
+                       'year': lambda: trans.summarize_by_year('2020'),
+                       'category': lambda: trans.summarize_by_category('travel')}
+
+            print("%-10s %8s %14s %14s" % ('summary', 'rows', 'LIKE scan ms', 'indexed ms'))
+            print('-'*50)
+            for name, (where, params) in LIKE_QUERIES.items():
+                def scan(where=where, params=params):
+                    with trans.pool.connection() as con:
+                        return to_trans_dict_list(con.execute(
+                            "SELECT rowid, * FROM transactions NOT INDEXED WHERE "+where,
+                            params()).fetchall())
+                rows = len(methods[name]())
+                print("%-10s %8d %14.1f %14.1f" % (name, rows, best_of(scan, args.repeat),
+                                                   best_of(methods[name], args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
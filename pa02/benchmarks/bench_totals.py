@@ -0,0 +1,44 @@
+'''
+bench_totals compares monthly totals computed in Python from
+summarize_by_year against totals_by_month computed with GROUP BY
+
+    python -m benchmarks.bench_totals --rows 1000000
+'''
+import argparse
+from transaction import Transaction
+from benchmarks.common import make_transactions, temp_dbfile
+from benchmarks.bench_summarize import best_of
+
+
+def python_totals(trans, year):
+    ''' sum the year's transactions by month in Python '''
+    totals = {}
+    for item in trans.summarize_by_year(year):
+        month = item['date'][:2]
+        count, amount = totals.get(month, (0, 0))
+        totals[month] = (count + 1, amount + item['amount'])
+    return sorted(totals.items())
+
+
+def main():
+    ''' print the time of both ways of totalling a year by month '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        with Transaction(dbfile) as trans:
+            trans.add_many(make_transactions(args.rows))
+            print("%-28s %10s" % ('method', 'ms'))
+            print('-'*40)
+            print("%-28s %10.1f" % ('summarize_by_year + Python',
+                                    best_of(lambda: python_totals(trans, '2020'), args.repeat)))
+            print("%-28s %10.1f" % ('totals_by_month',
+                                    best_of(lambda: trans.totals_by_month('2020'), args.repeat)))
+            print("%-28s %10.1f" % ('totals_by_category (all)',
+                                    best_of(trans.totals_by_category, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
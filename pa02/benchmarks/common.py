@@ -0,0 +1,69 @@
+'''
+helpers shared by the benchmark scripts
+'''
+import datetime
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+
+# category: (relative frequency, typical amount, merchants)
+PROFILE = {
+    'food': (40, 25, ['grocery mart', 'corner cafe', 'pizza place', 'farmers market']),
+    'fun': (15, 40, ['cinema', 'concert hall', 'bowling alley', 'bookstore']),
+    'car': (10, 60, ['gas station', 'auto repair', 'parking garage', 'car wash']),
+    'utilities': (8, 90, ['power company', 'water utility', 'internet provider']),
+    'health': (7, 70, ['pharmacy', 'dentist', 'gym membership']),
+    'gifts': (6, 50, ['gift shop', 'florist', 'online store']),
+    'travel': (4, 300, ['airline', 'hotel', 'train ticket', 'rental car']),
+    'rent': (2, 1500, ['landlord']),
+}
+CATEGORIES = list(PROFILE)
+WEIGHTS = [PROFILE[name][0] for name in CATEGORIES]
+
+
+def make_transaction(rng, year_range=(2015, 2024)):
+    ''' return a random transaction dict, categories are skewed towards
+        small everyday purchases and dates are spread over year_range '''
+    category = rng.choices(CATEGORIES, WEIGHTS)[0]
+    _, scale, merchants = PROFILE[category]
+    date = datetime.date.fromordinal(rng.randint(
+        datetime.date(year_range[0], 1, 1).toordinal(),
+        datetime.date(year_range[1], 12, 31).toordinal()))
+    return {'item_num': rng.randint(1, 50),
+            'amount': round(scale * rng.lognormvariate(0, 0.5), 2),
+            'category': category,
+            'date': date.strftime('%m-%d-%Y'),
+            'description': '%s %s #%d' % (rng.choice(merchants), category,
+                                          rng.randint(1, 10**6))}
+
+
+def make_transactions(count, seed=0):
+    ''' generate count random transaction dicts '''
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield make_transaction(rng)
+
+
+@contextmanager
+def temp_dbfile(name='bench.db'):
+    ''' yield the path of a database file in a fresh temporary directory '''
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield os.path.join(tmpdir, name)
+
+
+def ops_per_sec(func, count):
+    ''' call func count times and return the calls per second '''
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return count / (time.perf_counter() - start)
+
+
+def percentile(sorted_values, pct):
+    ''' return the pct percentile of a sorted list by the nearest rank method '''
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
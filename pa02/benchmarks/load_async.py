@@ -0,0 +1,69 @@
+'''
+load_async runs 1,000 concurrent coroutines against AsyncTransaction and
+reports requests/sec and latency percentiles
+
+Each task makes --requests calls, an add with probability --write-ratio
+and otherwise a summarize_by_date.  --max-batch 1 turns off the add
+batching to show what it buys.
+
+    python -m benchmarks.load_async --tasks 1000 --requests 5
+    python -m benchmarks.load_async --tasks 1000 --requests 5 --max-batch 1
+'''
+import argparse
+import asyncio
+import random
+import time
+from async_orm import AsyncTransaction
+from benchmarks.common import make_transaction, make_transactions, percentile, temp_dbfile
+
+
+async def client(trans, rng, requests, write_ratio, latencies):
+    ''' make requests calls, recording each latency in ms '''
+    for _ in range(requests):
+        start = time.perf_counter()
+        if rng.random() < write_ratio:
+            await trans.add(make_transaction(rng))
+        else:
+            await trans.summarize_by_date('%02d-%02d-2020' % (rng.randint(1, 12),
+                                                               rng.randint(1, 28)))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run(args, dbfile):
+    ''' return (requests/sec, sorted latencies, batches) '''
+    async with AsyncTransaction(dbfile, max_batch=args.max_batch,
+                                profile=args.profile) as trans:
+        await trans.add_many(make_transactions(args.rows))
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*(client(trans, random.Random(seed), args.requests,
+                                      args.write_ratio, latencies)
+                               for seed in range(args.tasks)))
+        elapsed = time.perf_counter() - start
+        return len(latencies) / elapsed, sorted(latencies), trans.batches
+
+
+def main():
+    ''' run the load test and print the results '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=5)
+    parser.add_argument('--write-ratio', type=float, default=0.8)
+    parser.add_argument('--max-batch', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--profile', default='default')
+    args = parser.parse_args()
+
+    with temp_dbfile() as dbfile:
+        rate, latencies, batches = asyncio.run(run(args, dbfile))
+    print('%d tasks x %d requests, max_batch %d, %d add batches' % (
+        args.tasks, args.requests, args.max_batch, batches))
+    print("%12s %10s %10s %10s" % ('requests/s', 'p50 ms', 'p90 ms', 'p99 ms'))
+    print('-'*45)
+    print("%12.0f %10.1f %10.1f %10.1f" % (rate, percentile(latencies, 50),
+                                           percentile(latencies, 90),
+                                           percentile(latencies, 99)))
+
+
+if __name__ == '__main__':
+    main()
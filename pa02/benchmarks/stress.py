@@ -0,0 +1,79 @@
+'''
+stress runs several writer and reader processes against one tracker.db
+and reports their throughput and how many calls failed with
+"database is locked"
+
+    python -m benchmarks.stress --profile fast --writers 4 --readers 4 --seconds 10
+    python -m benchmarks.stress --profile default
+
+Writers add one transaction per call, readers run summarize_by_year
+over a table of --rows rows so that reads take a while.
+'''
+import argparse
+import multiprocessing
+import random
+import sqlite3
+import time
+from transaction import Transaction
+from benchmarks.common import make_transaction, make_transactions, temp_dbfile
+
+
+def worker(role, dbfile, profile, seconds, seed, results):
+    ''' run adds or reads until the time is up, then report (role, ops, errors) '''
+    rng = random.Random(seed)
+    trans = Transaction(dbfile, profile=profile)
+    ops = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            if role == 'writer':
+                trans.add(make_transaction(rng))
+            else:
+                trans.summarize_by_year(str(rng.randint(2015, 2024)))
+            ops += 1
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error) and 'busy' not in str(error):
+                raise
+            errors += 1
+    trans.close()
+    results.put((role, ops, errors))
+
+
+def main():
+    ''' start the workers and print what each role achieved '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--profile', default='fast')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    with temp_dbfile('tracker.db') as dbfile:
+        with Transaction(dbfile, profile=args.profile) as trans:
+            trans.add_many(make_transactions(args.rows))
+        results = multiprocessing.Queue()
+        roles = ['writer'] * args.writers + ['reader'] * args.readers
+        processes = [multiprocessing.Process(target=worker, args=(
+            role, dbfile, args.profile, args.seconds, seed, results))
+                     for seed, role in enumerate(roles)]
+        for process in processes:
+            process.start()
+        totals = {'writer': [0, 0], 'reader': [0, 0]}
+        for _ in processes:
+            role, ops, errors = results.get()
+            totals[role][0] += ops
+            totals[role][1] += errors
+        for process in processes:
+            process.join()
+
+    print('profile %s, %d writers, %d readers, %.0fs' % (args.profile, args.writers,
+                                                         args.readers, args.seconds))
+    print("%-8s %10s %10s %12s" % ('role', 'ops', 'ops/sec', 'lock errors'))
+    print('-'*43)
+    for role, (ops, errors) in totals.items():
+        print("%-8s %10d %10.0f %12d" % (role, ops, ops / args.seconds, errors))
+
+
+if __name__ == '__main__':
+    main()
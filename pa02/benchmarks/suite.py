@@ -0,0 +1,183 @@
+'''
+suite runs every Transaction and Category operation against synthetic
+databases of several sizes and writes the latencies as JSON
+
+    python -m benchmarks.suite run --sizes 10000 100000 1000000 --output new.json
+    python -m benchmarks.suite compare old.json new.json --threshold 0.1
+
+compare prints the change in median latency of every operation and exits
+with status 1 if any got slower by more than the threshold.
+'''
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import sys
+import time
+from category import Category
+from transaction import Transaction
+from benchmarks.common import CATEGORIES, make_transactions, percentile, temp_dbfile
+
+DEFAULT_SIZES = [10000, 100000]
+PERCENTILES = (50, 90, 99)
+
+
+def time_calls(func, args_list):
+    ''' call func once for each tuple of arguments, return the latencies in ms '''
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(size, operation, latencies):
+    ''' return the result record for one operation '''
+    latencies = sorted(latencies)
+    record = {'size': size, 'operation': operation, 'calls': len(latencies),
+              'mean_ms': sum(latencies) / len(latencies),
+              'min_ms': latencies[0], 'max_ms': latencies[-1]}
+    for pct in PERCENTILES:
+        record['p%d_ms' % pct] = percentile(latencies, pct)
+    return record
+
+
+def transaction_workload(trans, size, rng, repeat, scan_repeat):
+    ''' yield (operation, func, args_list) for the Transaction operations '''
+    dates = ['%02d-%02d-%04d' % (rng.randint(1, 12), rng.randint(1, 28),
+                                 rng.randint(2015, 2024)) for _ in range(repeat)]
+    yield 'select_all', trans.select_all, [()] * scan_repeat
+    yield 'summarize_by_date', trans.summarize_by_date, [(date,) for date in dates]
+    yield 'summarize_by_month', trans.summarize_by_month, \
+        [('%02d' % rng.randint(1, 12),) for _ in range(scan_repeat)]
+    yield 'summarize_by_year', trans.summarize_by_year, \
+        [(str(rng.randint(2015, 2024)),) for _ in range(scan_repeat)]
+    yield 'summarize_by_category', trans.summarize_by_category, \
+        [(rng.choice(CATEGORIES),) for _ in range(scan_repeat)]
+    yield 'add', trans.add, [(item,) for item in make_transactions(repeat, seed=size)]
+    yield 'delete', trans.delete, \
+        [(rowid,) for rowid in rng.sample(range(1, size + 1), min(repeat, size))]
+
+
+def category_workload(cats, rng, repeat):
+    ''' yield (operation, func, args_list) for the Category operations '''
+    rowids = list(range(1, len(CATEGORIES) + 1))
+    new = [{'name': 'bench%d' % i, 'desc': 'benchmark category'} for i in range(repeat)]
+    yield 'category.select_all', cats.select_all, [()] * repeat
+    yield 'category.select_one', cats.select_one, [(rng.choice(rowids),) for _ in range(repeat)]
+    yield 'category.add', cats.add, [(item,) for item in new]
+    yield 'category.update', cats.update, \
+        [(rowid, {'name': 'renamed', 'desc': 'renamed'}) for rowid in rng.sample(
+            range(len(CATEGORIES) + 1, len(CATEGORIES) + repeat + 1), repeat)]
+    yield 'category.delete', cats.delete, \
+        [(rowid,) for rowid in range(len(CATEGORIES) + 1, len(CATEGORIES) + repeat + 1)]
+
+
+def run_size(size, repeat, scan_repeat, seed):
+    ''' build a database of size transactions and time every operation on it '''
+    rng = random.Random(seed)
+    results = []
+    with temp_dbfile() as dbfile:
+        trans = Transaction(dbfile)
+        cats = Category(dbfile, pool=trans.pool)
+        start = time.perf_counter()
+        # added first so they are rows 1 to len(CATEGORIES), which the
+        # transactions then use instead of creating them again
+        cats.add_many({'name': name, 'desc': name+' spending'} for name in CATEGORIES)
+        trans.add_many(make_transactions(size, seed))
+        print('built %d rows in %.1fs' % (size, time.perf_counter() - start), file=sys.stderr)
+        workloads = (transaction_workload(trans, size, rng, repeat, scan_repeat),
+                     category_workload(cats, rng, repeat))
+        for workload in workloads:
+            for operation, func, args_list in workload:
+                results.append(summarize(size, operation, time_calls(func, args_list)))
+                print('%10d %-24s p50 %9.3f ms' % (size, operation, results[-1]['p50_ms']),
+                      file=sys.stderr)
+        trans.close()
+    return results
+
+
+def run(args):
+    ''' run the suite and write the JSON report '''
+    report = {'meta': {'python': platform.python_version(),
+                       'sqlite': sqlite3.sqlite_version,
+                       'platform': platform.platform(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'repeat': args.repeat, 'scan_repeat': args.scan_repeat,
+                       'seed': args.seed},
+              'results': []}
+    for size in args.sizes:
+        report['results'].extend(run_size(size, args.repeat, args.scan_repeat, args.seed))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            output.write(text)
+    else:
+        print(text)
+    return 0
+
+
+def compare_reports(old, new, threshold, metric='p50_ms', min_delta=0.05):
+    ''' return a list of (size, operation, old, new, ratio, regressed) for the
+        operations present in both reports.  a regression is a slowdown by
+        more than the threshold fraction and more than min_delta ms, so
+        timer noise on sub-millisecond operations is not flagged '''
+    old_results = {(r['size'], r['operation']): r for r in old['results']}
+    rows = []
+    for result in new['results']:
+        before = old_results.get((result['size'], result['operation']))
+        if before is None:
+            continue
+        ratio = result[metric] / before[metric] if before[metric] else float('inf')
+        rows.append((result['size'], result['operation'], before[metric], result[metric],
+                     ratio, ratio > 1 + threshold and
+                     result[metric] - before[metric] > min_delta))
+    return rows
+
+
+def compare(args):
+    ''' print the comparison of two reports, returning 1 if anything regressed '''
+    with open(args.old, encoding='utf-8') as old, open(args.new, encoding='utf-8') as new:
+        rows = compare_reports(json.load(old), json.load(new), args.threshold,
+                               args.metric, args.min_delta)
+    print("%10s %-24s %12s %12s %8s" % ('size', 'operation', 'old ms', 'new ms', 'change'))
+    print('-'*72)
+    for size, operation, before, after, ratio, regressed in rows:
+        print("%10d %-24s %12.3f %12.3f %+7.0f%%%s" % (size, operation, before, after,
+                                                     (ratio - 1) * 100,
+                                                     '  REGRESSION' if regressed else ''))
+    return 1 if any(row[5] for row in rows) else 0
+
+
+def main(argv=None):
+    ''' parse the command line and run or compare '''
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                            help='table sizes, e.g. 10000 100000 1000000 10000000')
+    run_parser.add_argument('--repeat', type=int, default=50,
+                            help='calls per point operation')
+    run_parser.add_argument('--scan-repeat', type=int, default=5,
+                            help='calls per operation that reads a large part of the table')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', help='write the JSON here instead of stdout')
+    run_parser.set_defaults(func=run)
+    compare_parser = commands.add_parser('compare', help='compare two JSON reports')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='flag a slowdown bigger than this fraction')
+    compare_parser.add_argument('--metric', default='p50_ms',
+                                choices=['mean_ms', 'p50_ms', 'p90_ms', 'p99_ms'])
+    compare_parser.add_argument('--min-delta', type=float, default=0.05,
+                                help='ignore slowdowns smaller than this many ms')
+    compare_parser.set_defaults(func=compare)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
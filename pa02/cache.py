@@ -0,0 +1,71 @@
+'''
+cache.py is a small thread safe LRU cache with an optional time to live
+
+The ORMs use it to answer repeated reads of tables that rarely change
+without going back to the database.  Writers call clear() to invalidate.
+
+'''
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LRUCache():
+    ''' LRUCache keeps the size most recently used entries, each for at most
+        ttl seconds if ttl is given.  hits and misses count lookups.
+    '''
+
+    def __init__(self, size=128, ttl=None, clock=time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        ''' return the cached value for key, or MISSING '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or self.clock() < entry[1]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+    def put(self, key, value, generation=None):
+        ''' cache value under key, evicting the least recently used entry if full.
+            pass the generation read before loading value, so that a value
+            loaded before a clear() is not cached after it
+        '''
+        if self.size <= 0:
+            return
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        ''' forget every entry, the counters are kept '''
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        ''' return the counters as a dict '''
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries), 'max_size': self.size}
@@ -3,12 +3,67 @@ category.py is a Object Relational Mapping to the categories table
 
 The ORM will work map SQL rows with the schema
     (rowid,name,description)
-to Python Dictionaries.
+to Python Dictionaries, or to the more compact CategoryRecord rows
+when the Category is created with compact=True.
+
+The rowid is the id column, an INTEGER PRIMARY KEY that the category_id
+of each transaction refers to.  Renaming a category renames it for all
+of its transactions at once, and the transactions of a deleted category
+read back with no category, even once its id is given to a new one,
+since a trigger that transaction.py creates sets their category_id to
+NULL.
+
+delete_many, delete_where and update_where change many categories a
+batch at a time, each batch in a database transaction of its own.  The
+categories to change are picked with a dict of column: value, or column:
+list of values, that must all match.
+
+Categories rarely change, so reads are cached in an LRU cache of
+cache_size entries that are kept for at most cache_ttl seconds.  Writes
+through this Category, or through any Category or Transaction sharing
+its pool, such as a Transaction adding a transaction with a new
+category, clear the cache.  Writes made by other processes are seen once
+the cached entries expire.
 
 This app will store the data in a SQLite database ~/tracker.db
 
 '''
-import sqlite3
+from cache import LRUCache, MISSING
+from connection import change_many, change_where, get_pool, insert_many
+from records import Record
+
+BATCH_SIZE = 1000
+CACHE_SIZE = 128
+PAGE_SIZE = 20
+
+# the sort keys of each page order, see transaction.ORDERS
+ORDERS = {'rowid':('rowid',), 'name':('name','rowid')}
+
+ALL = 'all'
+
+INSERT = "INSERT INTO categories(name,desc) VALUES(?,?)"
+
+DELETE = "DELETE FROM categories WHERE rowid=?"
+
+# the columns that a filter can match and that update_where can change
+FILTERS = ('rowid','name','desc')
+UPDATABLE = ('name','desc')
+
+def create_schema(con):
+    ''' create the categories table and its index, migrating a table made
+        before it had an id column '''
+    columns = [row[1] for row in con.execute("PRAGMA table_info(categories)")]
+    if columns and 'id' not in columns:
+        # the rowids become the ids, so they have to be copied explicitly
+        con.execute("ALTER TABLE categories RENAME TO categories_old")
+        con.execute("DROP INDEX IF EXISTS categories_name")
+    con.execute('''CREATE TABLE IF NOT EXISTS categories
+                (id integer PRIMARY KEY, name text, desc text)''')
+    if columns and 'id' not in columns:
+        con.execute("INSERT INTO categories SELECT rowid,name,desc FROM categories_old")
+        con.execute("DROP TABLE categories_old")
+    con.execute('''CREATE INDEX IF NOT EXISTS categories_name
+                ON categories(name)''')
 
 def to_cat_dict(cat_tuple):
     ''' cat is a category tuple (rowid, name, desc)'''
@@ -19,74 +74,214 @@ def to_cat_dict_list(cat_tuples):
     ''' convert a list of category tuples into a list of dictionaries'''
     return [to_cat_dict(cat) for cat in cat_tuples]
 
+def to_where(where):
+    ''' return the where clause and parameters for a dict of column: value
+        or column: list of values, all of which must match '''
+    clauses,params = [],()
+    for column,value in where.items():
+        if column not in FILTERS:
+            raise ValueError('cannot filter on %r, use some of %s'%(column,', '.join(FILTERS)))
+        values = tuple(value) if isinstance(value,(list,tuple,set)) else (value,)
+        clauses.append('%s IN (%s)'%(column,','.join('?'*len(values))))
+        params += values
+    return ('WHERE '+' AND '.join(clauses) if clauses else ''),params
+
+class CategoryRecord(Record):
+    ''' a compact category row that can be read like the dict from to_cat_dict '''
+    __slots__ = ()
+    fields = ('rowid', 'name', 'desc')
+
 class Category():
     ''' Category represents a table of categories'''
 
-    def __init__(self,dbfile):
-        con= sqlite3.connect(dbfile)
-        cur = con.cursor()
-        cur.execute('''CREATE TABLE IF NOT EXISTS categories
-                    (name text, desc text)''')
-        con.commit()
-        con.close()
+    def __init__(self,dbfile,pool=None,compact=False,cache_size=CACHE_SIZE,cache_ttl=None,
+                 profile=None):
         self.dbfile = dbfile
+        self.cache = LRUCache(cache_size,cache_ttl)
+        self.to_row = CategoryRecord if compact else to_cat_dict
+        self.pool = pool if pool is not None else get_pool(dbfile,profile=profile)
+        self.owns_pool = pool is None
+        self.profiler = None
+        self.generation = self.pool.generation('categories')
+        with self.pool.connection() as con:
+            create_schema(con)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        ''' close the connections to the database file, unless the pool was
+            passed in or is still used by another ORM '''
+        if self.owns_pool:
+            self.owns_pool = False
+            self.pool.release()
+
+    def enable_profiling(self,profiler=None,**options):
+        ''' time the methods of this object with a profiling.Profiler,
+            a new one made with options if profiler is None, and return it '''
+        import profiling  # pylint: disable=import-outside-toplevel
+        if self.profiler is not None:
+            profiling.uninstrument(self)
+        return profiling.instrument(self,profiler or profiling.Profiler(**options))
+
+    def disable_profiling(self):
+        ''' stop timing the methods of this object '''
+        if self.profiler is not None:
+            import profiling  # pylint: disable=import-outside-toplevel
+            profiling.uninstrument(self)
+
+    def _changed(self):
+        ''' forget the cached categories, here and in every Category sharing the pool '''
+        self.pool.changed('categories')
+        self.cache.clear()
+
+    def _check_cache(self):
+        ''' clear the cache if the categories were changed through the pool
+            since it was last checked '''
+        generation = self.pool.generation('categories')
+        if generation != self.generation:
+            self.cache.clear()
+            self.generation = generation
 
     def select_all(self):
         ''' return all of the categories as a list of dicts.'''
-        con= sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        cur.execute("SELECT rowid,* from categories")
-        tuples = cur.fetchall()
-        con.commit()
-        con.close()
-        return to_cat_dict_list(tuples)
+        self._check_cache()
+        tuples = self.cache.get(ALL)
+        if tuples is MISSING:
+            generation = self.cache.generation
+            with self.pool.connection() as con:
+                cur = con.execute("SELECT rowid,name,desc from categories")
+                tuples = cur.fetchall()
+            self.cache.put(ALL,tuples,generation)
+        return list(map(self.to_row,tuples))
+
+    def select_page(self,limit=PAGE_SIZE,after_rowid=None,order='rowid'):
+        ''' return up to limit categories in the order 'rowid' or 'name',
+            starting after the category after_rowid, the last rowid of the
+            previous page.  pages are not cached
+        '''
+        if order not in ORDERS:
+            raise ValueError('cannot order by %r, use one of %s'%(order,', '.join(ORDERS)))
+        keys = ', '.join(ORDERS[order])
+        where, params = '', ()
+        if after_rowid is not None:
+            where = 'WHERE (%s) > (SELECT %s FROM categories WHERE rowid=?)'%(keys,keys)
+            params = (after_rowid,)
+        with self.pool.connection() as con:
+            cur = con.execute("SELECT rowid,name,desc from categories "+where+
+                              " ORDER BY "+keys+" LIMIT ?",params+(limit,))
+            tuples = cur.fetchall()
+        return list(map(self.to_row,tuples))
 
     def select_one(self,rowid):
         ''' return a category with a specified rowid '''
-        con= sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        cur.execute("SELECT rowid,* from categories where rowid=(?)",(rowid,) )
-        tuples = cur.fetchall()
-        con.commit()
-        con.close()
-        return to_cat_dict(tuples[0])
+        self._check_cache()
+        tuples = self.cache.get(rowid)
+        if tuples is MISSING:
+            generation = self.cache.generation
+            with self.pool.connection() as con:
+                cur = con.execute("SELECT rowid,name,desc from categories where rowid=(?)",
+                                  (rowid,))
+                tuples = cur.fetchall()
+            if tuples:
+                self.cache.put(rowid,tuples,generation)
+        return self.to_row(tuples[0])
 
 
     def add(self,item):
         ''' add a category to the categories table.
             this returns the rowid of the inserted element
         '''
-        con= sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        cur.execute("INSERT INTO categories VALUES(?,?)",(item['name'],item['desc']))
-        con.commit()
-        cur.execute("SELECT last_insert_rowid()")
-        last_rowid = cur.fetchone()
-        con.commit()
-        con.close()
-        return last_rowid[0]
+        with self.pool.connection() as con:
+            cur = con.execute(INSERT,(item['name'],item['desc']))
+        self._changed()
+        return cur.lastrowid
+
+    def add_many(self,items,batch_size=BATCH_SIZE):
+        ''' add any iterable of categories in one database transaction,
+            batch_size rows at a time.
+            this returns the (first, last) rowids added, or None if there
+            were no categories
+        '''
+        rows = ((item['name'],item['desc']) for item in items)
+        with self.pool.connection() as con:
+            rowids = insert_many(con,INSERT,rows,batch_size)
+        self._changed()
+        return rowids
 
     def update(self,rowid,item):
         ''' add a category to the categories table.
             this returns the rowid of the inserted element
         '''
-        con= sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        cur.execute('''UPDATE categories
-                        SET name=(?), desc=(?)
-                        WHERE rowid=(?);
-        ''',(item['name'],item['desc'],rowid))
-        con.commit()
-        con.close()
+        with self.pool.connection() as con:
+            con.execute('''UPDATE categories
+                            SET name=(?), desc=(?)
+                            WHERE rowid=(?);
+            ''',(item['name'],item['desc'],rowid))
+        self._changed()
 
     def delete(self,rowid):
         ''' add a category to the categories table.
             this returns the rowid of the inserted element
         '''
-        con= sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        cur.execute('''DELETE FROM categories
-                       WHERE rowid=(?);
-        ''',(rowid,))
-        con.commit()
-        con.close()
+        with self.pool.connection() as con:
+            con.execute('''DELETE FROM categories
+                           WHERE rowid=(?);
+            ''',(rowid,))
+        self._changed()
+
+    def delete_many(self,rowids,batch_size=BATCH_SIZE):
+        ''' delete the categories with any iterable of rowids, batch_size
+            in each database transaction, and return the number deleted
+        '''
+        try:
+            return change_many(self.pool,DELETE,((rowid,) for rowid in rowids),batch_size)
+        finally:
+            self._changed()
+
+    def delete_where(self,where,batch_size=BATCH_SIZE,dry_run=False):
+        ''' delete the categories matching a dict of column: value, see
+            to_where, and return the number deleted.  with dry_run nothing
+            is deleted and the number that would be is counted
+        '''
+        clause,params = to_where(where)
+        if dry_run:
+            return self._count(clause,params)
+        try:
+            return change_where(self.pool,'categories',clause,params,
+                                lambda con,rowids: con.executemany(
+                                    DELETE,[(rowid,) for rowid in rowids]).rowcount,
+                                batch_size)
+        finally:
+            self._changed()
+
+    def update_where(self,where,changes,batch_size=BATCH_SIZE,dry_run=False):
+        ''' set the name or desc, or both, of the categories matching a dict
+            of column: value and return the number changed.  dry_run is as
+            in delete_where
+        '''
+        unknown = set(changes)-set(UPDATABLE)
+        if unknown or not changes:
+            raise ValueError('cannot update %s, give some of %s'%(
+                ', '.join(sorted(unknown)) or 'nothing',', '.join(UPDATABLE)))
+        clause,params = to_where(where)
+        if dry_run:
+            return self._count(clause,params)
+        columns = [column for column in UPDATABLE if column in changes]
+        sql = "UPDATE categories SET "+', '.join(column+'=?' for column in columns)+" WHERE rowid=?"
+        values = tuple(changes[column] for column in columns)
+        try:
+            return change_where(self.pool,'categories',clause,params,
+                                lambda con,rowids: con.executemany(
+                                    sql,[values+(rowid,) for rowid in rowids]).rowcount,
+                                batch_size)
+        finally:
+            self._changed()
+
+    def _count(self,clause,params):
+        ''' return the number of categories matching a where clause '''
+        with self.pool.connection() as con:
+            return con.execute("SELECT count(*) FROM categories "+clause,params).fetchone()[0]
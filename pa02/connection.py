@@ -0,0 +1,275 @@
+'''
+connection.py manages the sqlite3 connections used by the ORMs
+
+Opening a connection means opening the file and parsing the schema,
+so rather than connecting on every call, the Transaction and Category
+classes share one ConnectionPool per database file.  get_pool counts
+the users of the shared pool and release() closes it once the last of
+them is done, so closing one ORM does not close the others.
+
+A thread that asks for a connection while it already holds one gets the
+same connection back, so nested calls join the outer transaction and
+only the outermost block commits.
+
+Each pool opens its connections with a storage profile, a dict of
+PRAGMA settings.  The presets are
+    default  sqlite's own settings plus a busy timeout
+    durable  write-ahead logging, synchronous=FULL, writers take the
+             write lock up front so they wait instead of failing
+    fast     like durable with synchronous=NORMAL, a bigger page cache
+             and memory mapped reads, a power cut can lose the last
+             few commits but never corrupts the file
+
+The ORMs sharing a pool count their writes to a table with changed(),
+so one that caches the table, like Category, sees when another one,
+like a Transaction creating categories, has written to it.
+
+A pool with a profiler (see profiling.py) times taking connections and
+commits, and hands out connections that time their statements.
+
+'''
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_POOL_SIZE = 4
+
+PROFILES = {
+    'default': {'busy_timeout': 5000},
+    'durable': {'journal_mode': 'WAL', 'synchronous': 'FULL', 'busy_timeout': 10000,
+                'isolation_level': 'IMMEDIATE'},
+    'fast': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 10000,
+             'cache_size': -64000, 'mmap_size': 256 * 2**20, 'temp_store': 'MEMORY',
+             'isolation_level': 'IMMEDIATE'},
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool():
+    ''' ConnectionPool keeps sqlite3 connections to one database file open
+        for reuse.  size is the number of idle connections kept around,
+        a size of 0 closes every connection after use.
+    '''
+
+    def __init__(self, dbfile, size=DEFAULT_POOL_SIZE, profile='default'):
+        self.dbfile = str(dbfile)
+        self.size = size
+        self.profile = profile
+        self.settings = to_settings(profile)
+        self.closed = False
+        self.users = 0
+        self.profiler = None
+        self.generations = {}
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _connect(self):
+        ''' open a new connection, it may be handed between threads
+            but is only ever used by one thread at a time '''
+        settings = dict(self.settings)
+        con = sqlite3.connect(self.dbfile, check_same_thread=False,
+                              isolation_level=settings.pop('isolation_level', ''))
+        for name, value in settings.items():
+            con.execute('PRAGMA %s=%s' % (name, value))
+        return con
+
+    def _acquire(self):
+        ''' take an idle connection or open a new one '''
+        with self._lock:
+            if self.closed:
+                raise sqlite3.ProgrammingError('Cannot operate on a closed connection pool.')
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, con):
+        ''' return a connection to the pool, closing it if the pool is full '''
+        with self._lock:
+            if not self.closed and len(self._idle) < self.size:
+                self._idle.append(con)
+                return
+        con.close()
+
+    def changed(self, table):
+        ''' count a committed write to table, see generation '''
+        with self._lock:
+            self.generations[table] = self.generations.get(table, 0) + 1
+
+    def generation(self, table):
+        ''' return the number of writes to table counted by changed(), a
+            cache of the table is out of date once this has moved on '''
+        return self.generations.get(table, 0)
+
+    def held(self):
+        ''' return the connection this thread is using, or None '''
+        return getattr(self._local, 'con', None)
+
+    @contextmanager
+    def connection(self, private=False):
+        ''' yield a connection for the calling thread.
+            The outermost block commits on success and rolls back on error.
+            A private connection is not shared with nested calls, which is
+            what long lived generators want so they never hold up a commit.
+        '''
+        profiler = self.profiler
+        con = self.held()
+        if con is not None:
+            yield con if profiler is None else profiler.wrap(con)
+            return
+        if profiler is not None:
+            start = time.perf_counter()
+        con = self._acquire()
+        if profiler is not None:
+            profiler.add_phase('connect', time.perf_counter() - start)
+        if not private:
+            self._local.con = con
+        try:
+            yield con if profiler is None else profiler.wrap(con)
+        except GeneratorExit:
+            con.commit()
+            raise
+        except BaseException:
+            con.rollback()
+            raise
+        else:
+            if profiler is None:
+                con.commit()
+            else:
+                start = time.perf_counter()
+                con.commit()
+                profiler.add_phase('commit', time.perf_counter() - start)
+        finally:
+            if not private:
+                self._local.con = None
+            self._release(con)
+
+    def release(self):
+        ''' give back a pool from get_pool, closing it if no one else uses it '''
+        with _pools_lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            # taken out of the registry at once so get_pool cannot hand it out again
+            if _pools.get(_pool_key(self.dbfile)) is self:
+                del _pools[_pool_key(self.dbfile)]
+        self.close()
+
+    def close(self):
+        ''' close the idle connections, connections in use are closed
+            when they are released '''
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for con in idle:
+            con.close()
+        with _pools_lock:
+            if _pools.get(_pool_key(self.dbfile)) is self:
+                del _pools[_pool_key(self.dbfile)]
+
+
+def to_settings(profile):
+    ''' return the PRAGMA settings for a profile name or dict '''
+    if isinstance(profile, dict):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError('unknown storage profile %r, expected one of %s'
+                         % (profile, ', '.join(PROFILES))) from None
+
+
+def _pool_key(dbfile):
+    return os.path.abspath(str(dbfile))
+
+
+def get_pool(dbfile, size=DEFAULT_POOL_SIZE, profile=None):
+    ''' return the shared pool for dbfile, creating it if needed.
+        profile None means whatever profile the pool already has, or default.
+        each call is a use of the pool to give back with its release()
+    '''
+    key = _pool_key(dbfile)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = ConnectionPool(dbfile, size, 'default' if profile is None else profile)
+            _pools[key] = pool
+        elif profile is not None and to_settings(profile) != pool.settings:
+            raise ValueError('%s is already open with storage profile %r'
+                             % (dbfile, pool.profile))
+        pool.users += 1
+        return pool
+
+
+def insert_many(con, sql, rows, batch_size, prepare=None):
+    ''' run the INSERT statement sql over an iterable of parameter tuples
+        with executemany, batch_size rows at a time, on the connection con.
+        prepare(con, batch), if given, is called before each batch is
+        inserted.  this returns the (first, last) rowids inserted, or None
+        if rows was empty.  Rowids are contiguous because con holds the
+        write lock for the whole insert.
+    '''
+    rows = iter(rows)
+    first = last = None
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        if prepare is not None:
+            prepare(con, batch)
+        con.executemany(sql, batch)
+        last = con.execute("SELECT last_insert_rowid()").fetchone()[0]
+        if first is None:
+            first = last - len(batch) + 1
+    return None if first is None else (first, last)
+
+
+def change_many(pool, sql, rowids, batch_size):
+    ''' run the DELETE or UPDATE statement sql over an iterable of
+        parameter tuples with executemany, batch_size rows at a time.
+        each batch is its own database transaction, unless the calling
+        thread already holds a connection, so other writers wait for one
+        batch at most.  this returns the number of rows changed
+    '''
+    rowids = iter(rowids)
+    changed = 0
+    while True:
+        batch = list(itertools.islice(rowids, batch_size))
+        if not batch:
+            return changed
+        with pool.connection() as con:
+            changed += con.executemany(sql, batch).rowcount
+
+
+def change_where(pool, table, where, params, apply, batch_size):
+    ''' call apply(con, rowids) on the rowids of the rows of table that
+        match the where clause, batch_size rows at a time in rowid order,
+        each batch in its own database transaction like change_many.
+        the next batch starts after the last rowid of the one before, so
+        rows that apply changes so that they no longer match are not
+        missed and rows are never visited twice.  this returns the sum of
+        what apply returns
+    '''
+    select = ("SELECT rowid FROM "+table+" "+(where+' AND ' if where else 'WHERE ')+
+              "rowid>=? ORDER BY rowid LIMIT ?")
+    after, changed = -2**63, 0
+    while True:
+        with pool.connection() as con:
+            rowids = [rowid for (rowid,) in con.execute(select, params+(after, batch_size))]
+            if not rowids:
+                return changed
+            changed += apply(con, rowids)
+        if len(rowids) < batch_size:
+            return changed
+        after = rowids[-1] + 1
@@ -0,0 +1,51 @@
+'''
+engines.py opens the Transaction and Category ORMs on a storage engine
+
+    'sqlite'  transaction.Transaction and category.Category, a database file
+    'memory'  memory.MemoryTransaction and memory.MemoryCategory, dicts in
+              this process, saved to a snapshot file on close
+
+Both engines have these methods and return the same rows from them, so
+the tracker and the tests can use either:
+
+    Transaction  select_all, select_page, add, add_many, update, delete,
+                 delete_many, summarize_by_date/month/year/category, iter_all,
+                 iter_by_date/month/year/category, iter_between,
+                 totals_by_month/year/category, daily_totals, close
+    Category     select_all, select_page, select_one, add, add_many,
+                 update, delete, delete_many, close
+
+The rest, like query(), delete_where, update_where, the rollups, the
+full-text search, profiling and export, is only in the SQLite engine.
+'''
+
+ENGINES = ('sqlite', 'memory')
+
+
+def _check(engine):
+    if engine not in ENGINES:
+        raise ValueError('no storage engine %r, use one of %s' % (engine, ', '.join(ENGINES)))
+
+
+def open_transaction(dbfile, engine='sqlite', **options):
+    ''' return the transactions of dbfile on an engine, options are passed
+        to the class of the engine '''
+    _check(engine)
+    # pylint: disable=import-outside-toplevel
+    if engine == 'memory':
+        from memory import MemoryTransaction
+        return MemoryTransaction(dbfile, **options)
+    from transaction import Transaction
+    return Transaction(dbfile, **options)
+
+
+def open_category(dbfile, engine='sqlite', **options):
+    ''' return the categories of dbfile on an engine, options are passed
+        to the class of the engine '''
+    _check(engine)
+    # pylint: disable=import-outside-toplevel
+    if engine == 'memory':
+        from memory import MemoryCategory
+        return MemoryCategory(dbfile, **options)
+    from category import Category
+    return Category(dbfile, **options)
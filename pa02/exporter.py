@@ -0,0 +1,335 @@
+'''
+exporter.py writes the transactions table to a file
+
+The rows are read from the cursor a chunk at a time and each chunk is
+written before the next is read, so memory use does not grow with the
+table.  The formats are
+
+    csv       one header line, then one line per transaction
+    jsonl     one JSON object per line (JSON Lines)
+    parquet   Apache Parquet, needs pyarrow
+    arrow     Apache Arrow IPC stream, needs pyarrow
+    binary    a compact columnar format that needs nothing, see below
+
+Without pyarrow a parquet or arrow export is written in the binary
+format instead, next to the file asked for with the suffix .trx, and a
+warning says so on stderr.
+
+The format is taken from the file suffix unless it is given.  csv, jsonl
+and binary files can be compressed with gzip, bz2 or xz, again chosen by
+suffix (march.csv.gz) or given; parquet and arrow pass the compression
+on to pyarrow as their codec (zstd, snappy, lz4, ...).
+
+    python exporter.py 2022.parquet --start 01-01-2022 --end 12-31-2022
+
+The binary format starts with the MAGIC line and then holds one block per
+chunk: the row count as a little endian uint32, the rowid column as int64,
+item_num and amount as float64 (NaN for NULL), then category, date and
+description each as a uint32 length per row (NO_TEXT for NULL) followed
+by the UTF-8 text.  read_binary reads it back.
+
+'''
+import argparse
+import bz2
+import csv
+import functools
+import gzip
+import io
+import json
+import lzma
+import os
+import struct
+import sys
+from array import array
+from transaction import COLUMNS, Transaction, to_filter
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+CHUNK_SIZE = 10000
+
+FIELDS = ('rowid', 'item_num', 'amount', 'category', 'date', 'description')
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet',
+           '.arrow': 'arrow', '.arrows': 'arrow', '.trx': 'binary'}
+# gzip's default level 9 is several times slower for a few percent smaller files
+COMPRESSORS = {'gzip': functools.partial(gzip.open, compresslevel=6),
+               'bz2': bz2.open, 'xz': lzma.open}
+SUFFIXES = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz'}
+
+MAGIC = b'TRACKER-EXPORT 1\n'
+NO_TEXT = 0xFFFFFFFF
+COUNT = struct.Struct('<I')
+
+
+def detect_format(path):
+    ''' return (format, compression) from a file name like march.csv.gz '''
+    base, ext = os.path.splitext(path.lower())
+    compression = SUFFIXES.get(ext)
+    if compression is not None:
+        ext = os.path.splitext(base)[1]
+    return FORMATS.get(ext, 'csv'), compression
+
+
+def require_pyarrow(fmt):
+    ''' raise ImportError if fmt needs pyarrow and it is not installed '''
+    if pyarrow is None:
+        raise ImportError('%s export needs pyarrow, install it with "pip install pyarrow" '
+                          'or export as binary' % fmt)
+
+
+def choose_format(path, fmt=None, compression=None):
+    ''' return the (path, format, compression) to export path as: taken
+        from the suffix of path when fmt or compression is None, and the
+        binary format in path.trx, with a warning on stderr, when the
+        format needs pyarrow and it is not installed '''
+    suffix_fmt, suffix_compression = detect_format(path)
+    fmt = fmt or suffix_fmt
+    if fmt not in WRITERS:
+        raise ValueError('unknown export format %r, use one of %s'
+                         % (fmt, ', '.join(sorted(WRITERS))))
+    if fmt in ('parquet', 'arrow') and pyarrow is None:
+        binary = os.path.splitext(path)[0]+'.trx'
+        print('%s export needs pyarrow, which is not installed, writing the binary '
+              'format to %s instead' % (fmt, binary), file=sys.stderr)
+        return binary, 'binary', None
+    return path, fmt, compression or (suffix_compression if fmt in ('csv', 'jsonl', 'binary')
+                                      else None)
+
+
+def fetch_chunks(transaction, where, params, chunk_size):
+    ''' yield lists of up to chunk_size row tuples in rowid order, read on a
+        private connection so a long export does not hold up other callers '''
+    with transaction.pool.connection(private=True) as con:
+        cur = con.execute("SELECT "+COLUMNS+" FROM transactions "+where+
+                          " ORDER BY rowid", params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+def open_binary(path, compression):
+    ''' open path for writing bytes, compressed if compression is set '''
+    if compression is None:
+        return open(path, 'wb')  # pylint: disable=consider-using-with
+    if compression not in COMPRESSORS:
+        raise ValueError('unknown compression %r, use one of %s'
+                         % (compression, ', '.join(sorted(COMPRESSORS))))
+    return COMPRESSORS[compression](path, 'wb')
+
+
+def open_text(path, compression):
+    ''' open path for writing text, compressed if compression is set '''
+    return io.TextIOWrapper(open_binary(path, compression), encoding='utf-8', newline='')
+
+
+def write_csv(path, chunks, compression):
+    ''' write the chunks as CSV with a header line '''
+    with open_text(path, compression) as output:
+        writer = csv.writer(output)
+        writer.writerow(FIELDS)
+        for rows in chunks:
+            writer.writerows(rows)
+
+
+def write_jsonl(path, chunks, compression):
+    ''' write the chunks as one JSON object per line '''
+    encode = json.JSONEncoder(ensure_ascii=False, check_circular=False).encode
+    with open_text(path, compression) as output:
+        for rows in chunks:
+            output.write(''.join([encode(dict(zip(FIELDS, row)))+'\n' for row in rows]))
+
+
+def to_record_batch(rows):
+    ''' return a chunk of rows as a pyarrow RecordBatch '''
+    columns = list(zip(*rows))
+    return pyarrow.RecordBatch.from_arrays(
+        [pyarrow.array(column, type=kind) for column, (_, kind) in zip(columns, arrow_schema())],
+        schema=arrow_schema())
+
+
+def arrow_schema():
+    ''' return the pyarrow schema of an export '''
+    return pyarrow.schema([('rowid', pyarrow.int64()), ('item_num', pyarrow.float64()),
+                           ('amount', pyarrow.float64()), ('category', pyarrow.string()),
+                           ('date', pyarrow.string()), ('description', pyarrow.string())])
+
+
+def write_parquet(path, chunks, compression):
+    ''' write the chunks as a Parquet file, one row group per chunk '''
+    require_pyarrow('parquet')
+    with pyarrow.parquet.ParquetWriter(path, arrow_schema(),
+                                       compression=compression or 'snappy') as writer:
+        for rows in chunks:
+            writer.write_batch(to_record_batch(rows))
+
+
+def write_arrow(path, chunks, compression):
+    ''' write the chunks as an Arrow IPC stream, one record batch per chunk '''
+    require_pyarrow('arrow')
+    options = pyarrow.ipc.IpcWriteOptions(compression=compression)
+    with pyarrow.OSFile(path, 'wb') as sink, \
+            pyarrow.ipc.new_stream(sink, arrow_schema(), options=options) as writer:
+        for rows in chunks:
+            writer.write_batch(to_record_batch(rows))
+
+
+def encode_texts(values):
+    ''' return the lengths and the bytes of a column of strings '''
+    encoded = [str(value).encode('utf-8') if value is not None else None for value in values]
+    lengths = array('I', [len(value) if value is not None else NO_TEXT for value in encoded])
+    return lengths, b''.join(value for value in encoded if value is not None)
+
+
+def to_floats(values):
+    ''' return a column of numbers as a float64 array, NULL becomes NaN '''
+    try:
+        return array('d', values)
+    except TypeError:
+        return array('d', [float('nan') if value is None else value for value in values])
+
+
+def write_binary(path, chunks, compression):
+    ''' write the chunks in the binary format described at the top '''
+    with open_binary(path, compression) as output:
+        output.write(MAGIC)
+        for rows in chunks:
+            rowids, item_nums, amounts, categories, dates, descriptions = zip(*rows)
+            numbers = [array('q', rowids), to_floats(item_nums), to_floats(amounts)]
+            if sys.byteorder == 'big':  # pragma: no cover
+                for column in numbers:
+                    column.byteswap()
+            output.write(COUNT.pack(len(rows)))
+            for column in numbers:
+                output.write(column.tobytes())
+            for column in (categories, dates, descriptions):
+                lengths, text = encode_texts(column)
+                if sys.byteorder == 'big':  # pragma: no cover
+                    lengths.byteswap()
+                output.write(lengths.tobytes())
+                output.write(text)
+
+
+def read_exact(stream, size):
+    ''' read exactly size bytes, raising ValueError on a short file '''
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError('binary export is truncated')
+    return data
+
+
+def read_array(stream, typecode, count):
+    ''' read count little endian values into an array '''
+    values = array(typecode)
+    values.frombytes(read_exact(stream, values.itemsize * count))
+    if sys.byteorder == 'big':  # pragma: no cover
+        values.byteswap()
+    return values
+
+
+def read_texts(stream, count):
+    ''' read a column of count strings '''
+    lengths = read_array(stream, 'I', count)
+    text = read_exact(stream, sum(length for length in lengths if length != NO_TEXT))
+    values, offset = [], 0
+    for length in lengths:
+        if length == NO_TEXT:
+            values.append(None)
+        else:
+            values.append(text[offset:offset+length].decode('utf-8'))
+            offset += length
+    return values
+
+
+def read_binary(path, compression=None):
+    ''' yield each row of a binary export as a tuple in FIELDS order,
+        compression is taken from the suffix if it is not given '''
+    if compression is None:
+        compression = detect_format(path)[1]
+    opener = COMPRESSORS[compression] if compression else open
+    with opener(path, 'rb') as stream:
+        if stream.read(len(MAGIC)) != MAGIC:
+            raise ValueError('%s is not a binary export' % path)
+        while True:
+            header = stream.read(COUNT.size)
+            if not header:
+                break
+            if len(header) != COUNT.size:
+                raise ValueError('binary export is truncated')
+            count = COUNT.unpack(header)[0]
+            columns = [read_array(stream, typecode, count) for typecode in 'qdd']
+            columns.extend(read_texts(stream, count) for _ in range(3))
+            yield from zip(*columns)
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl, 'parquet': write_parquet,
+           'arrow': write_arrow, 'binary': write_binary}
+
+
+def export(transaction, path, fmt=None, start=None, end=None, category=None,
+           compression=None, chunk_size=CHUNK_SIZE):
+    ''' write the transactions of transaction, a Transaction, to path and
+        return the number of rows written.
+        the file and its format and compression are those of choose_format,
+        and start, end and category limit the rows like
+        Transaction.totals_by_category does
+    '''
+    path, fmt, compression = choose_format(path, fmt, compression)
+    where, params = to_filter(start, end, category)
+    written = 0
+
+    def counted(chunks):
+        nonlocal written
+        for rows in chunks:
+            written += len(rows)
+            yield rows
+
+    WRITERS[fmt](path, counted(fetch_chunks(transaction, where, params, chunk_size)),
+                 compression)
+    return written
+
+
+def add_arguments(parser):
+    ''' add the export options to an argparse parser '''
+    parser.add_argument('path', help='the file to write, its suffix picks the format')
+    parser.add_argument('--format', choices=sorted(WRITERS), help='override the file suffix')
+    parser.add_argument('--compression',
+                        help='gzip, bz2 or xz, or a pyarrow codec for parquet and arrow')
+    parser.add_argument('--start', help='first date, MM-DD-YYYY')
+    parser.add_argument('--end', help='last date, MM-DD-YYYY')
+    parser.add_argument('--category', help='only this category')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+
+def run(transaction, args):
+    ''' export with the parsed arguments and print a summary, a bad date
+        or format is printed on stderr and returns 2 '''
+    try:
+        path, fmt, compression = choose_format(args.path, args.format, args.compression)
+        count = export(transaction, path, fmt, args.start, args.end, args.category,
+                       compression, args.chunk_size)
+    except (ImportError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 2
+    print('exported %d transactions to %s' % (count, path))
+    return 0
+
+
+def main(argv=None):
+    ''' export to the file named on the command line '''
+    parser = argparse.ArgumentParser(description='export the transactions in tracker.db')
+    parser.add_argument('--db', default='tracker.db')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    with Transaction(args.db) as transaction:
+        return run(transaction, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
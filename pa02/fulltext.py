@@ -0,0 +1,117 @@
+'''
+fulltext.py indexes the transaction descriptions with SQLite FTS5
+
+When search is enabled the transactions_fts virtual table indexes the
+description of every transaction.  It is an external content table, the
+text itself stays in the transactions table, and triggers keep the index
+in step as rows are inserted, updated and deleted.
+
+Queries use the FTS5 syntax: words must all match, "a phrase" matches
+words next to each other, a prefix ends with * and OR, NOT and
+parentheses combine them.  Results come best match first, ranked by
+bm25, or newest first.  Ranking has to score every match, so a word found
+in a large part of the table is much faster to search newest first.
+
+    pizza             descriptions containing the word pizza
+    piz*              words starting with piz
+    "corner cafe"     the phrase
+    gas OR parking    either word
+
+'''
+import sqlite3
+
+TABLE = 'transactions_fts'
+
+# (score of a match, order of the matches) for each search order, the
+# joined rows are sorted by score.  ranking scores every match, which takes
+# a few microseconds each, while the newest matches come straight from the
+# index in rowid order
+ORDERS = {'rank': ('rank', 'score'),
+          'newest': ('-rowid', 'rowid DESC')}
+
+TRIGGERS = ('transactions_fts_insert', 'transactions_fts_delete', 'transactions_fts_update')
+
+INSERT = '''INSERT INTO transactions_fts(rowid, description)
+            VALUES(new.rowid, new.description);'''
+
+DELETE = '''INSERT INTO transactions_fts(transactions_fts, rowid, description)
+            VALUES('delete', old.rowid, old.description);'''
+
+
+def is_available():
+    ''' return True if this SQLite was built with FTS5 '''
+    con = sqlite3.connect(':memory:')
+    try:
+        con.execute("CREATE VIRTUAL TABLE test USING fts5(text)")
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        con.close()
+    return True
+
+
+def is_enabled(con):
+    ''' return True if the search index exists '''
+    return con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                       (TABLE,)).fetchone() is not None
+
+
+def require_enabled(con):
+    ''' raise ValueError if search is not enabled '''
+    if not is_enabled(con):
+        raise ValueError('search is not enabled')
+
+
+def enable(con):
+    ''' create the search index and its triggers and index the transactions
+        already there.  enabling twice does nothing '''
+    if is_enabled(con):
+        return
+    # prefix indexes make two and three letter prefix queries index lookups
+    con.execute('''CREATE VIRTUAL TABLE transactions_fts USING fts5(
+                       description, content='transactions', content_rowid='rowid',
+                       tokenize='unicode61 remove_diacritics 2', prefix='2 3')''')
+    con.execute('''CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions
+                   BEGIN '''+INSERT+''' END''')
+    con.execute('''CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions
+                   BEGIN '''+DELETE+''' END''')
+    con.execute('''CREATE TRIGGER transactions_fts_update
+                   AFTER UPDATE OF description ON transactions
+                   BEGIN '''+DELETE+INSERT+''' END''')
+    rebuild(con)
+
+
+def disable(con):
+    ''' drop the search index and its triggers '''
+    for trigger in TRIGGERS:
+        con.execute("DROP TRIGGER IF EXISTS "+trigger)
+    con.execute("DROP TABLE IF EXISTS "+TABLE)
+
+
+def rebuild(con):
+    ''' index the descriptions again from the transactions table '''
+    require_enabled(con)
+    con.execute("INSERT INTO transactions_fts(transactions_fts) VALUES('rebuild')")
+
+
+def search(con, columns, query, limit, order='rank'):
+    ''' return the comma separated columns of up to limit transactions
+        matching query, best match first for order 'rank' and latest added
+        first for 'newest'.  a query that is not valid FTS5 raises
+        ValueError '''
+    require_enabled(con)
+    if order not in ORDERS:
+        raise ValueError('cannot order by %r, use one of %s' % (order, ', '.join(ORDERS)))
+    # plain column names are qualified, the subquery of the found rows has no rowid
+    columns = ', '.join('transactions.'+column if column.isidentifier() else column
+                        for column in (column.strip() for column in columns.split(',')))
+    score, order_by = ORDERS[order]
+    # only the limit rows found are joined with the transactions table
+    try:
+        return con.execute("SELECT "+columns+" FROM (SELECT rowid AS found, "+score+" AS score "
+                           "FROM transactions_fts WHERE transactions_fts MATCH ? "
+                           "ORDER BY "+order_by+" LIMIT ?) "
+                           "JOIN transactions ON transactions.rowid=found ORDER BY score",
+                           (query, limit)).fetchall()
+    except sqlite3.OperationalError as error:
+        raise ValueError('bad search %r: %s' % (query, error)) from error
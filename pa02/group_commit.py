@@ -0,0 +1,117 @@
+'''
+group_commit.py coalesces many single row adds into a few commits
+
+A GroupCommitWriter owns a background thread.  submit() puts a row on a
+queue and returns a concurrent.futures.Future; the thread writes the
+queue with the ORM's add_many once max_rows rows are waiting or the
+oldest has waited max_delay_ms, then resolves each future with its rowid.
+
+Durability is the caller's choice: a row is committed, and as durable as
+the storage profile's synchronous setting makes it, once its future has
+a result.  Callers that return before that, or never wait at all, can
+lose their queued rows if the process dies.  A batch that fails is
+rolled back and its rows are added again one at a time, so only the
+futures of the rows that fail on their own get the exception.
+
+'''
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+MAX_ROWS = 500
+MAX_DELAY_MS = 5
+
+_STOP = object()
+_FLUSH = object()
+
+
+class GroupCommitWriter():
+    ''' GroupCommitWriter writes rows for orm in groups on a background thread.
+        batches and rows count what it has written.
+    '''
+
+    def __init__(self, orm, max_rows=MAX_ROWS, max_delay_ms=MAX_DELAY_MS):
+        self.orm = orm
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self.batches = 0
+        self.rows = 0
+        self.closed = False
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        ''' queue item and return a Future for its rowid '''
+        if self.closed:
+            raise RuntimeError('cannot submit to a closed GroupCommitWriter')
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def flush(self):
+        ''' write everything queued so far and wait for the commit '''
+        if self.closed:
+            raise RuntimeError('cannot flush a closed GroupCommitWriter')
+        future = Future()
+        self._queue.put((_FLUSH, future))
+        future.result()
+
+    def close(self):
+        ''' write everything queued and stop the background thread '''
+        if not self.closed:
+            self.closed = True
+            self._queue.put((_STOP, None))
+            self._thread.join()
+
+    def _next_batch(self):
+        ''' wait for a row, then collect more until the batch is full or due.
+            this returns (batch, markers) where markers are the flush and
+            stop requests seen, which end the batch early
+        '''
+        first = self._queue.get()
+        if first[0] is _STOP or first[0] is _FLUSH:
+            return [], [first]
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_rows:
+            timeout = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=timeout) if timeout > 0 \
+                    else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry[0] is _STOP or entry[0] is _FLUSH:
+                return batch, [entry]
+            batch.append(entry)
+        return batch, []
+
+    def _write(self, batch):
+        ''' add a batch in one commit and resolve its futures.  add_many
+            rolls back a batch that fails, its rows are then written one by
+            one so that a bad row does not fail the rows queued with it '''
+        try:
+            first, _ = self.orm.add_many([item for item, _ in batch])
+        except Exception as error:  # pylint: disable=broad-except
+            if len(batch) == 1:
+                batch[0][1].set_exception(error)
+            else:
+                for entry in batch:
+                    self._write([entry])
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for offset, (_, future) in enumerate(batch):
+            future.set_result(first + offset)
+
+    def _run(self):
+        ''' the background thread '''
+        while True:
+            batch, markers = self._next_batch()
+            if batch:
+                self._write(batch)
+            for marker, future in markers:
+                if marker is _STOP:
+                    return
+                future.set_result(None)
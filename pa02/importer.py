@@ -0,0 +1,369 @@
+'''
+importer.py loads bank statements into the transactions table
+
+It reads CSV, OFX/QFX and QIF statements, plain or compressed with gzip,
+bz2 or xz, from files, directories and zip archives.  The statements are
+read as streams and cut into chunks of records; a process pool checks
+and normalizes the chunks, turning every date into the MM-DD-YYYY form
+the Transaction table expects; and each finished chunk is written with
+one add_many.  Only a few chunks per worker are in memory at a time, so
+the size of the archive does not matter.
+
+    python importer.py statements.zip march.csv --db tracker.db
+
+Records that cannot be read are counted as rejected and skipped.  Paths
+that cannot be read, and files named on the command line that are not
+statements, are reported and skipped, and the exit status is 1.
+
+'''
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import itertools
+import lzma
+import os
+import re
+import sys
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from transaction import Transaction
+
+CHUNK_SIZE = 5000
+DEFAULT_CATEGORY = 'uncategorized'
+MAX_ERRORS = 20
+
+FORMATS = {'.csv': 'csv', '.ofx': 'ofx', '.qfx': 'ofx', '.qif': 'qif'}
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+CSV_COLUMNS = {
+    'date': ['date', 'transaction date', 'posted date', 'posting date', 'post date'],
+    'amount': ['amount', 'transaction amount', 'value'],
+    'debit': ['debit', 'withdrawal'],
+    'credit': ['credit', 'deposit'],
+    'description': ['description', 'memo', 'payee', 'name', 'details', 'narrative'],
+    'category': ['category'],
+    'item_num': ['item_num', 'item #', 'item', 'check number', 'check', 'number', 'ref'],
+}
+
+DATE_FORMATS = [
+    (re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$'), ('y', 'm', 'd')),
+    (re.compile(r'^(\d{4})(\d{2})(\d{2})'), ('y', 'm', 'd')),
+    (re.compile(r"^(\d{1,2})[-/.](\d{1,2})[-/.'](\d{4}|\d{2})$"), ('m', 'd', 'y')),
+    (re.compile(r"^(\d{1,2})/\s*(\d{1,2})'\s*(\d{2,4})$"), ('m', 'd', 'y')),
+]
+
+OFX_TAG_RE = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def normalize_date(text):
+    ''' return a statement date as MM-DD-YYYY, or None if it cannot be read.
+        YYYY-MM-DD, YYYYMMDD (with an OFX time after it), MM/DD/YYYY,
+        MM-DD-YY and the QIF M/D'YY form are accepted '''
+    text = text.strip()
+    for pattern, order in DATE_FORMATS:
+        match = pattern.match(text)
+        if match:
+            parts = dict(zip(order, (int(part) for part in match.groups())))
+            year = parts['y'] + 2000 if parts['y'] < 100 else parts['y']
+            if 1 <= parts['m'] <= 12 and 1 <= parts['d'] <= 31:
+                return '%02d-%02d-%04d' % (parts['m'], parts['d'], year)
+            return None
+    return None
+
+
+def parse_amount(text):
+    ''' return a statement amount as a float, "(12.50)" is negative '''
+    text = text.strip().replace('$', '').replace(',', '')
+    if text.startswith('(') and text.endswith(')'):
+        return -float(text[1:-1])
+    return float(text)
+
+
+def detect_format(name):
+    ''' return csv, ofx or qif from a file name, ignoring a compression suffix '''
+    base, ext = os.path.splitext(name.lower())
+    if ext in OPENERS:
+        ext = os.path.splitext(base)[1]
+    return FORMATS.get(ext)
+
+
+def open_text(name, stream=None):
+    ''' open a statement as text, decompressing it if its name says so '''
+    ext = os.path.splitext(name.lower())[1]
+    if ext in OPENERS:
+        raw = OPENERS[ext](stream if stream is not None else name)
+    else:
+        raw = stream if stream is not None else open(name, 'rb')  # pylint: disable=consider-using-with
+    return io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def skip_message(path, error):
+    ''' return the message reporting a path skipped for an error '''
+    return '%s: %s' % (path, getattr(error, 'strerror', None) or error)
+
+
+def statements(paths, fmt=None, skipped=None, named=True):
+    ''' yield (name, text stream) for every statement in paths, looking
+        inside directories and zip archives.  without fmt only the files
+        whose extension detect_format knows are statements, with it every
+        file is.  a path that cannot be opened, or a file in paths that is
+        not a statement, is skipped with a message appended to the list
+        skipped, or raises OSError or ValueError if skipped is None.  the
+        other files of directories and archives are passed over silently,
+        named is False for them '''
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    yield from statements(sorted(os.path.join(root, name) for name in files),
+                                          fmt, skipped, False)
+            elif path.lower().endswith('.zip'):
+                with zipfile.ZipFile(path) as archive:
+                    for info in archive.infolist():
+                        if not info.is_dir() and (fmt or detect_format(info.filename)):
+                            with archive.open(info) as member:
+                                yield info.filename, open_text(info.filename, member)
+            elif fmt or detect_format(path):
+                with open_text(path) as stream:
+                    yield path, stream
+            elif named:
+                raise ValueError('not a CSV, OFX or QIF statement')
+        except (OSError, ValueError, zipfile.BadZipFile) as error:
+            if skipped is None:
+                raise
+            skipped.append(skip_message(path, error))
+
+
+def read_csv(stream):
+    ''' yield (columns, row) for each row, columns maps our names to indexes '''
+    reader = csv.reader(stream)
+    header = [name.strip().lower() for name in next(reader, [])]
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                columns[field] = header.index(alias)
+                break
+    for row in reader:
+        if row:
+            yield columns, row
+
+
+def read_ofx(stream):
+    ''' yield the text of each <STMTTRN> block '''
+    block = None
+    for line in stream:
+        upper = line.upper()
+        if '<STMTTRN>' in upper:
+            block = []
+        if block is not None:
+            block.append(line)
+            if '</STMTTRN>' in upper:
+                yield None, ''.join(block)
+                block = None
+
+
+def read_qif(stream):
+    ''' yield the lines of each record, records end with ^ '''
+    record = []
+    for line in stream:
+        line = line.rstrip('\r\n')
+        if line.startswith('^'):
+            if record:
+                yield None, record
+            record = []
+        elif line and not line.startswith('!'):
+            record.append(line)
+    if record:
+        yield None, record
+
+
+READERS = {'csv': read_csv, 'ofx': read_ofx, 'qif': read_qif}
+
+
+def csv_fields(columns, row):
+    ''' return the fields of a csv row '''
+    def get(field):
+        index = columns.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ''
+    amount = get('amount')
+    if not amount and (get('debit') or get('credit')):
+        amount = get('debit') or '-'+get('credit').lstrip('-')
+    return {'date': get('date'), 'amount': amount, 'description': get('description'),
+            'category': get('category'), 'item_num': get('item_num')}
+
+
+def ofx_fields(_, block):
+    ''' return the fields of an OFX transaction block '''
+    tags = {tag.upper(): value.strip() for tag, value in OFX_TAG_RE.findall(block)}
+    description = ' '.join(part for part in (tags.get('NAME'), tags.get('MEMO')) if part)
+    return {'date': tags.get('DTPOSTED', ''), 'amount': tags.get('TRNAMT', ''),
+            'description': description, 'category': '',
+            'item_num': tags.get('CHECKNUM', '')}
+
+
+def qif_fields(_, lines):
+    ''' return the fields of a QIF record '''
+    codes = {}
+    for line in lines:
+        codes.setdefault(line[0], line[1:].strip())
+    description = ' '.join(part for part in (codes.get('P'), codes.get('M')) if part)
+    return {'date': codes.get('D', ''), 'amount': codes.get('T', codes.get('U', '')),
+            'description': description, 'category': codes.get('L', ''),
+            'item_num': codes.get('N', '')}
+
+
+FIELDS = {'csv': csv_fields, 'ofx': ofx_fields, 'qif': qif_fields}
+
+
+def normalize_chunk(fmt, name, first, records, default_category=DEFAULT_CATEGORY):
+    ''' check and normalize a chunk of raw records from one statement.
+        first is the number of the first record in the statement.
+        this returns (transactions, errors) where errors are messages
+    '''
+    transactions, errors = [], []
+    for number, (columns, record) in enumerate(records, first):
+        fields = FIELDS[fmt](columns, record)
+        date = normalize_date(fields['date'])
+        if date is None:
+            errors.append('%s record %d: bad date %r' % (name, number, fields['date']))
+            continue
+        try:
+            amount = parse_amount(fields['amount'])
+            item_num = float(fields['item_num']) if fields['item_num'] else number
+        except ValueError:
+            errors.append('%s record %d: bad number in %r or %r'
+                          % (name, number, fields['amount'], fields['item_num']))
+            continue
+        transactions.append({'item_num': item_num, 'amount': amount,
+                             'category': fields['category'] or default_category,
+                             'date': date, 'description': fields['description']})
+    return transactions, errors
+
+
+def chunks(paths, chunk_size, fmt=None, skipped=None):
+    ''' yield (format, name, first record number, records) for every chunk
+        of every statement.  the statements that cannot be read, or only
+        in part, are reported in skipped, see statements '''
+    for name, stream in statements(paths, fmt, skipped):
+        file_fmt = fmt or detect_format(name)
+        records = READERS[file_fmt](stream)
+        first = 1
+        while True:
+            try:
+                chunk = list(itertools.islice(records, chunk_size))
+            except OSError as error:
+                if skipped is None:
+                    raise
+                skipped.append(skip_message(name, error))
+                break
+            if not chunk:
+                break
+            yield file_fmt, name, first, chunk
+            first += len(chunk)
+
+
+class InlineExecutor():
+    ''' runs submitted work immediately, for workers=0 '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    @staticmethod
+    def submit(func, *args):
+        ''' call func now and return a finished Future '''
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+
+def import_statements(transaction, paths, workers=None, chunk_size=CHUNK_SIZE, fmt=None,
+                      default_category=DEFAULT_CATEGORY, progress=None):
+    ''' import the statements in paths into transaction, a Transaction.
+        workers is the number of processes (None for one per core, 0 to
+        work in this process), fmt forces a format, and progress is called
+        with the running totals after each chunk is written.
+        this returns the totals, a dict with imported, rejected, chunks,
+        the first few error messages and the messages of the paths that
+        were skipped, see statements
+    '''
+    totals = {'imported': 0, 'rejected': 0, 'chunks': 0, 'errors': [], 'skipped': []}
+    executor = InlineExecutor() if workers == 0 else ProcessPoolExecutor(workers)
+    in_flight = deque()
+    limit = 2 * (workers or os.cpu_count() or 1)
+
+    def finish(future):
+        transactions, errors = future.result()
+        transaction.add_many(transactions)
+        totals['imported'] += len(transactions)
+        totals['rejected'] += len(errors)
+        totals['chunks'] += 1
+        totals['errors'].extend(errors[:MAX_ERRORS - len(totals['errors'])])
+        if progress is not None:
+            progress(totals)
+
+    with executor:
+        for chunk in chunks(paths, chunk_size, fmt, totals['skipped']):
+            in_flight.append(executor.submit(normalize_chunk, *chunk, default_category))
+            if len(in_flight) >= limit:
+                finish(in_flight.popleft())
+        while in_flight:
+            finish(in_flight.popleft())
+    return totals
+
+
+def print_progress(totals):
+    ''' report the running totals on stderr '''
+    print('\r%d imported, %d rejected' % (totals['imported'], totals['rejected']),
+          end='', file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    ''' import the statements named on the command line '''
+    parser = argparse.ArgumentParser(description='import bank statements into tracker.db')
+    parser.add_argument('--db', default='tracker.db')
+    parser.add_argument('--profile', default='fast')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    with Transaction(args.db, profile=args.profile) as transaction:
+        return run(transaction, args)
+
+
+def add_arguments(parser):
+    ''' add the import options to an argparse parser '''
+    parser.add_argument('paths', nargs='+',
+                        help='CSV, OFX or QIF statements, directories or zip archives')
+    parser.add_argument('--format', choices=sorted(READERS), help='override the file suffix')
+    parser.add_argument('--workers', type=int, help='worker processes, 0 for none')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--category', default=DEFAULT_CATEGORY,
+                        help='category for records that have none')
+
+
+def print_skipped(totals, file=None):
+    ''' report the paths that were skipped, on stderr unless file is given '''
+    for message in totals['skipped']:
+        print('skipped %s' % message, file=file or sys.stderr)
+
+
+def run(transaction, args):
+    ''' import with the parsed arguments and print a summary, returning 1 if
+        a path was skipped '''
+    totals = import_statements(transaction, args.paths, args.workers, args.chunk_size,
+                               args.format, args.category, print_progress)
+    print(file=sys.stderr)
+    for error in totals['errors']:
+        print(error, file=sys.stderr)
+    print_skipped(totals)
+    print('imported %d transactions, rejected %d' % (totals['imported'], totals['rejected']))
+    return 1 if totals['skipped'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,732 @@
+'''
+memory.py is an in-memory storage engine for the Transaction and Category ORMs
+
+MemoryTransaction and MemoryCategory have the methods of Transaction and
+Category, see engines.py, and return the same rows, but keep the data
+in Python dicts instead of SQLite.  Nothing is parsed or copied on a
+lookup, so reading a category or the transactions of a date takes
+microseconds, which suits tests and read heavy services.
+
+The two share a MemoryStore, like the SQLite ORMs share a connection
+pool.  The store indexes the transactions by category and by month in
+hash tables, and by date in a sorted list that is brought up to date on
+the first date query after a write.  Category names are looked up in a
+hash table too, and transactions refer to their category by id as in
+the SQLite tables, so renaming a category renames it everywhere.
+
+A store opened with a file name loads the snapshot in it, if there is
+one, and close() writes a new snapshot when anything changed.  The ORMs
+give back the store they opened with release(), which closes it once
+the last of them is done.
+snapshot() writes one at any time.  A snapshot is a pickle, written to a
+temporary file and renamed over the old one, so a crash leaves the old
+snapshot whole.  Only the rows are saved, the indexes are rebuilt on
+load.
+
+    with MemoryTransaction('tracker.snapshot') as trans:
+        trans.add_many(rows)
+        trans.summarize_by_category('food')
+
+'''
+import bisect
+import itertools
+import os
+import pickle
+import threading
+from category import ORDERS as CATEGORY_ORDERS, PAGE_SIZE as CATEGORY_PAGE_SIZE
+from category import CategoryRecord, to_cat_dict
+from transaction import (BATCH_SIZE, CHUNK_SIZE, ORDERS, PAGE_SIZE, TransactionRecord,
+                         to_changes, to_date_range, to_iso_date, to_trans_dict, to_trans_row)
+
+MAGIC = b'TRACKER-SNAPSHOT 1\n'
+
+# fields of a stored transaction
+ITEM_NUM, AMOUNT, CATEGORY_ID, DATE, DESCRIPTION, ISO_DATE = range(6)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def to_real(value):
+    ''' convert a number to float like a SQLite column of type real '''
+    if isinstance(value, (int, float)):
+        return float(value)
+    return value
+
+
+def null_first(value):
+    ''' return a sort key that puts None first, as SQL does '''
+    return (value is not None, value)
+
+
+class MemoryStore():
+    ''' MemoryStore holds the transactions and categories of one database
+        and their indexes.  Every method takes the lock, so one store can
+        be shared between threads
+    '''
+
+    def __init__(self, path=None):
+        self.path = None if path is None else str(path)
+        self.lock = threading.RLock()
+        self.changed = False
+        self.closed = False
+        self.users = 0
+        self.transactions = {}
+        self.categories = {}
+        if self.path is not None and os.path.exists(self.path):
+            self._load()
+        self._index()
+
+    def _load(self):
+        ''' read the snapshot in path '''
+        with open(self.path, 'rb') as snapshot:
+            if snapshot.read(len(MAGIC)) != MAGIC:
+                raise ValueError('%s is not a tracker snapshot' % self.path)
+            self.transactions, self.categories = pickle.load(snapshot)
+
+    def _index(self):
+        ''' build the indexes from the rows '''
+        self.names = {}
+        for category_id, (name, _) in self.categories.items():
+            self.names.setdefault(name, []).append(category_id)
+        self.by_category = {}
+        self.by_month = {}
+        for rowid, row in self.transactions.items():
+            if row[CATEGORY_ID] is not None and row[CATEGORY_ID] not in self.categories:
+                # left by a category deleted before delete_category cleared it
+                row = self.transactions[rowid] = row[:CATEGORY_ID] + (None,) + row[CATEGORY_ID+1:]
+            self._index_row(rowid, row)
+        self.dates = None
+        self.dates_sorted = False
+        self.rowids = None
+        self.orders = {}
+
+    def _index_row(self, rowid, row):
+        ''' add a transaction to the hash indexes, in rowid order because
+            rowids only grow '''
+        self.by_category.setdefault(row[CATEGORY_ID], {})[rowid] = None
+        self.by_month.setdefault(row[ISO_DATE][5:7], {})[rowid] = None
+
+    def snapshot(self, path=None):
+        ''' write the rows to path, by default the file the store was opened with '''
+        path = self.path if path is None else str(path)
+        with self.lock:
+            temp = path+'.tmp'
+            with open(temp, 'wb') as snapshot:
+                snapshot.write(MAGIC)
+                pickle.dump((self.transactions, self.categories), snapshot,
+                            pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, path)
+            if path == self.path:
+                self.changed = False
+
+    def release(self):
+        ''' give back a store from get_store, closing it if no one else uses it '''
+        with _stores_lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            if self.path is not None and _stores.get(_store_key(self.path)) is self:
+                del _stores[_store_key(self.path)]
+        self.close()
+
+    def close(self):
+        ''' write a snapshot if the store has a file and changed, and forget
+            the store so that opening the file again loads the snapshot '''
+        with self.lock:
+            if self.path is not None and self.changed:
+                self.snapshot()
+            self.closed = True
+        with _stores_lock:
+            if self.path is not None and _stores.get(_store_key(self.path)) is self:
+                del _stores[_store_key(self.path)]
+
+    # categories
+
+    def category_ids(self, name):
+        ''' return the ids of the categories called name '''
+        return self.names.get(name, ())
+
+    def category_name(self, category_id):
+        ''' return the name of a category, None if there is no such category '''
+        category = self.categories.get(category_id)
+        return None if category is None else category[0]
+
+    def add_category(self, name, desc):
+        ''' add a category and return its id, one more than the largest as
+            with an INTEGER PRIMARY KEY '''
+        category_id = max(self.categories, default=0) + 1
+        self.categories[category_id] = (name, desc)
+        self.names.setdefault(name, []).append(category_id)
+        self.changed = True
+        return category_id
+
+    def update_category(self, category_id, name, desc):
+        ''' rename or describe a category '''
+        old = self.categories.get(category_id)
+        if old is None:
+            return
+        self.names[old[0]].remove(category_id)
+        if not self.names[old[0]]:
+            del self.names[old[0]]
+        self.categories[category_id] = (name, desc)
+        self.names.setdefault(name, []).append(category_id)
+        self.changed = True
+
+    def delete_category(self, category_id):
+        ''' delete a category, its transactions are left without one, as the
+            trigger of the SQLite ORM does, so that they do not pass to a
+            category added later with the same id.  return False if there
+            was none '''
+        old = self.categories.pop(category_id, None)
+        if old is None:
+            return False
+        self.names[old[0]].remove(category_id)
+        if not self.names[old[0]]:
+            del self.names[old[0]]
+        rowids = self.by_category.pop(category_id, None)
+        if rowids:
+            for rowid in rowids:
+                row = self.transactions[rowid]
+                self.transactions[rowid] = row[:CATEGORY_ID] + (None,) + row[CATEGORY_ID+1:]
+            self.by_category[None] = dict.fromkeys(
+                sorted(itertools.chain(self.by_category.get(None, ()), rowids)))
+        self.changed = True
+        return True
+
+    # transactions
+
+    def find_category(self, name):
+        ''' return the id of the category called name, adding it if there is
+            none, or None if name is None '''
+        if name is None:
+            return None
+        ids = self.category_ids(name)
+        return min(ids) if ids else self.add_category(name, '')
+
+    def add_transaction(self, row):
+        ''' add the to_trans_row parameters of a transaction and return its
+            rowid, creating its category if there is none by that name '''
+        item_num, amount, name, date, description, iso_date = row
+        category_id = self.find_category(name)
+        rowid = (next(reversed(self.transactions)) if self.transactions else 0) + 1
+        stored = (to_real(item_num), to_real(amount), category_id, date, description, iso_date)
+        self.transactions[rowid] = stored
+        self._index_row(rowid, stored)
+        if self.dates is not None:
+            self.dates.append((iso_date, rowid))
+            self.dates_sorted = False
+        if self.rowids is not None:
+            self.rowids.append(rowid)
+        self.orders = {}
+        self.changed = True
+        return rowid
+
+    def delete_transaction(self, rowid):
+        ''' delete a transaction, return False if there was none '''
+        row = self.transactions.pop(rowid, None)
+        if row is None:
+            return False
+        del self.by_category[row[CATEGORY_ID]][rowid]
+        del self.by_month[row[ISO_DATE][5:7]][rowid]
+        self.dates = self.rowids = None
+        self.orders = {}
+        self.changed = True
+        return True
+
+    def update_transaction(self, rowid, changes):
+        ''' change some of the columns of a transaction, see
+            transaction.to_changes, return False if there was none '''
+        row = self.transactions.get(rowid)
+        if row is None:
+            return False
+        fields = list(row)
+        for column, value in changes.items():
+            if column == 'category':
+                fields[CATEGORY_ID] = self.find_category(value)
+            elif column == 'date':
+                fields[DATE], fields[ISO_DATE] = value, to_iso_date(value)
+            else:
+                field = {'item_num': ITEM_NUM, 'amount': AMOUNT, 'description': DESCRIPTION}[column]
+                fields[field] = value if field == DESCRIPTION else to_real(value)
+        # assigning keeps the place of the rowid in the rowid ordered dict
+        self.transactions[rowid] = tuple(fields)
+        for index, old, new in ((self.by_category, row[CATEGORY_ID], fields[CATEGORY_ID]),
+                                (self.by_month, row[ISO_DATE][5:7], fields[ISO_DATE][5:7])):
+            if old == new:
+                continue
+            del index[old][rowid]
+            rowids = index.setdefault(new, {})
+            in_order = not rowids or next(reversed(rowids)) < rowid
+            rowids[rowid] = None
+            if not in_order:
+                index[new] = dict.fromkeys(sorted(rowids))
+        self.dates = None
+        self.orders = {}
+        self.changed = True
+        return True
+
+    def sorted_rowids(self):
+        ''' return every rowid in order '''
+        if self.rowids is None:
+            self.rowids = list(self.transactions)
+        return self.rowids
+
+    def between_dates(self, first, last):
+        ''' return the rowids with first <= iso_date <= last, in rowid order '''
+        if self.dates is None:
+            self.dates = [(row[ISO_DATE], rowid) for rowid, row in self.transactions.items()]
+            self.dates_sorted = False
+        if not self.dates_sorted:
+            self.dates.sort()
+            self.dates_sorted = True
+        start = bisect.bisect_left(self.dates, (first,))
+        end = bisect.bisect_left(self.dates, (last+'\x00',))
+        return sorted(rowid for _, rowid in self.dates[start:end])
+
+    def page_keys(self, rowid, order):
+        ''' return the sort keys of a transaction in a page order of ORDERS '''
+        row = self.transactions[rowid]
+        return tuple(rowid if key == 'rowid' else row[ISO_DATE if key == 'iso_date' else AMOUNT]
+                     for key in ORDERS[order])
+
+    def order_index(self, order):
+        ''' return the rowids sorted in a page order, as (sort key, rowid)
+            pairs, sorting them on the first call after a write '''
+        index = self.orders.get(order)
+        if index is None:
+            index = self.orders[order] = sorted(
+                (tuple(map(null_first, self.page_keys(rowid, order))), rowid)
+                for rowid in self.transactions)
+        return index
+
+    def in_category(self, name):
+        ''' return the rowids of the transactions in the categories called name '''
+        ids = self.category_ids(name)
+        if len(ids) == 1:
+            return list(self.by_category.get(ids[0], ()))
+        return sorted(itertools.chain.from_iterable(self.by_category.get(category_id, ())
+                                                    for category_id in ids))
+
+    def to_tuple(self, rowid):
+        ''' return a transaction as the tuple the SQLite ORM reads '''
+        row = self.transactions[rowid]
+        return (rowid, row[ITEM_NUM], row[AMOUNT], self.category_name(row[CATEGORY_ID]),
+                row[DATE], row[DESCRIPTION])
+
+
+def _store_key(path):
+    return os.path.abspath(str(path))
+
+
+def get_store(path=None):
+    ''' return the shared store of a snapshot file, creating it if needed.
+        a store without a file is never shared.  each call is a use of the
+        store to give back with its release() '''
+    with _stores_lock:
+        if path is None:
+            store = MemoryStore()
+        else:
+            key = _store_key(path)
+            store = _stores.get(key)
+            if store is None or store.closed:
+                store = _stores[key] = MemoryStore(path)
+        store.users += 1
+        return store
+
+
+def row_compare(left, right):
+    ''' compare two rows of keys like SQL row values: return -1, 0 or 1,
+        or None when a NULL makes the comparison unknown '''
+    for left_key, right_key in zip(left, right):
+        if left_key is None or right_key is None:
+            return None
+        if left_key != right_key:
+            return -1 if left_key < right_key else 1
+    return 0
+
+
+def totals(keyed_rows):
+    ''' return (key, count, sum, avg, min, max) for each key of an iterable
+        of (key, amount) pairs, see group_totals '''
+    groups = {}
+    for key, amount in keyed_rows:
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = []
+        group.append(amount)
+    return group_totals(groups)
+
+
+def group_totals(groups):
+    ''' return (key, count, sum, avg, min, max) for each key of a dict of
+        lists of amounts, ordered by key, with SQL's handling of NULL '''
+    result = []
+    for key in sorted(groups, key=null_first):
+        amounts = [amount for amount in groups[key] if amount is not None]
+        total = sum(amounts) if amounts else None
+        result.append((key, len(groups[key]), total, total / len(amounts) if amounts else None,
+                       min(amounts, default=None), max(amounts, default=None)))
+    return result
+
+
+class MemoryTransaction():
+    ''' MemoryTransaction has the methods of Transaction with the rows in a
+        MemoryStore, that of the snapshot file dbfile if one is given '''
+
+    def __init__(self, dbfile=None, store=None, compact=False):
+        self.dbfile = dbfile
+        self.to_row = TransactionRecord if compact else to_trans_dict
+        self.store = store if store is not None else get_store(dbfile)
+        self.owns_store = store is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        ''' write the snapshot if there is a file and close the store, unless
+            the store was passed in or is still used by another ORM '''
+        if self.owns_store:
+            self.owns_store = False
+            self.store.release()
+
+    def snapshot(self, path=None):
+        ''' write the rows to path, by default dbfile '''
+        self.store.snapshot(path)
+
+    def _rows(self, rowids):
+        ''' return the transactions with rowids as a list of rows '''
+        with self.store.lock:
+            return [self.to_row(self.store.to_tuple(rowid)) for rowid in rowids]
+
+    def _iter(self, rowids, chunk_size):
+        ''' yield the transactions with rowids, reading chunk_size at a time '''
+        for start in range(0, len(rowids), chunk_size):
+            yield from self._rows(rowids[start:start+chunk_size])
+
+    def _matching(self, start=None, end=None, category=None):
+        ''' return the rowids of the transactions between the MM-DD-YYYY
+            dates start and end and in a category, all optional '''
+        to_date_range(start, end)
+        store = self.store
+        with store.lock:
+            if category is not None:
+                rowids = store.in_category(category)
+                if start is None and end is None:
+                    return rowids
+                first, last = to_iso_date(start) if start else '', to_iso_date(end) if end else None
+                return [rowid for rowid in rowids
+                        if first <= store.transactions[rowid][ISO_DATE] and
+                        (last is None or store.transactions[rowid][ISO_DATE] <= last)]
+            if start is None and end is None:
+                return list(store.sorted_rowids())
+            return store.between_dates(to_iso_date(start) if start else '',
+                                       to_iso_date(end) if end else '\U0010ffff')
+
+    def _by_date(self, date):
+        iso_date = to_iso_date(date)
+        store = self.store
+        with store.lock:
+            if iso_date:
+                return store.between_dates(iso_date, iso_date)
+            # a partial date falls back to a substring match, like LIKE
+            date = str(date).lower()
+            return [rowid for rowid, row in store.transactions.items()
+                    if row[DATE] is not None and date in str(row[DATE]).lower()]
+
+    def _by_month(self, month):
+        if not month.isdigit():
+            return []
+        with self.store.lock:
+            return list(self.store.by_month.get('%02d' % int(month), ()))
+
+    def _by_year(self, year):
+        if not year.isdigit():
+            return []
+        with self.store.lock:
+            return self.store.between_dates(year+'-01-01', year+'-12-31')
+
+    def _by_category(self, category):
+        with self.store.lock:
+            return self.store.in_category(category)
+
+    def select_all(self):
+        ''' return all of the transactions as a list of dicts.'''
+        with self.store.lock:
+            return self._rows(self.store.sorted_rowids())
+
+    def select_page(self, limit=PAGE_SIZE, after_rowid=None, order='rowid', descending=False,
+                    start=None, end=None, category=None, after_keys=None):
+        ''' return up to limit transactions in the order 'rowid', 'date' or
+            'amount', starting after the transaction after_rowid or the row
+            with the page_keys after_keys, see Transaction.select_page.  a
+            page is read from a sorted index of the order, starting where
+            the cursor row is or would be, found by bisection '''
+        if order not in ORDERS:
+            raise ValueError('cannot order by %r, use one of %s' % (order, ', '.join(ORDERS)))
+        store = self.store
+        with store.lock:
+            matching = None
+            if start is not None or end is not None or category is not None:
+                matching = set(self._matching(start, end, category))
+            index = store.order_index(order)
+            if after_keys is None and after_rowid is not None:
+                if order == 'rowid':
+                    after_keys = (after_rowid,)
+                elif after_rowid not in store.transactions:
+                    return []
+                else:
+                    after_keys = store.page_keys(after_rowid, order)
+            after = None if after_keys is None else tuple(after_keys)
+            if after is None:
+                position = len(index) if descending else 0
+            else:
+                cursor = (tuple(map(null_first, after)), after[-1])
+                find = bisect.bisect_left if descending else bisect.bisect_right
+                position = find(index, cursor)
+            positions = range(position-1, -1, -1) if descending else range(position, len(index))
+            rowids = []
+            for _, rowid in map(index.__getitem__, positions):
+                if len(rowids) == limit:
+                    break
+                if matching is not None and rowid not in matching:
+                    continue
+                # a NULL key compares as unknown in SQL, so it is never after the cursor
+                if after is not None and row_compare(store.page_keys(rowid, order), after) != (
+                        -1 if descending else 1):
+                    continue
+                rowids.append(rowid)
+            return self._rows(rowids)
+
+    def add(self, transaction):
+        ''' add a transaction and return its rowid '''
+        row = to_trans_row(transaction)
+        with self.store.lock:
+            return self.store.add_transaction(row)
+
+    def add_many(self, transactions, batch_size=BATCH_SIZE):
+        ''' add any iterable of transactions, batch_size rows at a time.
+            this returns the (first, last) rowids added, or None if there
+            were no transactions
+        '''
+        transactions = iter(transactions)
+        first = last = None
+        while True:
+            rows = [to_trans_row(trans) for trans in itertools.islice(transactions, batch_size)]
+            if not rows:
+                break
+            with self.store.lock:
+                for row in rows:
+                    last = self.store.add_transaction(row)
+                    if first is None:
+                        first = last
+        return None if first is None else (first, last)
+
+    def delete(self, rowid):
+        ''' delete a transaction with a specified rowid '''
+        with self.store.lock:
+            self.store.delete_transaction(rowid)
+
+    def update(self, rowid, changes):
+        ''' change some of the columns of a transaction, see Transaction.update '''
+        to_changes(changes)
+        with self.store.lock:
+            self.store.update_transaction(rowid, changes)
+
+    def delete_many(self, rowids, batch_size=BATCH_SIZE):
+        ''' delete the transactions with any iterable of rowids, taking the
+            lock for batch_size at a time, and return the number deleted '''
+        rowids = iter(rowids)
+        deleted = 0
+        for batch in iter(lambda: list(itertools.islice(rowids, batch_size)), []):
+            with self.store.lock:
+                deleted += sum(map(self.store.delete_transaction, batch))
+        return deleted
+
+    def summarize_by_date(self, date):
+        ''' return a list of transactions grouped by date '''
+        return self._rows(self._by_date(date))
+
+    def summarize_by_month(self, month):
+        '''return a list of transactions grouped by month from date'''
+        return self._rows(self._by_month(month))
+
+    def summarize_by_year(self, year):
+        '''return a list of transactions grouped by year from date'''
+        return self._rows(self._by_year(year))
+
+    def summarize_by_category(self, category):
+        '''return a list of transactions grouped by category'''
+        return self._rows(self._by_category(category))
+
+    def iter_all(self, chunk_size=CHUNK_SIZE):
+        ''' yield all of the transactions, chunk_size at a time '''
+        with self.store.lock:
+            rowids = list(self.store.sorted_rowids())
+        return self._iter(rowids, chunk_size)
+
+    def iter_by_date(self, date, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions on a date '''
+        return self._iter(self._by_date(date), chunk_size)
+
+    def iter_by_month(self, month, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions in a month of any year '''
+        return self._iter(self._by_month(month), chunk_size)
+
+    def iter_by_year(self, year, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions in a year '''
+        return self._iter(self._by_year(year), chunk_size)
+
+    def iter_by_category(self, category, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions in a category '''
+        return self._iter(self._by_category(category), chunk_size)
+
+    def iter_between(self, start=None, end=None, category=None, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions between the MM-DD-YYYY dates start and
+            end and in a category, all optional '''
+        return self._iter(self._matching(start, end, category), chunk_size)
+
+    def _totals(self, rowids, key):
+        ''' return totals of the transactions with rowids grouped by key(row) '''
+        transactions = self.store.transactions
+        with self.store.lock:
+            return totals((key(transactions[rowid]), transactions[rowid][AMOUNT])
+                          for rowid in rowids)
+
+    def totals_by_month(self, year):
+        '''return (month, count, sum, avg, min, max) for each month of a year'''
+        return self._totals(self._by_year(year), lambda row: row[ISO_DATE][5:7])
+
+    def totals_by_year(self):
+        '''return (year, count, sum, avg, min, max) for each year'''
+        with self.store.lock:
+            return totals((row[ISO_DATE][:4], row[AMOUNT])
+                          for row in self.store.transactions.values() if row[ISO_DATE])
+
+    def totals_by_category(self, start=None, end=None):
+        '''return (category, count, sum, avg, min, max) for each category,
+           optionally between the MM-DD-YYYY dates start and end'''
+        store = self.store
+        with store.lock:
+            if start is None and end is None:
+                transactions = store.transactions
+                by_id = group_totals({category_id: [transactions[rowid][AMOUNT] for rowid in rowids]
+                                      for category_id, rowids in store.by_category.items()
+                                      if rowids})
+            else:
+                by_id = self._totals(self._matching(start, end), lambda row: row[CATEGORY_ID])
+            # grouped by id like the SQLite ORM, then named and sorted by name
+            named = [(store.category_name(group[0]),) + group[1:] for group in by_id]
+        return sorted(named, key=lambda group: null_first(group[0]))
+
+    def daily_totals(self, start, end):
+        '''return (date, count, sum, avg, min, max) for each day between the
+           MM-DD-YYYY dates start and end'''
+        rowids = [rowid for rowid in self._matching(start, end)
+                  if self.store.transactions[rowid][ISO_DATE]]
+        by_day = self._totals(rowids, lambda row: row[ISO_DATE])
+        return [('%s-%s-%s' % (group[0][5:7], group[0][8:10], group[0][:4]),) + group[1:]
+                for group in by_day]
+
+
+class MemoryCategory():
+    ''' MemoryCategory has the methods of Category with the rows in a
+        MemoryStore, that of the snapshot file dbfile if one is given '''
+
+    def __init__(self, dbfile=None, store=None, compact=False):
+        self.dbfile = dbfile
+        self.to_row = CategoryRecord if compact else to_cat_dict
+        self.store = store if store is not None else get_store(dbfile)
+        self.owns_store = store is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        ''' write the snapshot if there is a file and close the store, unless
+            the store was passed in or is still used by another ORM '''
+        if self.owns_store:
+            self.owns_store = False
+            self.store.release()
+
+    def _rows(self, category_ids):
+        categories = self.store.categories
+        return [self.to_row((category_id,) + categories[category_id])
+                for category_id in category_ids]
+
+    def select_all(self):
+        ''' return all of the categories as a list of dicts.'''
+        with self.store.lock:
+            return self._rows(sorted(self.store.categories))
+
+    def select_page(self, limit=CATEGORY_PAGE_SIZE, after_rowid=None, order='rowid'):
+        ''' return up to limit categories in the order 'rowid' or 'name',
+            starting after the category after_rowid, see Category.select_page '''
+        if order not in CATEGORY_ORDERS:
+            raise ValueError('cannot order by %r, use one of %s'
+                             % (order, ', '.join(CATEGORY_ORDERS)))
+        categories = self.store.categories
+
+        def keys(category_id):
+            return (category_id,) if order == 'rowid' else (categories[category_id][0],
+                                                            category_id)
+
+        with self.store.lock:
+            category_ids = sorted(categories, key=keys)
+            if after_rowid is not None:
+                if after_rowid not in categories:
+                    return []
+                after = keys(after_rowid)
+                category_ids = [category_id for category_id in category_ids
+                                if keys(category_id) > after]
+            return self._rows(category_ids[:limit])
+
+    def select_one(self, rowid):
+        ''' return a category with a specified rowid '''
+        with self.store.lock:
+            if rowid not in self.store.categories:
+                raise IndexError('no category with rowid %r' % (rowid,))
+            return self._rows([rowid])[0]
+
+    def add(self, item):
+        ''' add a category and return its rowid '''
+        with self.store.lock:
+            return self.store.add_category(item['name'], item['desc'])
+
+    def add_many(self, items, batch_size=BATCH_SIZE):
+        ''' add any iterable of categories.  this returns the (first, last)
+            rowids added, or None if there were no categories '''
+        items = iter(items)
+        rowids = None
+        for batch in iter(lambda: list(itertools.islice(items, batch_size)), []):
+            with self.store.lock:
+                for item in batch:
+                    rowid = self.store.add_category(item['name'], item['desc'])
+                    rowids = (rowid, rowid) if rowids is None else (rowids[0], rowid)
+        return rowids
+
+    def update(self, rowid, item):
+        ''' rename or describe a category '''
+        with self.store.lock:
+            self.store.update_category(rowid, item['name'], item['desc'])
+
+    def delete(self, rowid):
+        ''' delete a category with a specified rowid '''
+        with self.store.lock:
+            self.store.delete_category(rowid)
+
+    def delete_many(self, rowids, batch_size=BATCH_SIZE):
+        ''' delete the categories with any iterable of rowids, taking the
+            lock for batch_size at a time, and return the number deleted '''
+        rowids = iter(rowids)
+        deleted = 0
+        for batch in iter(lambda: list(itertools.islice(rowids, batch_size)), []):
+            with self.store.lock:
+                deleted += sum(map(self.store.delete_category, batch))
+        return deleted
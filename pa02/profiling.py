@@ -0,0 +1,404 @@
+'''
+profiling.py measures where the time goes inside the ORMs
+
+Profiling is off unless it is asked for, and costs nothing then.
+
+    profiler = Profiler(slow_ms=20, explain=True)
+    instrument(transaction, profiler)
+    instrument(category, profiler)
+    ...
+    print(profiler.report())
+
+instrument() wraps the public methods of one ORM object and gives its
+connection pool the profiler.  Each call is then split into phases:
+
+    connect  taking a connection from the pool, or opening one
+    execute  sqlite3 running statements up to their first row
+    fetch    reading the rest of the rows
+    python   everything else, mostly turning rows into dicts
+    commit   committing at the end of the outermost call
+
+Every distinct statement is counted with its time and rows, and with
+explain=True its EXPLAIN QUERY PLAN is captured the first time it runs.
+Statements slower than slow_ms go to the slow query log, a bounded list
+that is also written to the 'tracker.slow' logger.
+
+Sinks are callables that get an event dict after every call
+({'event': 'call', 'method', 'seconds', 'phases', 'rows'}) and every slow
+statement ({'event': 'slow', 'method', 'sql', 'params', 'seconds',
+'plan'}).  prometheus() dumps the counters in the Prometheus text format.
+
+'''
+import functools
+import inspect
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+PHASES = ('connect', 'execute', 'fetch', 'python', 'commit')
+SLOW_LOG_SIZE = 100
+FETCH_SIZE = 256
+
+# statements whose plans are not worth asking for
+NO_PLAN_RE = re.compile(r'^\s*(PRAGMA|CREATE|DROP|ALTER|BEGIN|COMMIT|ROLLBACK|EXPLAIN)\b',
+                        re.IGNORECASE)
+
+logger = logging.getLogger('tracker.slow')
+
+
+def one_line(sql):
+    ''' return sql with its whitespace collapsed '''
+    return ' '.join(sql.split())
+
+
+class Call():
+    ''' the measurements of one ORM method call in progress '''
+    __slots__ = ('method', 'start', 'phases', 'rows', 'inner', 'statements')
+
+    def __init__(self, method):
+        self.method = method
+        self.start = time.perf_counter()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.rows = 0
+        self.inner = 0.0
+        self.statements = {}
+
+
+class Profiler():
+    ''' Profiler collects the timings of instrumented ORMs.
+        methods maps 'Class.method' to its totals, statements maps each SQL
+        statement to its totals and plan, and slow is the slow query log
+    '''
+
+    def __init__(self, slow_ms=100, explain=True, sinks=(), slow_log_size=SLOW_LOG_SIZE):
+        self.slow_seconds = slow_ms / 1000
+        self.explain = explain
+        self.sinks = list(sinks)
+        self.methods = {}
+        self.statements = {}
+        self.slow = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def add_sink(self, sink):
+        ''' call sink(event) for every call and slow statement from now on '''
+        self.sinks.append(sink)
+
+    def wrap(self, con):
+        ''' return con wrapped to time its statements '''
+        return ProfiledConnection(self, con)
+
+    def reset(self):
+        ''' forget everything measured so far '''
+        with self._lock:
+            self.methods.clear()
+            self.statements.clear()
+            self.slow.clear()
+
+    def _stack(self):
+        ''' return the calls in progress on this thread, innermost last '''
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self):
+        ''' return the innermost call in progress on this thread, or None '''
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def begin(self, method):
+        ''' start measuring a call and return it '''
+        call = Call(method)
+        self._stack().append(call)
+        return call
+
+    def resume(self, call):
+        ''' continue measuring a call, for generators that are resumed '''
+        self._stack().append(call)
+        return time.perf_counter()
+
+    def pause(self, call, resumed):
+        ''' stop measuring a resumed call for now '''
+        self._stack().pop()
+        call.start -= time.perf_counter() - resumed
+
+    def end(self, call, seconds=None):
+        ''' finish a call and record it, seconds is its total if it was resumed '''
+        stack = self._stack()
+        stack.pop()
+        if seconds is None:
+            seconds = time.perf_counter() - call.start
+        if stack:
+            stack[-1].inner += seconds
+        measured = sum(call.phases.values())
+        call.phases['python'] = max(0.0, seconds - measured - call.inner)
+        with self._lock:
+            totals = self.methods.get(call.method)
+            if totals is None:
+                totals = self.methods[call.method] = {
+                    'calls': 0, 'seconds': 0.0, 'rows': 0, 'phases': dict.fromkeys(PHASES, 0.0)}
+            totals['calls'] += 1
+            totals['seconds'] += seconds
+            totals['rows'] += call.rows
+            for phase, value in call.phases.items():
+                totals['phases'][phase] += value
+        self._emit({'event': 'call', 'method': call.method, 'seconds': seconds,
+                    'phases': call.phases, 'rows': call.rows})
+        for sql, (params, elapsed, plan) in call.statements.items():
+            if elapsed >= self.slow_seconds:
+                self._slow(call.method, sql, params, elapsed, plan)
+
+    def add_phase(self, phase, seconds):
+        ''' add time to a phase of the current call '''
+        call = self.current()
+        if call is not None:
+            call.phases[phase] += seconds
+
+    def add_statement(self, con, sql, params, seconds, rows, phase):
+        ''' record time spent running or fetching from a statement '''
+        sql = one_line(sql)
+        call = self.current()
+        with self._lock:
+            totals = self.statements.get(sql)
+            if totals is None:
+                totals = self.statements[sql] = {'calls': 0, 'seconds': 0.0, 'rows': 0,
+                                                 'plan': None}
+            if phase == 'execute':
+                totals['calls'] += 1
+            totals['seconds'] += seconds
+            totals['rows'] += rows
+            need_plan = self.explain and totals['plan'] is None and con is not None
+        if need_plan:
+            plan = explain(con, sql, params)
+            with self._lock:
+                totals['plan'] = plan
+        if call is not None:
+            call.phases[phase] += seconds
+            call.rows += rows
+            _, elapsed, _ = call.statements.get(sql, (params, 0.0, None))
+            call.statements[sql] = (params, elapsed + seconds, totals['plan'])
+
+    def _slow(self, method, sql, params, seconds, plan):
+        ''' log a slow statement '''
+        event = {'event': 'slow', 'method': method, 'sql': sql, 'params': params,
+                 'seconds': seconds, 'plan': plan}
+        with self._lock:
+            self.slow.append(event)
+        logger.info('%.1f ms in %s: %s %r', seconds * 1000, method, sql, params)
+        self._emit(event)
+
+    def _emit(self, event):
+        ''' pass an event to the sinks '''
+        for sink in self.sinks:
+            sink(event)
+
+    def report(self, statements=10):
+        ''' return the measurements as text, with the slowest statements '''
+        lines = ["%-34s %7s %10s %9s %8s " % ('method', 'calls', 'total ms', 'mean ms', 'rows') +
+                 ' '.join('%8s' % phase for phase in PHASES)]
+        lines.append('-' * len(lines[0]))
+        with self._lock:
+            methods = sorted(self.methods.items(), key=lambda item: -item[1]['seconds'])
+            slowest = sorted(self.statements.items(), key=lambda item: -item[1]['seconds'])
+            slow = list(self.slow)
+        for method, totals in methods:
+            lines.append("%-34s %7d %10.2f %9.3f %8d " % (
+                method, totals['calls'], totals['seconds'] * 1000,
+                totals['seconds'] * 1000 / totals['calls'], totals['rows']) +
+                         ' '.join('%7.0f%%' % (100 * totals['phases'][phase] /
+                                               (totals['seconds'] or 1)) for phase in PHASES))
+        if slowest:
+            lines += ['', "%7s %10s %8s  %s" % ('calls', 'total ms', 'rows', 'statement')]
+        for sql, totals in slowest[:statements]:
+            lines.append("%7d %10.2f %8d  %s" % (totals['calls'], totals['seconds'] * 1000,
+                                                 totals['rows'], sql))
+            lines += ['%28s %s' % ('', step) for step in totals['plan'] or ()]
+        if slow:
+            lines += ['', 'slow statements (over %g ms)' % (self.slow_seconds * 1000)]
+        for event in slow:
+            lines.append("%10.2f ms %s: %s %r" % (event['seconds'] * 1000, event['method'],
+                                                  event['sql'], event['params']))
+        return '\n'.join(lines)
+
+    def prometheus(self):
+        ''' return the counters in the Prometheus text exposition format '''
+        lines = []
+
+        def metric(name, kind, text, samples):
+            lines.extend(['# HELP %s %s' % (name, text), '# TYPE %s %s' % (name, kind)])
+            lines.extend('%s{%s} %r' % (name, ','.join('%s="%s"' % (key, escape(value))
+                                                       for key, value in labels), value)
+                         for labels, value in samples)
+
+        with self._lock:
+            methods = sorted(self.methods.items())
+            statements = sorted(self.statements.items())
+            slow = len(self.slow)
+        metric('tracker_method_calls_total', 'counter', 'ORM method calls',
+               [((('method', method),), totals['calls']) for method, totals in methods])
+        metric('tracker_method_seconds_total', 'counter', 'time in ORM methods by phase',
+               [((('method', method), ('phase', phase)), totals['phases'][phase])
+                for method, totals in methods for phase in PHASES])
+        metric('tracker_method_rows_total', 'counter', 'rows read or written by ORM methods',
+               [((('method', method),), totals['rows']) for method, totals in methods])
+        metric('tracker_statement_calls_total', 'counter', 'SQL statement executions',
+               [((('sql', sql),), totals['calls']) for sql, totals in statements])
+        metric('tracker_statement_seconds_total', 'counter', 'time running SQL statements',
+               [((('sql', sql),), totals['seconds']) for sql, totals in statements])
+        lines += ['# HELP tracker_slow_statements statements in the slow query log',
+                  '# TYPE tracker_slow_statements gauge', 'tracker_slow_statements %d' % slow]
+        return '\n'.join(lines)+'\n'
+
+
+def escape(value):
+    ''' escape a Prometheus label value '''
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def explain(con, sql, params):
+    ''' return the EXPLAIN QUERY PLAN of a statement as a list of lines,
+        or None for statements that have no interesting plan '''
+    if NO_PLAN_RE.match(sql):
+        return None
+    try:
+        rows = con.execute('EXPLAIN QUERY PLAN '+sql, params).fetchall()
+    except Exception:  # pylint: disable=broad-except
+        return None
+    depth = {0: 0}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, 0) + 1
+        lines.append('  ' * (depth[node] - 1) + detail)
+    return lines
+
+
+class ProfiledCursor():
+    ''' a sqlite3 cursor that times its fetches '''
+
+    def __init__(self, profiler, con, cursor, sql, params):
+        self._profiler = profiler
+        self._con = con
+        self._cursor = cursor
+        self._sql = sql
+        self._params = params
+
+    def _fetch(self, fetch, *args):
+        start = time.perf_counter()
+        result = fetch(*args)
+        rows = len(result) if isinstance(result, list) else int(result is not None)
+        self._profiler.add_statement(None, self._sql, self._params,
+                                     time.perf_counter() - start, rows, 'fetch')
+        return result
+
+    def fetchall(self):
+        ''' fetch the remaining rows '''
+        return self._fetch(self._cursor.fetchall)
+
+    def fetchmany(self, size=None):
+        ''' fetch the next size rows '''
+        return self._fetch(self._cursor.fetchmany,
+                           self._cursor.arraysize if size is None else size)
+
+    def fetchone(self):
+        ''' fetch the next row '''
+        return self._fetch(self._cursor.fetchone)
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ProfiledConnection():
+    ''' a sqlite3 connection that times its statements '''
+
+    def __init__(self, profiler, con):
+        self._profiler = profiler
+        self._con = con
+
+    def execute(self, sql, params=()):
+        ''' run a statement and return a ProfiledCursor '''
+        start = time.perf_counter()
+        cursor = self._con.execute(sql, params)
+        rows = cursor.rowcount if cursor.rowcount > 0 else 0
+        self._profiler.add_statement(self._con, sql, params, time.perf_counter() - start,
+                                     rows, 'execute')
+        return ProfiledCursor(self._profiler, self._con, cursor, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        ''' run a statement for each set of parameters '''
+        seq_of_params = list(seq_of_params)
+        start = time.perf_counter()
+        cursor = self._con.executemany(sql, seq_of_params)
+        self._profiler.add_statement(self._con, sql, seq_of_params[0] if seq_of_params else (),
+                                     time.perf_counter() - start, max(cursor.rowcount, 0),
+                                     'execute')
+        return ProfiledCursor(self._profiler, self._con, cursor, sql, ())
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+
+def profiled(profiler, method, func):
+    ''' return func wrapped to measure its calls as method '''
+
+    def measure_generator(call, generator):
+        seconds = 0.0
+        try:
+            while True:
+                resumed = profiler.resume(call)
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    seconds += time.perf_counter() - resumed
+                    profiler.pause(call, resumed)
+                yield item
+        finally:
+            profiler.resume(call)
+            generator.close()
+            profiler.end(call, seconds)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        call = profiler.begin(method)
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            profiler.end(call)
+            raise
+        if inspect.isgenerator(result):
+            profiler.pause(call, call.start)
+            return measure_generator(call, result)
+        profiler.end(call)
+        return result
+    return wrapper
+
+
+def instrument(orm, profiler):
+    ''' measure the public methods of orm, a Transaction or Category, and
+        its connection pool with profiler '''
+    orm.pool.profiler = profiler
+    prefix = type(orm).__name__+'.'
+    for name, func in inspect.getmembers(orm, inspect.ismethod):
+        if not name.startswith('_') and not name.endswith('_profiling') and name != 'close':
+            setattr(orm, name, profiled(profiler, prefix+name, func))
+    orm.profiler = profiler
+    return profiler
+
+
+def uninstrument(orm):
+    ''' stop measuring orm '''
+    for name in [name for name in vars(orm) if hasattr(vars(orm)[name], '__wrapped__')]:
+        delattr(orm, name)
+    orm.pool.profiler = None
+    orm.profiler = None
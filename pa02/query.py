@@ -0,0 +1,182 @@
+'''
+query.py builds filtered queries of the transactions
+
+Transaction.query() returns a Query of every transaction.  Each method
+returns a new Query with one more filter, so a query can be kept and
+narrowed in different ways:
+
+    dining = trans.query().category('dining')
+    big_q1 = dining.between('01-01-2022', '03-31-2022').amount(50)
+    big_q1.order_by('amount', descending=True).limit(10).all()
+    big_q1.totals()                 (count, sum, avg, min, max)
+    big_q1.totals('month')          the same for each month
+    for row in dining.iter(): ...   streamed, like Transaction.iter_between
+
+All the filters of a query go into one WHERE clause with a parameter for
+each value, so SQLite can use the date, category or amount index for
+the most selective filter.  The SQL of each shape of query, which filters
+it has and not their values, is built once and cached, and as the text
+of the statement is then always the same sqlite3 reuses the statement it
+prepared for it the first time.
+'''
+import functools
+from transaction import CATEGORY, CHUNK_SIZE, COLUMNS, ORDERS, TOTALS, to_iso_date
+
+# the key of each totals grouping: (the key shown, the key grouped and ordered by)
+GROUPS = {
+    'category': (CATEGORY, 'category_id'),
+    'year': ("substr(iso_date, 1, 4)", "substr(iso_date, 1, 4)"),
+    'month': ("substr(iso_date, 6, 2)||'-'||substr(iso_date, 1, 4)",
+              "substr(iso_date, 1, 7)"),
+    'date': ("substr(iso_date, 6, 2)||'-'||substr(iso_date, 9, 2)||'-'||"
+             "substr(iso_date, 1, 4)", 'iso_date'),
+}
+
+
+@functools.lru_cache(maxsize=256)
+def compile_where(has_start, has_end, categories, has_minimum, has_maximum):
+    ''' return the WHERE clause for a shape of query, categories is the
+        number of category names or None for any category '''
+    clauses = []
+    if has_start:
+        clauses.append('iso_date>=?')
+    if has_end:
+        clauses.append('iso_date<=?')
+    if categories is not None:
+        clauses.append('category_id IN (SELECT id FROM categories WHERE name IN (%s))'
+                       % ','.join('?' * categories) if categories else '0')
+    if has_minimum:
+        clauses.append('amount>=?')
+    if has_maximum:
+        clauses.append('amount<=?')
+    return 'WHERE '+' AND '.join(clauses) if clauses else ''
+
+
+@functools.lru_cache(maxsize=256)
+def compile_select(where, order, descending, has_limit):
+    ''' return the SELECT statement of the rows matching a WHERE clause '''
+    direction = ' DESC' if descending else ''
+    return ('SELECT '+COLUMNS+' FROM transactions '+where+' ORDER BY '+
+            ', '.join(key+direction for key in ORDERS[order])+(' LIMIT ?' if has_limit else ''))
+
+
+def to_date(date):
+    ''' convert a MM-DD-YYYY date to YYYY-MM-DD, raising ValueError if it is not one '''
+    iso_date = to_iso_date(date)
+    if not iso_date:
+        raise ValueError('%r is not a MM-DD-YYYY date' % (date,))
+    return iso_date
+
+
+class Query():
+    ''' Query is a filtered query of the transactions of a Transaction,
+        see the module docstring '''
+
+    def __init__(self, transaction):
+        self.transaction = transaction
+        self.start = self.end = None
+        self.categories = None
+        self.minimum = self.maximum = None
+        self.order = 'rowid'
+        self.descending = False
+        self.max_rows = None
+
+    def _with(self, **changes):
+        ''' return a copy of this query with some attributes changed '''
+        query = Query.__new__(Query)
+        query.__dict__.update(self.__dict__, **changes)
+        return query
+
+    def between(self, start=None, end=None):
+        ''' only the transactions between the MM-DD-YYYY dates start and end,
+            inclusive, either may be None '''
+        return self._with(start=None if start is None else to_date(start),
+                          end=None if end is None else to_date(end))
+
+    def category(self, name=None, in_=None):
+        ''' only the transactions in the category name, or in any of the
+            categories named in in_ '''
+        if (name is None) == (in_ is None):
+            raise ValueError('give a category name or in_, a list of names')
+        return self._with(categories=(name,) if in_ is None else tuple(in_))
+
+    def amount(self, minimum=None, maximum=None):
+        ''' only the transactions with minimum <= amount <= maximum, either
+            may be None.  transactions without an amount never match '''
+        return self._with(minimum=minimum, maximum=maximum)
+
+    def order_by(self, order='rowid', descending=False):
+        ''' sort the rows by 'rowid', 'date' or 'amount' '''
+        if order not in ORDERS:
+            raise ValueError('cannot order by %r, use one of %s' % (order, ', '.join(ORDERS)))
+        return self._with(order=order, descending=descending)
+
+    def limit(self, max_rows):
+        ''' return at most max_rows rows, None for all of them '''
+        return self._with(max_rows=max_rows)
+
+    def where(self):
+        ''' return the WHERE clause and parameters of the filters '''
+        where = compile_where(self.start is not None, self.end is not None,
+                              None if self.categories is None else len(self.categories),
+                              self.minimum is not None, self.maximum is not None)
+        params = tuple(value for value in (self.start, self.end) if value is not None)
+        params += self.categories or ()
+        params += tuple(value for value in (self.minimum, self.maximum) if value is not None)
+        return where, params
+
+    def compile(self):
+        ''' return the SELECT statement and parameters of the rows '''
+        where, params = self.where()
+        sql = compile_select(where, self.order, self.descending, self.max_rows is not None)
+        return sql, params if self.max_rows is None else params+(self.max_rows,)
+
+    def all(self):
+        ''' return the matching transactions as a list of rows '''
+        sql, params = self.compile()
+        with self.transaction.pool.connection() as con:
+            tuples = con.execute(sql, params).fetchall()
+        return list(map(self.transaction.to_row, tuples))
+
+    def iter(self, chunk_size=CHUNK_SIZE):
+        ''' yield the matching transactions, reading chunk_size rows at a
+            time on a private connection '''
+        sql, params = self.compile()
+        with self.transaction.pool.connection(private=True) as con:
+            cur = con.execute(sql, params)
+            while True:
+                tuples = cur.fetchmany(chunk_size)
+                if not tuples:
+                    break
+                yield from map(self.transaction.to_row, tuples)
+
+    def __iter__(self):
+        return self.iter()
+
+    def count(self):
+        ''' return the number of matching transactions, the order and limit
+            do not apply '''
+        where, params = self.where()
+        with self.transaction.pool.connection() as con:
+            return con.execute('SELECT count(*) FROM transactions '+where, params).fetchone()[0]
+
+    def totals(self, group=None):
+        ''' return (count, sum, avg, min, max) of the matching transactions,
+            or with group, one of 'category', 'year', 'month' or 'date', a list
+            of (key, count, sum, avg, min, max) for each group.  the order
+            and limit do not apply, and the transactions without a date are
+            left out of the groups by date '''
+        where, params = self.where()
+        if group is None:
+            with self.transaction.pool.connection() as con:
+                return con.execute('SELECT '+TOTALS+' FROM transactions '+where,
+                                   params).fetchone()
+        if group not in GROUPS:
+            raise ValueError('cannot total by %r, use one of %s' % (group, ', '.join(GROUPS)))
+        key, group_by = GROUPS[group]
+        if group != 'category':
+            where = (where+' AND ' if where else 'WHERE ')+"iso_date>''"
+        with self.transaction.pool.connection() as con:
+            return con.execute('SELECT '+key+', '+TOTALS+' FROM transactions '+where+
+                               ' GROUP BY '+group_by+' ORDER BY '+
+                               ('1' if group == 'category' else group_by), params).fetchall()
@@ -0,0 +1,76 @@
+'''
+records.py has the compact row type the ORMs can return instead of dicts
+
+A Record is a tuple underneath, so a row costs one small tuple rather
+than a dict, but it reads like the dicts the ORMs have always returned:
+
+    row['amount'], row.get('desc'), row.keys(), row.values(), row.items()
+
+and it compares equal to the dict with the same keys and values.
+
+'''
+from collections.abc import Mapping
+
+
+class Record(tuple):
+    ''' Record is a read only row with dict style access by field name.
+        subclasses set fields to the names of the columns in order
+    '''
+    __slots__ = ()
+    fields = ()
+    _index = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._index = {field: i for i, field in enumerate(cls.fields)}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._index[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self.fields == other.fields and tuple.__eq__(self, other)
+        if isinstance(other, Mapping):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = tuple.__hash__
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.to_dict())
+
+    def keys(self):
+        ''' return the field names '''
+        return self.fields
+
+    def values(self):
+        ''' return the values as a plain tuple '''
+        return tuple.__getitem__(self, slice(None))
+
+    def items(self):
+        ''' return (field, value) pairs '''
+        return tuple(zip(self.fields, self.values()))
+
+    def get(self, key, default=None):
+        ''' return the value of a field, or default if there is no such field '''
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def to_dict(self):
+        ''' return the row as a dict '''
+        return dict(zip(self.fields, self.values()))
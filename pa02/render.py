@@ -0,0 +1,182 @@
+'''
+render.py prints tables of transactions, categories and totals
+
+A Renderer formats rows a batch at a time and writes each batch as one
+string, so printing a million transactions takes a thousand writes
+rather than a million print calls.  The rows can come from a list or an
+iterator and are never all held at once.
+
+The width of each column is found from the first rows, a sample of
+sample_size.  Later rows that are wider push the columns after them to
+the right rather than being cut.  Numbers are right aligned, a missing
+number is an empty cell.  Each row is formatted with one printf style
+template, and only a row with a missing number or a value of the wrong
+kind is formatted a cell at a time.
+
+When the output is a terminal and the table is longer than the screen,
+it goes through a pager, $PAGER or less, which quits by itself when the
+table fits.  With count_only the rows are counted and not printed.
+
+    render.default.print_table(render.TRANSACTIONS, trans.iter_all())
+'''
+import itertools
+import operator
+import os
+import shlex
+import sys
+
+BATCH_SIZE = 1000
+SAMPLE_SIZE = 100
+PAGER = 'less -FRSX'
+
+# the columns of each table: (header, key in the row, kind of value)
+TRANSACTIONS = (('id', 'rowid', 'int'), ('item #', 'item_num', 'number'),
+                ('amount', 'amount', 'number'), ('category', 'category', 'text'),
+                ('date', 'date', 'text'), ('description', 'description', 'text'))
+CATEGORIES = (('id', 'rowid', 'int'), ('name', 'name', 'text'), ('description', 'desc', 'text'))
+
+
+def totals_columns(key):
+    ''' return the columns of (key, count, sum, avg, min, max) tuples '''
+    return ((key, 0, 'text'), ('count', 1, 'int'), ('total', 2, 'money'),
+            ('average', 3, 'money'), ('min', 4, 'money'), ('max', 5, 'money'))
+
+
+# the printf conversion of each kind of value, whole numbers are shown
+# without a fraction by %g, like the amounts typed in
+FORMATS = {'int': 'd', 'number': '.15g', 'money': '.2f', 'text': 's'}
+
+
+def to_cell(kind, value):
+    ''' format one value, a missing number as an empty cell and a value of
+        the wrong kind as it is '''
+    if value is None:
+        return '' if kind != 'text' else 'None'
+    try:
+        return ('%'+FORMATS[kind]) % value
+    except TypeError:
+        return str(value)
+
+
+class Renderer():
+    ''' Renderer prints tables to out, sys.stdout by default.  pager is a
+        command, None for $PAGER or less when out is a terminal, or False
+        for never '''
+
+    def __init__(self, out=None, pager=None, count_only=False, batch_size=BATCH_SIZE,
+                 sample_size=SAMPLE_SIZE):
+        self.out = out
+        self.pager = pager
+        self.count_only = count_only
+        self.batch_size = batch_size
+        self.sample_size = sample_size
+
+    def print_table(self, columns, rows, noun='items', before=''):
+        ''' print rows, dicts or tuples, as a table of columns, see
+            TRANSACTIONS, after the text before, and return the number of
+            rows '''
+        rows = iter(rows)
+        out = self.out or sys.stdout
+        if self.count_only:
+            count = sum(1 for _ in rows)
+            out.write('%d %s\n' % (count, noun))
+            return count
+        lines = self._screen_lines(out)
+        first = list(itertools.islice(rows, max(self.sample_size, lines)))
+        if not first:
+            out.write('no %s to print\n' % noun)
+            return 0
+        template, cells, header = self._layout(columns, first[:self.sample_size])
+        getter = operator.itemgetter(*[key for _, key, _ in columns])
+        kinds = [kind for _, _, kind in columns]
+
+        def slow_line(values):
+            ''' format a row with a None or a value of the wrong kind '''
+            try:
+                return template % values
+            except TypeError:
+                return cells % tuple(map(to_cell, kinds, values))
+        count = 0
+        # a table that fits on the screen is written straight to the terminal
+        pager = self._open_pager(out) if len(first) + 3 > lines > 0 else None
+        stream = out if pager is None else pager.stdin
+        try:
+            stream.write(before+header)
+            for batch in itertools.chain([first], iter(
+                    lambda: list(itertools.islice(rows, self.batch_size)), [])):
+                # each row is one % of the template, only rows that it
+                # cannot format take the slow way
+                try:
+                    text = ''.join([template % values for values in map(getter, batch)])
+                except TypeError:
+                    text = ''.join(map(slow_line, map(getter, batch)))
+                stream.write(text)
+                count += len(batch)
+            stream.flush()
+        except BrokenPipeError:
+            # the pager was quit before the end
+            pass
+        finally:
+            if pager is not None:
+                close_pager(pager)
+        return count
+
+    def _layout(self, columns, sample):
+        ''' return the line template of the values, that of the cells from
+            to_cell, and the header lines, for columns sized to fit a sample
+            of the rows '''
+        getter = operator.itemgetter(*[key for _, key, _ in columns])
+        widths = [len(header) for header, _, _ in columns]
+        for index, (values, (_, _, kind)) in enumerate(zip(zip(*map(getter, sample)), columns)):
+            widths[index] = max([widths[index]] + [len(to_cell(kind, value))
+                                                   for value in values])
+        values, cells = [], []
+        for number, ((_, _, kind), width) in enumerate(zip(columns, widths)):
+            if kind != 'text':
+                values.append('%%%d%s' % (width, FORMATS[kind]))
+                cells.append('%%%ds' % width)
+            elif number == len(columns) - 1:
+                # no padding after the last column
+                values.append('%s')
+                cells.append('%s')
+            else:
+                values.append('%%-%ds' % width)
+                cells.append('%%-%ds' % width)
+        header = ' '.join(cells) % tuple(name for name, _, _ in columns)
+        return (' '.join(values)+'\n', ' '.join(cells)+'\n',
+                header.rstrip()+'\n'+'-'*(sum(widths) + len(widths) - 1)+'\n')
+
+    def _screen_lines(self, out):
+        ''' return the height of the terminal out is, 0 if out is not one
+            or there is no pager '''
+        if self.pager is False:
+            return 0
+        try:
+            if not out.isatty():
+                return 0
+            return os.get_terminal_size(out.fileno()).lines
+        except (AttributeError, OSError, ValueError):
+            return 0
+
+    def _open_pager(self, out):
+        ''' start the pager and return its process, or None if it cannot be run '''
+        import subprocess  # pylint: disable=import-outside-toplevel
+        command = self.pager or os.environ.get('PAGER') or PAGER
+        try:
+            return subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE,
+                                    encoding=getattr(out, 'encoding', None) or 'utf-8')
+        except OSError:
+            return None
+
+
+def close_pager(pager):
+    ''' close the input of a pager and wait for it to be quit '''
+    try:
+        pager.stdin.close()
+    except BrokenPipeError:
+        pass
+    pager.wait()
+
+
+# the renderer the tracker prints with
+default = Renderer()
@@ -0,0 +1,144 @@
+'''
+rollup.py keeps per (year, month, category) totals of the transactions table
+
+When rollups are enabled the transaction_rollups table holds the count
+and the sum of the amounts of every (year, month, category), and
+triggers on the transactions table keep it up to date as rows are
+inserted, updated and deleted, whichever code does it.  Queries over
+years of data then read a few hundred rollup rows instead of millions of
+transactions.
+
+Rollups are kept by category_id, so renaming a category changes no
+rollup rows.  Rows without a readable date are counted under year '' and
+month '', and rows without a category under category_id 0, which reads
+back as the category ''.  Only counts and sums can be maintained this
+way, so the rollup queries return (key, count, sum, avg) without the min
+and max of the Transaction totals methods.
+
+The queries work whether or not rollups are enabled, they group the
+transactions table when they are not.  rebuild recomputes the table and
+check compares it with the transactions table.
+
+'''
+
+TABLE = 'transaction_rollups'
+
+TRIGGERS = ('transactions_rollup_insert', 'transactions_rollup_delete',
+            'transactions_rollup_update')
+
+# the rollup rows computed from the transactions table
+GROUPED = '''SELECT substr(iso_date, 1, 4) AS year, substr(iso_date, 6, 2) AS month,
+                    ifnull(category_id, 0) AS category_id, count(*) AS count,
+                    total(amount) AS total
+             FROM transactions GROUP BY 1, 2, 3'''
+
+# the category name of a rollup row
+CATEGORY = "ifnull((SELECT name FROM categories WHERE id=category_id), '')"
+
+# relative difference between a maintained and a recomputed sum that is
+# put down to floating point rounding
+TOLERANCE = 1e-9
+
+ADD = '''INSERT INTO transaction_rollups
+         VALUES(substr({row}.iso_date, 1, 4), substr({row}.iso_date, 6, 2),
+                ifnull({row}.category_id, 0), 1, ifnull({row}.amount, 0))
+         ON CONFLICT(year, month, category_id)
+         DO UPDATE SET count=count+1, total=total+excluded.total;'''
+
+REMOVE = '''UPDATE transaction_rollups SET count=count-1, total=total-ifnull(old.amount, 0)
+            WHERE year=substr(old.iso_date, 1, 4) AND month=substr(old.iso_date, 6, 2)
+              AND category_id=ifnull(old.category_id, 0);
+            DELETE FROM transaction_rollups
+            WHERE year=substr(old.iso_date, 1, 4) AND month=substr(old.iso_date, 6, 2)
+              AND category_id=ifnull(old.category_id, 0) AND count<=0;'''
+
+
+def is_enabled(con):
+    ''' return True if the rollup table exists '''
+    return con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                       (TABLE,)).fetchone() is not None
+
+
+def enable(con):
+    ''' create the rollup table and its triggers, filling the table from the
+        transactions already there.  enabling twice does nothing '''
+    if is_enabled(con):
+        return
+    con.execute('''CREATE TABLE transaction_rollups
+                   (year text, month text, category_id integer, count integer, total real,
+                    PRIMARY KEY(year, month, category_id)) WITHOUT ROWID''')
+    con.execute('''CREATE TRIGGER transactions_rollup_insert AFTER INSERT ON transactions
+                   BEGIN '''+ADD.format(row='new')+''' END''')
+    con.execute('''CREATE TRIGGER transactions_rollup_delete AFTER DELETE ON transactions
+                   BEGIN '''+REMOVE+''' END''')
+    con.execute('''CREATE TRIGGER transactions_rollup_update
+                   AFTER UPDATE OF amount, category_id, iso_date ON transactions
+                   BEGIN '''+REMOVE+ADD.format(row='new')+''' END''')
+    rebuild(con)
+
+
+def disable(con):
+    ''' drop the rollup table and its triggers '''
+    for trigger in TRIGGERS:
+        con.execute("DROP TRIGGER IF EXISTS "+trigger)
+    con.execute("DROP TABLE IF EXISTS "+TABLE)
+
+
+def require_enabled(con):
+    ''' raise ValueError if rollups are not enabled '''
+    if not is_enabled(con):
+        raise ValueError('rollups are not enabled')
+
+
+def rebuild(con):
+    ''' recompute the rollup table from the transactions table '''
+    require_enabled(con)
+    con.execute("DELETE FROM "+TABLE)
+    con.execute("INSERT INTO "+TABLE+" "+GROUPED)
+
+
+def check(con):
+    ''' return (year, month, category name, (count, sum) in the rollup table,
+        (count, sum) of the transactions) for every rollup row that is
+        wrong, missing or extra.  an empty list means the table is right '''
+    require_enabled(con)
+    rollups = {row[:3]: row[3:] for row in con.execute("SELECT * FROM "+TABLE)}
+    expected = {row[:3]: row[3:] for row in con.execute(GROUPED)}
+    names = dict(con.execute("SELECT id, name FROM categories"))
+    errors = []
+    for key in sorted(rollups.keys() | expected.keys()):
+        have, want = rollups.get(key), expected.get(key)
+        if have is None or want is None or have[0] != want[0] or \
+                abs(have[1] - want[1]) > TOLERANCE * max(1, abs(want[1])):
+            errors.append(key[:2] + (names.get(key[2], ''), have, want))
+    return errors
+
+
+def source(con):
+    ''' return the rollup table, or the query that computes it if rollups
+        are not enabled '''
+    return TABLE if is_enabled(con) else '('+GROUPED+')'
+
+
+def totals(con, key, where='', params=()):
+    ''' return (key, count, sum, avg) for each group of rollup rows '''
+    return con.execute("SELECT "+key+", sum(count), sum(total), sum(total)/sum(count) "
+                       "FROM "+source(con)+" "+where+" GROUP BY 1 ORDER BY 1",
+                       params).fetchall()
+
+
+def totals_by_month(con, year):
+    ''' return (month, count, sum, avg) for each month of a year '''
+    return totals(con, 'month', 'WHERE year=?', (year,))
+
+
+def totals_by_year(con):
+    ''' return (year, count, sum, avg) for each year '''
+    return totals(con, 'year', "WHERE year>''")
+
+
+def totals_by_category(con, year=None):
+    ''' return (category, count, sum, avg) for each category, optionally in one year '''
+    if year is None:
+        return totals(con, CATEGORY)
+    return totals(con, CATEGORY, 'WHERE year=?', (year,))
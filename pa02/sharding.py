@@ -0,0 +1,440 @@
+'''
+sharding.py splits the transactions across one database file per year
+
+A ShardedTransaction has the methods of a Transaction that engines.py
+lists for every storage engine, but the transactions of each year are
+kept in a database file of their own next to dbfile, tracker.2022.db,
+tracker.2023.db and so on, with the rows whose date cannot be read in
+tracker.undated.db.  dbfile itself keeps anything
+that is not a transaction, such as the categories, and its pool is the
+ShardedTransaction's pool so a Category can share it.  Each shard keeps
+its own categories table with the categories its transactions name, so
+renaming a category in dbfile does not rename it in the shards.
+
+Every shard is a small database: vacuuming, backing up or rebuilding
+the indexes of one year does not touch the others, writers to different
+years do not wait for each other, and a query of one year or date only
+opens that year's file.
+
+Rowids stay unique across the shards because each shard numbers its
+rows from year * SHARD_SPAN + 1, so the shard of a rowid is rowid //
+SHARD_SPAN and sorting by rowid sorts by shard first.  Lists of rows from
+several shards come in rowid order like a Transaction's, which for
+sharded data is year by year rather than the order they were added.
+
+A few methods differ from a Transaction's.  add_many returns a list of
+(first, last) rowids, one for each shard it added to, since the rowids
+of one call are not a single range.  update returns the rowid of the
+transaction, which is a new one when a new date moves it to the shard
+of another year.  The SQLite only methods, query(), delete_where,
+update_where, the rollups, search and export, are not available.
+
+Queries that need every shard run in a pool of worker processes, one
+shard per task, and the results are merged.  With workers=0, or when a
+query needs only one shard, everything runs in the calling process.
+Sending rows back from a worker costs about as much as reading them,
+so it is the totals and the selective queries that gain from more cores,
+and select_all reads the shards one after another in this process.
+
+    with ShardedTransaction('tracker.db') as trans:
+        trans.add_many(rows)
+        trans.summarize_by_year('2022')       # opens tracker.2022.db only
+        trans.totals_by_category()            # one task per shard
+
+'''
+import glob
+import itertools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from connection import ConnectionPool, get_pool
+from transaction import (BATCH_SIZE, CATEGORY, CHUNK_SIZE, COLUMNS, ORDERS, PAGE_SIZE,
+                         Transaction, add_categories, page_filter, to_changes, to_date_range,
+                         to_filter, to_iso_date, to_trans_dict, to_trans_row)
+
+# the rowids of the shard of year y are y * SHARD_SPAN + 1 onwards
+SHARD_SPAN = 10**10
+
+UNDATED = 0
+
+# numbering a shard's rows after its base needs the rowid given
+# explicitly, SQLite would start an empty table from 1
+INSERT = '''INSERT INTO transactions
+            (rowid, item_num, amount, category_id, date, description, iso_date)
+            VALUES((SELECT ifnull(max(rowid), ?) + 1 FROM transactions), ?, ?,
+                   (SELECT min(id) FROM categories WHERE name=?), ?, ?, ?)'''
+
+SHARD_RE = re.compile(r'^(\d{4}|undated)$')
+
+# the Transactions opened by this worker process, by shard file
+_worker_shards = {}
+
+
+def to_year(transaction):
+    ''' return the year of the shard for a transaction dict '''
+    iso_date = to_iso_date(transaction['date'])
+    return int(iso_date[:4]) if iso_date else UNDATED
+
+
+def shard_of(rowid):
+    ''' return the year of the shard holding rowid '''
+    return rowid // SHARD_SPAN
+
+
+def shard_path(dbfile, year):
+    ''' return the database file of a year's shard '''
+    stem, ext = os.path.splitext(str(dbfile))
+    return '%s.%s%s' % (stem, 'undated' if year == UNDATED else '%04d' % year, ext or '.db')
+
+
+def find_shards(dbfile):
+    ''' return {year: path} for the shard files of dbfile '''
+    stem, ext = os.path.splitext(str(dbfile))
+    shards = {}
+    for path in glob.glob(glob.escape(stem)+'.*'+(ext or '.db')):
+        name = path[len(stem)+1:len(path)-len(ext or '.db')]
+        if SHARD_RE.match(name):
+            shards[UNDATED if name == 'undated' else int(name)] = path
+    return shards
+
+
+def run_on_shard(path, compact, func, args):
+    ''' return func(shard, *args) for the shard in path, in a worker process.
+        each worker opens its own connections, never the ones it may have
+        inherited from the process that started it '''
+    shard = _worker_shards.get(path)
+    if shard is None:
+        shard = _worker_shards[path] = Transaction(path, pool=ConnectionPool(path),
+                                                   compact=compact)
+    return func(shard, *args)
+
+
+def category_totals(shard, start, end):
+    ''' return (category, count, sum, count of amounts, min, max) for each
+        category of a shard, which unlike the average can be merged '''
+    where, params = to_date_range(start, end)
+    with shard.pool.connection() as con:
+        return con.execute("SELECT "+CATEGORY+", count(*), sum(amount), count(amount), "
+                           "min(amount), max(amount) FROM transactions "+where+
+                           " GROUP BY category_id ORDER BY 1", params).fetchall()
+
+
+def select_page(shard, where, params, limit):
+    ''' return up to limit transactions of a shard matching the where clause
+        of page_filter '''
+    with shard.pool.connection() as con:
+        tuples = con.execute("SELECT "+COLUMNS+" FROM transactions "+where+" LIMIT ?",
+                             params+(limit,)).fetchall()
+    return list(map(shard.to_row, tuples))
+
+
+def merge_totals(results):
+    ''' merge the lists of category_totals from several shards into
+        (key, count, sum, avg, min, max) sorted by key like SQL would '''
+    groups = {}
+    for totals in results:
+        for row in totals:
+            groups.setdefault(row[0], []).append(row[1:])
+    merged = []
+    for key in sorted(groups, key=lambda key: (key is not None, key)):
+        counts, sums, amounts, lows, highs = zip(*groups[key])
+        sums = [value for value in sums if value is not None]
+        total = sum(sums) if sums else None
+        lows = [value for value in lows if value is not None]
+        highs = [value for value in highs if value is not None]
+        merged.append((key, sum(counts), total, total / sum(amounts) if sums else None,
+                       min(lows, default=None), max(highs, default=None)))
+    return merged
+
+
+class ShardedTransaction():
+    ''' ShardedTransaction is a Transaction whose rows are split into one
+        database file per year.  workers is the number of processes for
+        the queries that read every shard, None for one per CPU and 0 to
+        run them in this process
+    '''
+
+    def __init__(self, dbfile, workers=None, compact=False, profile=None):
+        self.dbfile = dbfile
+        self.compact = compact
+        self.profile = profile
+        self.workers = os.cpu_count() if workers is None else workers
+        self.pool = get_pool(dbfile, profile=profile)
+        self.owns_pool = True
+        self.shards = {}
+        self._executor = None
+        for year, path in sorted(find_shards(dbfile).items()):
+            self.shards[year] = self._open(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        ''' close the worker processes and every shard '''
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for shard in self.shards.values():
+            shard.close()
+        if self.owns_pool:
+            self.owns_pool = False
+            self.pool.release()
+
+    def _open(self, path):
+        return Transaction(path, compact=self.compact, profile=self.profile)
+
+    def shard(self, year, create=False):
+        ''' return the Transaction of a year's shard, or None if there is none
+            and create is False.  year 0 is the shard of the undated rows '''
+        shard = self.shards.get(year)
+        if shard is None and create:
+            shard = self.shards[year] = self._open(shard_path(self.dbfile, year))
+        return shard
+
+    def _years(self, start=None, end=None):
+        ''' return the years of the shards that may hold rows between the
+            MM-DD-YYYY dates start and end, in rowid order '''
+        to_date_range(start, end)
+        first = int(to_iso_date(start)[:4] or 0) if start is not None else UNDATED
+        last = int(to_iso_date(end)[:4] or 9999) if end is not None else 9999
+        return [year for year in sorted(self.shards) if first <= year <= last]
+
+    def _fan_out(self, func, *args, years=None, parallel=True):
+        ''' return func(shard, *args) for each shard, in rowid order, using
+            the worker processes for more than one shard if parallel.  func
+            is a Transaction method or a function of this module '''
+        years = sorted(self.shards) if years is None else years
+        if not parallel or self.workers <= 1 or len(years) <= 1:
+            return [func(self.shards[year], *args) for year in years]
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        return list(self._executor.map(run_on_shard,
+                                       [self.shards[year].dbfile for year in years],
+                                       [self.compact] * len(years),
+                                       [func] * len(years),
+                                       [args] * len(years)))
+
+    def _concat(self, func, *args, years=None, parallel=True):
+        ''' return the rows of func on each shard as one list '''
+        return [row for rows in self._fan_out(func, *args, years=years, parallel=parallel)
+                for row in rows]
+
+    def select_all(self):
+        ''' return all of the transactions as a list of dicts.  this reads the
+            shards in this process, sending every row back from a worker
+            costs more than reading it '''
+        return self._concat(Transaction.select_all, parallel=False)
+
+    def add(self, transaction):
+        ''' add a transaction to the shard of its year and return its rowid '''
+        year = to_year(transaction)
+        row = to_trans_row(transaction)
+        with self.shard(year, create=True).pool.connection() as con:
+            add_categories(con, [row])
+            cur = con.execute(INSERT, (year * SHARD_SPAN,) + row)
+        return cur.lastrowid
+
+    def add_many(self, transactions, batch_size=BATCH_SIZE):
+        ''' add any iterable of transactions in one database transaction per
+            shard, batch_size rows of a shard at a time.
+            this returns the (first, last) rowids added to each shard, in
+            rowid order, the rows of a shard are contiguous because its
+            connection is held until the end '''
+        ranges = {}
+        batches = {}
+        with ExitStack() as stack:
+            cons = {}
+            for transaction in transactions:
+                row = to_trans_row(transaction)
+                year = int(row[5][:4]) if row[5] else UNDATED
+                batch = batches.setdefault(year, [])
+                batch.append(row)
+                if len(batch) == batch_size:
+                    self._insert(stack, cons, ranges, year, batch)
+                    batch.clear()
+            for year, batch in batches.items():
+                if batch:
+                    self._insert(stack, cons, ranges, year, batch)
+        return [ranges[year] for year in sorted(ranges)]
+
+    def _insert(self, stack, cons, ranges, year, rows):
+        ''' insert rows into a shard on its connection in cons, opening it on
+            stack the first time, and extend the shard's range in ranges '''
+        con = cons.get(year)
+        if con is None:
+            con = cons[year] = stack.enter_context(
+                self.shard(year, create=True).pool.connection())
+        add_categories(con, rows)
+        con.executemany(INSERT, [(year * SHARD_SPAN,) + row for row in rows])
+        last = con.execute("SELECT last_insert_rowid()").fetchone()[0]
+        ranges[year] = (ranges[year][0] if year in ranges else last - len(rows) + 1, last)
+
+    def select_page(self, limit=PAGE_SIZE, after_rowid=None, order='rowid', descending=False,
+                    start=None, end=None, category=None, after_keys=None):
+        ''' return up to limit transactions in the order 'rowid', 'date' or
+            'amount' starting after the transaction after_rowid, or the row
+            with the page_keys after_keys, like Transaction.select_page.
+            the rowid and date orders are the order of the shards, so the
+            shards are read one after another until the page is full, an
+            amount page merges a page of each '''
+        if order not in ORDERS:
+            raise ValueError('cannot order by %r, use one of %s' % (order, ', '.join(ORDERS)))
+        if after_keys is None and after_rowid is not None and order == 'rowid':
+            after_keys = (after_rowid,)
+        if after_keys is None and after_rowid is not None:
+            # the cursor row is in one shard, its sort keys are compared in all of them
+            shard = self.shard(shard_of(after_rowid))
+            if shard is None:
+                return []
+            with shard.pool.connection() as con:
+                after_keys = con.execute("SELECT "+', '.join(ORDERS[order])+
+                                         " FROM transactions WHERE rowid=?",
+                                         (after_rowid,)).fetchone()
+            if after_keys is None:
+                return []
+        where, params = page_filter(*to_filter(start, end, category), order,
+                                    descending=descending, after_keys=after_keys)
+        years = self._years(start, end)
+        rows = []
+        for year in reversed(years) if descending else years:
+            if order == 'amount':
+                rows += select_page(self.shards[year], where, params, limit)
+            else:
+                rows += select_page(self.shards[year], where, params, limit - len(rows))
+                if len(rows) == limit:
+                    break
+        if order == 'amount':
+            # NULL amounts first, as SQLite sorts them
+            rows.sort(key=lambda row: (row['amount'] is not None, row['amount'] or 0,
+                                       row['rowid']), reverse=descending)
+        return rows[:limit]
+
+    def update(self, rowid, changes):
+        ''' change some of the columns of a transaction, like
+            Transaction.update, and return its rowid.  a date in another
+            year moves the transaction to that year's shard with a new
+            rowid, it is added there before it is deleted from its old shard '''
+        to_changes(changes)
+        year = shard_of(rowid)
+        shard = self.shard(year)
+        if shard is None:
+            return rowid
+        if 'date' not in changes or to_year(changes) == year:
+            shard.update(rowid, changes)
+            return rowid
+        with shard.pool.connection() as con:
+            row = con.execute("SELECT "+COLUMNS+" FROM transactions WHERE rowid=?",
+                              (rowid,)).fetchone()
+        if row is None:
+            return rowid
+        moved = self.add(dict(to_trans_dict(row), **changes))
+        shard.delete(rowid)
+        return moved
+
+    def delete_many(self, rowids, batch_size=BATCH_SIZE):
+        ''' delete the transactions with any iterable of rowids, batch_size
+            of them at a time split among their shards, and return the
+            number deleted '''
+        rowids = iter(rowids)
+        deleted = 0
+        for batch in iter(lambda: list(itertools.islice(rowids, batch_size)), []):
+            by_shard = {}
+            for rowid in batch:
+                by_shard.setdefault(shard_of(rowid), []).append(rowid)
+            for year, group in sorted(by_shard.items()):
+                shard = self.shard(year)
+                if shard is not None:
+                    deleted += shard.delete_many(group, batch_size)
+        return deleted
+
+    def delete(self, rowid):
+        ''' delete a transaction with a specified rowid '''
+        shard = self.shard(shard_of(rowid))
+        if shard is not None:
+            shard.delete(rowid)
+
+    def summarize_by_date(self, date):
+        ''' return a list of transactions grouped by date '''
+        iso_date = to_iso_date(date)
+        if not iso_date:
+            return self._concat(Transaction.summarize_by_date, date)
+        shard = self.shard(int(iso_date[:4]))
+        return [] if shard is None else shard.summarize_by_date(date)
+
+    def summarize_by_month(self, month):
+        '''return a list of transactions grouped by month from date'''
+        return self._concat(Transaction.summarize_by_month, month,
+                            years=[year for year in sorted(self.shards) if year != UNDATED])
+
+    def summarize_by_year(self, year):
+        '''return a list of transactions grouped by year from date'''
+        shard = self.shard(int(year)) if str(year).isdigit() and int(year) else None
+        return [] if shard is None else shard.summarize_by_year(year)
+
+    def summarize_by_category(self, category):
+        '''return a list of transactions grouped by category'''
+        return self._concat(Transaction.summarize_by_category, category)
+
+    def _iter(self, method, *args, years=None):
+        ''' yield the rows of an iter_ method of each shard in turn '''
+        for year in sorted(self.shards) if years is None else years:
+            yield from getattr(self.shards[year], method)(*args)
+
+    def iter_all(self, chunk_size=CHUNK_SIZE):
+        ''' yield all of the transactions, chunk_size rows in memory at a time '''
+        return self._iter('iter_all', chunk_size)
+
+    def iter_by_date(self, date, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions on a date, like summarize_by_date '''
+        iso_date = to_iso_date(date)
+        if not iso_date:
+            return self._iter('iter_by_date', date, chunk_size)
+        shard = self.shard(int(iso_date[:4]))
+        return iter(()) if shard is None else shard.iter_by_date(date, chunk_size)
+
+    def iter_by_month(self, month, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions in a month of any year '''
+        return self._iter('iter_by_month', month, chunk_size,
+                          years=[year for year in sorted(self.shards) if year != UNDATED])
+
+    def iter_by_year(self, year, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions of a year '''
+        shard = self.shard(int(year)) if str(year).isdigit() and int(year) else None
+        return iter(()) if shard is None else shard.iter_by_year(year, chunk_size)
+
+    def iter_by_category(self, category, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions in a category '''
+        return self._iter('iter_by_category', category, chunk_size)
+
+    def iter_between(self, start=None, end=None, category=None, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions between the MM-DD-YYYY dates start and
+            end and in a category, all optional, opening only the shards
+            of the years in between '''
+        return self._iter('iter_between', start, end, category, chunk_size,
+                          years=self._years(start, end))
+
+    def totals_by_month(self, year):
+        '''return (month, count, sum, avg, min, max) for each month of a year'''
+        shard = self.shard(int(year)) if str(year).isdigit() and int(year) else None
+        return [] if shard is None else shard.totals_by_month(year)
+
+    def totals_by_year(self):
+        '''return (year, count, sum, avg, min, max) for each year'''
+        return self._concat(Transaction.totals_by_year,
+                            years=[year for year in sorted(self.shards) if year != UNDATED])
+
+    def totals_by_category(self, start=None, end=None):
+        '''return (category, count, sum, avg, min, max) for each category,
+           optionally between the MM-DD-YYYY dates start and end'''
+        return merge_totals(self._fan_out(category_totals, start, end,
+                                          years=self._years(start, end)))
+
+    def daily_totals(self, start, end):
+        '''return (date, count, sum, avg, min, max) for each day between the
+           MM-DD-YYYY dates start and end'''
+        return self._concat(Transaction.daily_totals, start, end,
+                            years=[year for year in self._years(start, end) if year != UNDATED])
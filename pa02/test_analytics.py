@@ -0,0 +1,112 @@
+'''
+test_analytics runs unit tests on the NumPy column export
+'''
+
+import sqlite3
+from contextlib import contextmanager
+import pytest
+from transaction import Transaction
+np = pytest.importorskip('numpy')
+import analytics  # pylint: disable=wrong-import-position
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return tmpdir.join('test_analytics.db')
+
+
+@pytest.fixture
+def small_db(dbfile):
+    ''' create a database with a few months of transactions '''
+    db = Transaction(dbfile)
+    db.add_many([
+        {'item_num': 1, 'amount': 10, 'category': 'food', 'date': '01-05-2022', 'description': 'a'},
+        {'item_num': 2, 'amount': 20, 'category': 'rent', 'date': '01-09-2022', 'description': 'b'},
+        {'item_num': 3, 'amount': 30, 'category': 'food', 'date': '03-01-2022', 'description': 'c'},
+        {'item_num': 4, 'amount': 40, 'category': 'fun', 'date': 'someday', 'description': 'd'},
+    ])
+    yield db
+    db.close()
+
+
+@pytest.mark.simple
+def test_to_columns(small_db):
+    ''' the columns hold the rows as typed arrays '''
+    columns = small_db.to_columns()
+    assert columns['categories'] == ['food', 'fun', 'rent']
+    assert columns['amount'].dtype == np.float64
+    assert columns['amount'].tolist() == [10, 20, 30, 40]
+    assert columns['category'].tolist() == [0, 2, 0, 1]
+    assert columns['date'][0] == np.datetime64('2022-01-05')
+    assert np.isnat(columns['date'][3])
+
+
+@pytest.mark.simple
+def test_to_columns_filter(small_db):
+    ''' the date and category filters are applied in SQL '''
+    columns = small_db.to_columns(start='01-06-2022', category='food')
+    assert columns['rowid'].tolist() == [3]
+    assert columns['categories'] == ['food']
+
+
+@pytest.mark.simple
+def test_helpers(small_db):
+    ''' the vectorized helpers agree with the obvious sums '''
+    columns = small_db.to_columns()
+    assert analytics.sum_by_category(columns) == {'food': 40, 'fun': 40, 'rent': 20}
+    months, totals = analytics.monthly_spend(columns)
+    assert months.astype(str).tolist() == ['2022-01', '2022-02', '2022-03']
+    assert totals.tolist() == [30, 0, 30]
+    assert analytics.rolling_monthly_spend(columns, window=2)[1].tolist() == [30, 30, 30]
+    assert analytics.percentiles(columns['amount'], (50,)) == {50: 25.0}
+
+
+
+class InterruptedConnection():
+    ''' a connection that lets another process add a row once it has counted '''
+
+    def __init__(self, con, dbfile):
+        self.con = con
+        self.dbfile = dbfile
+
+    def __getattr__(self, name):
+        return getattr(self.con, name)
+
+    def execute(self, sql, params=()):
+        ''' run sql, then add a row from another connection after a count '''
+        cur = self.con.execute(sql, params)
+        if 'count(*)' in sql:
+            other = sqlite3.connect(self.dbfile)
+            other.execute("INSERT INTO transactions(amount, iso_date) VALUES(20, '2022-01-09')")
+            other.commit()
+            other.close()
+        return cur
+
+
+@pytest.mark.simple
+def test_to_columns_snapshot(tmpdir, monkeypatch):
+    ''' rows added while the columns are read are not part of them '''
+    dbfile = str(tmpdir.join('test_wal.db'))
+    with Transaction(dbfile, profile='fast') as db:
+        db.add({'item_num': 1, 'amount': 10, 'category': 'food', 'date': '01-05-2022',
+                'description': 'a'})
+        connection = db.pool.connection
+
+        @contextmanager
+        def interrupted(private=False):
+            with connection(private) as con:
+                yield InterruptedConnection(con, dbfile)
+
+        monkeypatch.setattr(db.pool, 'connection', interrupted)
+        assert db.to_columns()['rowid'].tolist() == [1]
+        monkeypatch.undo()
+        assert len(db.select_all()) == 2
+
+
+@pytest.mark.simple
+def test_to_columns_in_transaction(small_db):
+    ''' the columns can be read inside a transaction the caller holds '''
+    with small_db.pool.connection() as con:
+        con.execute("DELETE FROM transactions WHERE rowid=4")
+        assert small_db.to_columns()['rowid'].tolist() == [1, 2, 3]
@@ -0,0 +1,89 @@
+'''
+test_async_orm runs integration tests on the asyncio ORMs
+'''
+
+import asyncio
+import sqlite3
+import pytest
+from async_orm import AsyncTransaction, AsyncCategory
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return tmpdir.join('test_async.db')
+
+
+def make_trans(i):
+    ''' return a transaction dict numbered i '''
+    return {'item_num': i, 'amount': i, 'category': 'async',
+            'date': '01-02-2022', 'description': 'async '+str(i)}
+
+
+@pytest.mark.add
+def test_concurrent_adds_are_batched(dbfile):
+    ''' many concurrent adds share a few commits and each gets its rowid '''
+    async def run():
+        async with AsyncTransaction(dbfile) as trans:
+            rowids = await asyncio.gather(*(trans.add(make_trans(i)) for i in range(100)))
+            rows = await trans.select_all()
+            return rowids, rows, trans.batches
+    rowids, rows, batches = asyncio.run(run())
+    assert sorted(rowids) == list(range(1, 101))
+    assert batches < 10
+    by_rowid = {row['rowid']: row for row in rows}
+    assert all(by_rowid[rowid]['item_num'] == i for i, rowid in enumerate(rowids))
+
+
+@pytest.mark.add
+def test_bad_add_fails_alone(dbfile):
+    ''' an add missing a column raises in its caller and the others commit '''
+    async def run():
+        async with AsyncTransaction(dbfile) as trans:
+            results = await asyncio.gather(trans.add(make_trans(1)), trans.add({'amount': 1}),
+                                           return_exceptions=True)
+            return results, await trans.summarize_by_category('async')
+    results, rows = asyncio.run(run())
+    assert results[0] == 1
+    assert isinstance(results[1], KeyError)
+    assert len(rows) == 1
+
+
+@pytest.mark.add
+def test_failed_row_fails_alone(dbfile):
+    ''' a row that fails in the database fails only its own coroutine '''
+    bad = dict(make_trans(3), description=object())
+    async def run():
+        async with AsyncTransaction(dbfile) as trans:
+            results = await asyncio.gather(*(trans.add(bad if i == 3 else make_trans(i))
+                                             for i in range(6)), return_exceptions=True)
+            return results, await trans.select_all()
+    results, rows = asyncio.run(run())
+    assert isinstance(results[3], sqlite3.Error)
+    assert [row['rowid'] for row in rows] == results[:3] + results[4:]
+    assert [row['item_num'] for row in rows] == [0, 1, 2, 4, 5]
+
+
+@pytest.mark.summarize_by_year
+def test_summaries(dbfile):
+    ''' the read methods return what the synchronous ORM returns '''
+    async def run():
+        async with AsyncTransaction(dbfile) as trans:
+            await trans.add_many(make_trans(i) for i in range(3))
+            await trans.delete(2)
+            return (await trans.summarize_by_year('2022'),
+                    await trans.totals_by_category())
+    rows, totals = asyncio.run(run())
+    assert [row['rowid'] for row in rows] == [1, 3]
+    assert totals == [('async', 2, 2.0, 1.0, 0.0, 2.0)]
+
+
+@pytest.mark.update
+def test_async_category(dbfile):
+    ''' categories can be added, updated and read back '''
+    async def run():
+        async with AsyncCategory(dbfile) as cats:
+            rowid = await cats.add({'name': 'food', 'desc': 'groceries'})
+            await cats.update(rowid, {'name': 'meals', 'desc': 'eating out'})
+            return await cats.select_one(rowid)
+    assert asyncio.run(run())['name'] == 'meals'
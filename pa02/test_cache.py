@@ -0,0 +1,69 @@
+'''
+test_cache runs unit tests on the LRU cache
+'''
+
+import pytest
+from cache import LRUCache, MISSING
+
+
+class FakeClock():
+    ''' a clock the tests can move forward by hand '''
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.simple
+def test_hits_and_misses():
+    ''' lookups are counted '''
+    cache = LRUCache(size=2)
+    assert cache.get('a') is MISSING
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 1, 'max_size': 2}
+
+
+@pytest.mark.simple
+def test_evicts_least_recently_used():
+    ''' the entry not used for longest goes first '''
+    cache = LRUCache(size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+@pytest.mark.simple
+def test_ttl():
+    ''' entries expire after ttl seconds '''
+    clock = FakeClock()
+    cache = LRUCache(size=2, ttl=10, clock=clock)
+    cache.put('a', 1)
+    clock.now = 9
+    assert cache.get('a') == 1
+    clock.now = 11
+    assert cache.get('a') is MISSING
+    assert len(cache) == 0
+
+
+@pytest.mark.simple
+def test_stale_put_after_clear():
+    ''' a value loaded before a clear is not cached '''
+    cache = LRUCache()
+    generation = cache.generation
+    cache.clear()
+    cache.put('a', 1, generation)
+    assert cache.get('a') is MISSING
+
+
+@pytest.mark.simple
+def test_size_zero_disables():
+    ''' a cache of size 0 never stores anything '''
+    cache = LRUCache(size=0)
+    cache.put('a', 1)
+    assert cache.get('a') is MISSING
@@ -3,18 +3,25 @@ test_categories runs unit and integration tests on the category module
 '''
 
 import pytest
-from category import Category, to_cat_dict
+from category import to_cat_dict
+from engines import ENGINES, open_category, open_transaction
 
 @pytest.fixture
 def dbfile(tmpdir):
     ''' create a database file in a temporary file system '''
     return tmpdir.join('test_tracker.db')
 
+@pytest.fixture(params=ENGINES)
+def engine(request):
+    ''' run the tests on each storage engine '''
+    return request.param
+
 @pytest.fixture
-def empty_db(dbfile):
+def empty_db(dbfile, engine):
     ''' create an empty database '''
-    db = Category(dbfile)
+    db = open_category(dbfile, engine)
     yield db
+    db.close()
 
 
 @pytest.fixture
@@ -78,6 +85,16 @@ def test_add(med_db):
     assert cat1['desc']==cat0['desc']
 
 
+@pytest.mark.add
+def test_add_many(small_db):
+    ''' add a list of categories in one call, then select them '''
+    cats = [{'name':'bulk'+str(i),'desc':'bulk category '+str(i)} for i in range(5)]
+    first, last = small_db.add_many(cats, batch_size=2)
+    assert last - first + 1 == 5
+    assert small_db.select_one(last)['name'] == 'bulk4'
+    assert small_db.add_many([]) is None
+
+
 @pytest.mark.delete
 def test_delete(med_db):
     ''' add a category to db, delete it, and see that the size changes'''
@@ -116,3 +133,87 @@ def test_update(med_db):
     cat2 = med_db.select_one(rowid)
     assert cat2['name']==cat1['name']
     assert cat2['desc']==cat1['desc']
+
+
+@pytest.mark.simple
+def test_compact_rows(small_db, dbfile, engine):
+    ''' compact rows hold the same data as the dicts '''
+    compact = open_category(dbfile, engine, compact=True)
+    assert compact.select_all() == small_db.select_all()
+    assert compact.select_one(1)['name'] == 'food'
+
+
+@pytest.mark.simple
+def test_cache(small_db, engine):
+    ''' repeated reads are served from the cache until a write clears it '''
+    if engine != 'sqlite':
+        pytest.skip('the memory engine has no cache')
+    small_db.select_all()
+    small_db.select_one(1)
+    misses = small_db.cache.misses
+    assert small_db.select_one(1)['name'] == 'food'
+    assert len(small_db.select_all()) == 3
+    assert small_db.cache.misses == misses
+    small_db.update(1, {'name':'groceries','desc':'food shopping'})
+    assert small_db.select_one(1)['name'] == 'groceries'
+    rowid = small_db.add({'name':'new','desc':'new category'})
+    assert len(small_db.select_all()) == 4
+    small_db.delete(rowid)
+    assert len(small_db.select_all()) == 3
+
+
+@pytest.mark.simple
+def test_cache_sees_other_writers(small_db, dbfile, engine):
+    ''' categories created by a Transaction or another Category sharing the
+        pool clear the cache '''
+    assert len(small_db.select_all()) == 3
+    trans = open_transaction(dbfile, engine)
+    trans.add({'item_num': 1, 'amount': 2, 'category': 'rent', 'date': '01-01-2022',
+               'description': 'march'})
+    assert [cat['name'] for cat in small_db.select_all()][-1] == 'rent'
+    trans.update(1, {'category': 'gifts'})
+    trans.add_many([{'item_num': 2, 'amount': 3, 'category': 'tax', 'date': '01-02-2022',
+                     'description': ''}])
+    assert [cat['name'] for cat in small_db.select_all()][-2:] == ['gifts', 'tax']
+    other = open_category(dbfile, engine)
+    other.update(1, {'name': 'groceries', 'desc': ''})
+    assert small_db.select_one(1)['name'] == 'groceries'
+
+
+@pytest.mark.simple
+def test_select_page(med_db):
+    ''' pages follow on from the last rowid of the page before '''
+    page = med_db.select_page(5)
+    assert [cat['rowid'] for cat in page] == [1, 2, 3, 4, 5]
+    page = med_db.select_page(5, page[-1]['rowid'])
+    assert [cat['rowid'] for cat in page] == [6, 7, 8, 9, 10]
+    page = med_db.select_page(3, order='name')
+    assert [cat['name'] for cat in page] == ['car', 'food', 'fun']
+    page = med_db.select_page(3, page[-1]['rowid'], order='name')
+    assert [cat['name'] for cat in page] == ['name0', 'name1', 'name2']
+
+
+@pytest.mark.delete
+def test_delete_many(med_db):
+    ''' delete_many counts the categories it deleted '''
+    assert med_db.delete_many([4, 5, 6, 99], batch_size=2) == 3
+    assert [cat['rowid'] for cat in med_db.select_all()][:5] == [1, 2, 3, 7, 8]
+
+
+@pytest.mark.update
+def test_delete_and_update_where(med_db, engine):
+    ''' the categories matching a filter are changed a batch at a time '''
+    if engine != 'sqlite':
+        pytest.skip('filters are SQLite only')
+    med_db.select_all()
+    assert med_db.update_where({'name':['name1','name2']},{'desc':'two'},dry_run=True) == 2
+    assert med_db.update_where({'name':['name1','name2']},{'desc':'two'},batch_size=1) == 2
+    assert [cat['name'] for cat in med_db.select_all() if cat['desc'] == 'two'] == \
+        ['name1','name2']
+    assert med_db.delete_where({'desc':'two'},dry_run=True) == 2
+    assert med_db.delete_where({'desc':'two'}) == 2
+    assert len(med_db.select_all()) == 11
+    with pytest.raises(ValueError):
+        med_db.delete_where({'size':1})
+    with pytest.raises(ValueError):
+        med_db.update_where({},{'rowid':1})
@@ -0,0 +1,146 @@
+'''
+test_connection runs unit tests on the connection pool
+'''
+
+import sqlite3
+import threading
+import pytest
+from category import Category
+from connection import ConnectionPool, get_pool
+from transaction import Transaction
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return tmpdir.join('test_pool.db')
+
+
+@pytest.fixture
+def pool(dbfile):
+    ''' create a pool and close it afterwards '''
+    with ConnectionPool(dbfile, size=2) as pool:
+        yield pool
+
+
+@pytest.mark.simple
+def test_reuse(pool):
+    ''' a released connection is handed out again '''
+    with pool.connection() as con1:
+        pass
+    with pool.connection() as con2:
+        pass
+    assert con1 is con2
+
+
+@pytest.mark.simple
+def test_nested_shares_connection(pool):
+    ''' nested blocks in one thread share a single transaction '''
+    with pool.connection() as con1:
+        con1.execute("CREATE TABLE t (x)")
+        with pool.connection() as con2:
+            assert con1 is con2
+            con2.execute("INSERT INTO t VALUES (1)")
+        assert con1.in_transaction
+
+
+@pytest.mark.simple
+def test_rollback_on_error(pool):
+    ''' an exception in the outermost block rolls the transaction back '''
+    with pool.connection() as con:
+        con.execute("CREATE TABLE t (x)")
+    with pytest.raises(ValueError):
+        with pool.connection() as con:
+            con.execute("INSERT INTO t VALUES (1)")
+            raise ValueError('abort')
+    with pool.connection() as con:
+        assert con.execute("SELECT count(*) FROM t").fetchone()[0] == 0
+
+
+@pytest.mark.simple
+def test_threads_get_own_connection(pool):
+    ''' two threads never share a connection at the same time '''
+    seen = []
+    barrier = threading.Barrier(2)
+
+    def worker():
+        with pool.connection() as con:
+            seen.append(con)
+            barrier.wait()
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen[0] is not seen[1]
+
+
+@pytest.mark.simple
+def test_size_zero_does_not_keep(dbfile):
+    ''' a pool of size 0 reconnects every time '''
+    with ConnectionPool(dbfile, size=0) as pool:
+        with pool.connection() as con1:
+            pass
+        with pool.connection() as con2:
+            pass
+        assert con1 is not con2
+
+
+@pytest.mark.simple
+def test_close(dbfile):
+    ''' a closed pool refuses work and get_pool replaces it '''
+    pool = get_pool(dbfile)
+    assert get_pool(dbfile) is pool
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        with pool.connection():
+            pass
+    pool2 = get_pool(dbfile)
+    assert pool2 is not pool
+    pool2.close()
+
+
+@pytest.mark.simple
+def test_release(dbfile):
+    ''' closing one ORM leaves the pool open for the others sharing it '''
+    trans, cats = Transaction(dbfile), Category(dbfile)
+    assert trans.pool is cats.pool
+    trans.close()
+    trans.close()
+    assert cats.select_all() == []
+    with Transaction(dbfile) as again:
+        assert again.pool is cats.pool
+    cats.add({'name': 'food', 'desc': ''})
+    cats.close()
+    assert cats.pool.closed
+    with ConnectionPool(dbfile) as pool:
+        Category(dbfile, pool=pool).close()
+        assert not pool.closed
+
+
+@pytest.mark.simple
+def test_profiles(dbfile):
+    ''' the profile's pragmas are applied to every connection '''
+    with ConnectionPool(dbfile, profile='fast') as pool:
+        with pool.connection() as con:
+            assert con.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+            assert con.execute("PRAGMA synchronous").fetchone()[0] == 1
+            assert con.execute("PRAGMA busy_timeout").fetchone()[0] == 10000
+            assert con.isolation_level == 'IMMEDIATE'
+    with ConnectionPool(dbfile, profile={'synchronous': 'OFF'}) as pool:
+        with pool.connection() as con:
+            assert con.execute("PRAGMA synchronous").fetchone()[0] == 0
+    with pytest.raises(ValueError):
+        ConnectionPool(dbfile, profile='reckless')
+
+
+@pytest.mark.simple
+def test_shared_pool_profile_conflict(dbfile):
+    ''' asking for a different profile on an open database is an error '''
+    pool = get_pool(dbfile, profile='durable')
+    assert get_pool(dbfile) is pool
+    assert get_pool(dbfile, profile='durable') is pool
+    with pytest.raises(ValueError):
+        get_pool(dbfile, profile='fast')
+    pool.close()
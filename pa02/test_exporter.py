@@ -0,0 +1,104 @@
+'''
+test_exporter runs integration tests on the transaction export
+'''
+
+import csv
+import gzip
+import json
+import pytest
+import exporter
+from exporter import export, read_binary
+from transaction import Transaction
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return tmpdir.join('test_export.db')
+
+
+@pytest.fixture
+def small_db(dbfile):
+    ''' create a small database with transactions to export '''
+    db = Transaction(dbfile)
+    db.add_many([
+        {'item_num': 1, 'amount': 4.5, 'category': 'food', 'date': '03-01-2022',
+         'description': 'café'},
+        {'item_num': 2, 'amount': 40, 'category': 'car', 'date': '03-02-2022',
+         'description': 'gas, "premium"'},
+        {'item_num': 3, 'amount': 12, 'category': 'food', 'date': '04-01-2023',
+         'description': 'lunch'},
+    ])
+    yield db
+    db.close()
+
+
+@pytest.mark.simple
+def test_export_csv_gzip(small_db, tmpdir):
+    ''' the suffix picks csv and gzip '''
+    path = str(tmpdir.join('out.csv.gz'))
+    assert small_db.export(path) == 3
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as stream:
+        rows = list(csv.DictReader(stream))
+    assert [row['rowid'] for row in rows] == ['1', '2', '3']
+    assert rows[1]['description'] == 'gas, "premium"'
+    assert rows[0]['description'] == 'café'
+
+
+@pytest.mark.simple
+def test_export_jsonl_filtered(small_db, tmpdir):
+    ''' start, end and category limit the rows '''
+    path = str(tmpdir.join('out.jsonl'))
+    assert small_db.export(path, start='01-01-2022', end='12-31-2022', category='food') == 1
+    with open(path, encoding='utf-8') as stream:
+        rows = [json.loads(line) for line in stream]
+    assert rows == [{'rowid': 1, 'item_num': 1, 'amount': 4.5, 'category': 'food',
+                     'date': '03-01-2022', 'description': 'café'}]
+
+
+@pytest.mark.simple
+def test_export_binary_round_trip(small_db, tmpdir):
+    ''' the binary format reads back as the same rows, across chunks '''
+    path = str(tmpdir.join('out.trx.xz'))
+    small_db.add({'item_num': None, 'amount': 1, 'category': None, 'date': '05-01-2023',
+                  'description': ''})
+    assert export(small_db, path, chunk_size=2) == 4
+    rows = list(read_binary(path))
+    assert rows[:3] == [(1, 1.0, 4.5, 'food', '03-01-2022', 'café'),
+                        (2, 2.0, 40.0, 'car', '03-02-2022', 'gas, "premium"'),
+                        (3, 3.0, 12.0, 'food', '04-01-2023', 'lunch')]
+    assert rows[3][1] != rows[3][1]
+    assert rows[3][3] is None
+    assert rows[3][5] == ''
+
+
+@pytest.mark.simple
+def test_export_parquet(small_db, tmpdir):
+    ''' parquet needs pyarrow '''
+    parquet = pytest.importorskip('pyarrow.parquet')
+    path = str(tmpdir.join('out.parquet'))
+    assert small_db.export(path, compression='zstd') == 3
+    table = parquet.read_table(path)
+    assert table.column('amount').to_pylist() == [4.5, 40.0, 12.0]
+
+
+@pytest.mark.simple
+def test_export_without_pyarrow(small_db, tmpdir, monkeypatch, capsys):
+    ''' without pyarrow parquet and arrow are written as binary '''
+    monkeypatch.setattr(exporter, 'pyarrow', None)
+    assert small_db.export(str(tmpdir.join('out.parquet')), compression='zstd') == 3
+    assert 'writing the binary format to %s' % tmpdir.join('out.trx') in \
+        capsys.readouterr().err
+    assert [row[0] for row in read_binary(str(tmpdir.join('out.trx')))] == [1, 2, 3]
+    assert not tmpdir.join('out.parquet').exists()
+
+
+@pytest.mark.simple
+def test_export_errors(small_db, tmpdir):
+    ''' unknown formats, compressions and dates are rejected '''
+    with pytest.raises(ValueError):
+        small_db.export(str(tmpdir.join('out')), fmt='xml')
+    with pytest.raises(ValueError):
+        small_db.export(str(tmpdir.join('out.csv')), compression='zip')
+    with pytest.raises(ValueError):
+        small_db.export(str(tmpdir.join('out.csv')), start='March')
@@ -0,0 +1,78 @@
+'''
+test_fulltext runs integration tests on the full-text search
+'''
+
+import pytest
+import fulltext
+from transaction import Transaction
+
+pytestmark = pytest.mark.skipif(not fulltext.is_available(), reason='SQLite without FTS5')
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return tmpdir.join('test_fulltext.db')
+
+
+@pytest.fixture
+def small_db(dbfile):
+    ''' create a small database with search enabled after the first row '''
+    db = Transaction(dbfile)
+    db.add({'item_num': 1, 'amount': 4, 'category': 'food', 'date': '03-01-2022',
+            'description': 'Corner Café coffee'})
+    db.enable_search()
+    db.add_many([
+        {'item_num': 2, 'amount': 30, 'category': 'food', 'date': '03-02-2022',
+         'description': 'pizza at the corner'},
+        {'item_num': 3, 'amount': 40, 'category': 'car', 'date': '03-03-2022',
+         'description': 'gas station'},
+        {'item_num': 4, 'amount': 9, 'category': 'food', 'date': '03-04-2022',
+         'description': 'cafe coffee coffee coffee'},
+    ])
+    yield db
+    db.close()
+
+
+def rowids(rows):
+    ''' return the rowids of a list of transactions '''
+    return [row['rowid'] for row in rows]
+
+
+@pytest.mark.simple
+def test_search(small_db):
+    ''' words, prefixes, phrases and ranking '''
+    assert rowids(small_db.search('pizza')) == [2]
+    assert sorted(rowids(small_db.search('cafe'))) == [1, 4]
+    assert rowids(small_db.search('coffee')) == [4, 1]
+    assert sorted(rowids(small_db.search('corn*'))) == [1, 2]
+    assert rowids(small_db.search('"corner cafe"')) == [1]
+    assert rowids(small_db.search('coffee', limit=1)) == [4]
+    assert rowids(small_db.search('corner OR coffee', order='newest')) == [4, 2, 1]
+    assert sorted(rowids(small_db.search('gas OR pizza'))) == [2, 3]
+    assert small_db.search('gas')[0]['description'] == 'gas station'
+    with pytest.raises(ValueError):
+        small_db.search('"unbalanced')
+
+
+@pytest.mark.delete
+def test_search_follows_changes(small_db):
+    ''' deleted and updated descriptions are reindexed '''
+    small_db.delete(2)
+    assert small_db.search('pizza') == []
+    with small_db.pool.connection() as con:
+        con.execute("UPDATE transactions SET description='tolls' WHERE rowid=3")
+    assert small_db.search('gas') == []
+    assert rowids(small_db.search('tolls')) == [3]
+    small_db.rebuild_search()
+    assert rowids(small_db.search('tolls')) == [3]
+
+
+@pytest.mark.simple
+def test_search_disabled(small_db):
+    ''' searching without the index is an error '''
+    small_db.disable_search()
+    small_db.add({'item_num': 5, 'amount': 1, 'category': 'fun', 'date': '03-05-2022',
+                  'description': 'movie'})
+    with pytest.raises(ValueError):
+        small_db.search('movie')
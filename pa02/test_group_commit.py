@@ -0,0 +1,111 @@
+'''
+test_group_commit runs integration tests on group commit mode
+'''
+
+import sqlite3
+import threading
+import pytest
+from transaction import Transaction
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return tmpdir.join('test_group.db')
+
+
+@pytest.fixture
+def group_db(dbfile):
+    ''' create a Transaction in group commit mode '''
+    db = Transaction(dbfile)
+    db.enable_group_commit(max_rows=50, max_delay_ms=20)
+    yield db
+    db.close()
+
+
+def make_trans(i):
+    ''' return a transaction dict numbered i '''
+    return {'item_num': i, 'amount': i, 'category': 'group',
+            'date': '01-02-2022', 'description': 'group '+str(i)}
+
+
+@pytest.mark.add
+def test_threads_share_commits(group_db):
+    ''' adds from many threads are committed together and each gets its rowid '''
+    rowids = {}
+
+    def worker(i):
+        rowids[i] = group_db.add(make_trans(i))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(rowids.values()) == list(range(1, 41))
+    assert group_db.writer.batches < 40
+    for i, rowid in rowids.items():
+        assert group_db.summarize_by_category('group')[rowid - 1]['item_num'] == i
+
+
+@pytest.mark.add
+def test_submit_and_flush(group_db):
+    ''' submit returns futures that are resolved by a flush '''
+    futures = [group_db.submit(make_trans(i)) for i in range(120)]
+    group_db.writer.flush()
+    assert all(future.done() for future in futures)
+    assert [future.result() for future in futures] == list(range(1, 121))
+    assert group_db.writer.batches >= 3
+
+
+@pytest.mark.add
+def test_close_writes_queue(dbfile):
+    ''' closing the Transaction commits the rows still queued '''
+    db = Transaction(dbfile)
+    db.enable_group_commit(max_rows=1000, max_delay_ms=10000)
+    futures = [db.submit(make_trans(i)) for i in range(10)]
+    db.close()
+    assert futures[-1].result() == 10
+    with Transaction(dbfile) as db:
+        assert len(db.select_all()) == 10
+
+
+@pytest.mark.add
+def test_bad_row_fails_in_caller(group_db):
+    ''' a row missing a column raises before it is queued '''
+    with pytest.raises(KeyError):
+        group_db.add({'amount': 1})
+
+
+@pytest.mark.add
+def test_failed_row_fails_alone(group_db):
+    ''' a row that fails in the database fails only its own future '''
+    bad = dict(make_trans(3), description=object())
+    futures = [group_db.submit(bad if i == 3 else make_trans(i)) for i in range(6)]
+    group_db.writer.flush()
+    with pytest.raises(sqlite3.Error):
+        futures[3].result()
+    good = [futures[i].result() for i in (0, 1, 2, 4, 5)]
+    assert [row['rowid'] for row in group_db.select_all()] == good
+    assert [row['item_num'] for row in group_db.select_all()] == [0, 1, 2, 4, 5]
+
+
+@pytest.mark.add
+def test_closed_writer_refuses_work(dbfile):
+    ''' submit and flush raise once the writer is closed '''
+    db = Transaction(dbfile)
+    writer = db.enable_group_commit()
+    db.close()
+    with pytest.raises(RuntimeError):
+        writer.submit(make_trans(1))
+    with pytest.raises(RuntimeError):
+        writer.flush()
+
+
+@pytest.mark.add
+def test_add_inside_open_transaction(group_db):
+    ''' an add made inside an open transaction joins it instead of waiting '''
+    with group_db.pool.connection():
+        rowid = group_db.add(make_trans(1))
+    assert rowid == 1
+    assert group_db.writer.rows == 0
@@ -0,0 +1,151 @@
+'''
+test_importer runs integration tests on the statement importer
+'''
+
+import gzip
+import zipfile
+import pytest
+from importer import import_statements, main, normalize_date
+from transaction import Transaction
+
+CSV = '''Posted Date,Payee,Amount,Category
+2022-03-01,Corner Cafe,4.50,food
+03/02/2022,"Gas, Station",$40.00,car
+someday,Broken Row,1.00,food
+3/3/22,Book Store,(12.00),
+'''
+
+OFX = '''OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20220304120000[-5:EST]
+<TRNAMT>-25.00
+<NAME>Grocery Mart
+<MEMO>weekly shop
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CHECK
+<DTPOSTED>20220305
+<TRNAMT>-900.00
+<CHECKNUM>1001
+<NAME>Landlord
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+'''
+
+QIF = '''!Type:Bank
+D3/6'22
+T-15.00
+PCinema
+Lfun
+^
+D3/7/2022
+T-8.00
+PPharmacy
+^
+'''
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return tmpdir.join('test_import.db')
+
+
+@pytest.fixture
+def empty_db(dbfile):
+    ''' create an empty database '''
+    db = Transaction(dbfile)
+    yield db
+    db.close()
+
+
+@pytest.mark.simple
+def test_normalize_date():
+    ''' statement dates become MM-DD-YYYY '''
+    assert normalize_date('2022-03-04') == '03-04-2022'
+    assert normalize_date('20220304120000[-5:EST]') == '03-04-2022'
+    assert normalize_date('3/4/2022') == '03-04-2022'
+    assert normalize_date("3/ 4'22") == '03-04-2022'
+    assert normalize_date('13/01/2022') is None
+    assert normalize_date('someday') is None
+
+
+@pytest.mark.add
+def test_import_csv(empty_db, tmpdir):
+    ''' good rows are imported and bad ones rejected '''
+    path = tmpdir.join('march.csv')
+    path.write(CSV)
+    totals = import_statements(empty_db, [str(path)], workers=0, chunk_size=2)
+    assert totals['imported'] == 3
+    assert totals['rejected'] == 1
+    assert 'record 3' in totals['errors'][0]
+    rows = empty_db.select_all()
+    assert [row['date'] for row in rows] == ['03-01-2022', '03-02-2022', '03-03-2022']
+    assert rows[1]['description'] == 'Gas, Station'
+    assert rows[1]['amount'] == 40
+    assert rows[2]['amount'] == -12
+    assert rows[2]['category'] == 'uncategorized'
+
+
+@pytest.mark.add
+def test_import_forced_format(empty_db, tmpdir):
+    ''' a file whose extension is not a format is read with the one given '''
+    path = tmpdir.join('bank.txt')
+    path.write(CSV)
+    totals = import_statements(empty_db, [str(path)], workers=0)
+    assert totals['imported'] == 0
+    assert totals['skipped'] == ['%s: not a CSV, OFX or QIF statement' % path]
+    assert import_statements(empty_db, [str(tmpdir)], workers=0, fmt='csv')['imported'] == 3
+
+
+@pytest.mark.add
+def test_import_ofx_and_qif(empty_db, tmpdir):
+    ''' OFX and QIF statements are read too '''
+    tmpdir.join('bank.ofx').write(OFX)
+    tmpdir.join('card.qif').write(QIF)
+    totals = import_statements(empty_db, [str(tmpdir.join('bank.ofx')),
+                                          str(tmpdir.join('card.qif'))], workers=0)
+    assert totals['imported'] == 4
+    rows = empty_db.select_all()
+    assert rows[0]['description'] == 'Grocery Mart weekly shop'
+    assert rows[1]['item_num'] == 1001
+    assert rows[2]['date'] == '03-06-2022'
+    assert rows[2]['category'] == 'fun'
+
+
+@pytest.mark.add
+def test_import_archive_in_processes(empty_db, tmpdir):
+    ''' compressed statements inside a zip are read by worker processes '''
+    archive = str(tmpdir.join('statements.zip'))
+    with zipfile.ZipFile(archive, 'w') as zipped:
+        zipped.writestr('2022/march.csv.gz', gzip.compress(CSV.encode()))
+        zipped.writestr('2022/card.qif', QIF)
+        zipped.writestr('README.txt', 'not a statement')
+    seen = []
+    totals = import_statements(empty_db, [archive], workers=2, chunk_size=1,
+                               progress=lambda totals: seen.append(totals['imported']))
+    assert totals['imported'] == 5
+    assert totals['chunks'] == 6
+    assert seen[-1] == 5
+    assert len(empty_db.select_all()) == 5
+
+
+@pytest.mark.add
+def test_import_skips_unreadable_paths(dbfile, tmpdir, capsys):
+    ''' missing, broken and unknown files are reported and the others imported '''
+    tmpdir.join('march.csv').write(CSV)
+    tmpdir.join('broken.csv.gz').write('not gzip')
+    tmpdir.join('broken.zip').write('not zip')
+    tmpdir.join('notes.txt').write('not a statement')
+    paths = [str(tmpdir.join(name)) for name in
+             ('missing.csv', 'march.csv', 'broken.csv.gz', 'broken.zip', 'notes.txt')]
+    assert main(['--db', str(dbfile), '--workers', '0'] + paths) == 1
+    captured = capsys.readouterr()
+    assert 'imported 3 transactions, rejected 1' in captured.out
+    skipped = [line for line in captured.err.split('\n') if line.startswith('skipped ')]
+    assert [line.split(': ')[0] for line in skipped] == [
+        'skipped '+paths[0], 'skipped '+paths[2], 'skipped '+paths[3], 'skipped '+paths[4]]
+    assert 'No such file or directory' in skipped[0]
+    assert main(['--db', str(dbfile), '--workers', '0', paths[1]]) == 0
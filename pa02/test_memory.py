@@ -0,0 +1,90 @@
+'''
+test_memory runs integration tests on the in-memory storage engine
+'''
+
+import pytest
+from category import Category
+from memory import MemoryCategory, MemoryTransaction
+from transaction import Transaction
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a snapshot file name in a temporary file system '''
+    return str(tmpdir.join('test_memory.snapshot'))
+
+
+ROWS = [
+    {'item_num': 1, 'amount': 10, 'category': 'food', 'date': '03-01-2022',
+     'description': 'lunch'},
+    {'item_num': 2, 'amount': None, 'category': 'car', 'date': '3/15/2021',
+     'description': 'gas'},
+    {'item_num': 3, 'amount': 30, 'category': None, 'date': '12-31-2021',
+     'description': 'dinner'},
+    {'item_num': 4, 'amount': 5, 'category': 'food', 'date': 'someday',
+     'description': 'no date'},
+    {'item_num': 5, 'amount': 5.5, 'category': 'fun', 'date': None,
+     'description': None},
+]
+
+
+@pytest.mark.simple
+def test_snapshot(dbfile):
+    ''' close writes a snapshot and opening the file again loads it '''
+    with MemoryTransaction(dbfile) as trans:
+        trans.add_many(ROWS)
+        trans.delete(5)
+        rows = trans.select_all()
+    with MemoryTransaction(dbfile) as trans, MemoryCategory(dbfile) as cats:
+        assert trans.select_all() == rows
+        assert [row['rowid'] for row in trans.summarize_by_category('food')] == [1, 4]
+        assert trans.add(ROWS[4]) == 5
+        cats.update(1, {'name': 'meals', 'desc': ''})
+        assert [row['category'] for row in trans.summarize_by_year('2022')] == ['meals']
+    with open(dbfile, 'wb') as snapshot:
+        snapshot.write(b'SQLite format 3\x00')
+    with pytest.raises(ValueError):
+        MemoryTransaction(dbfile)
+
+
+@pytest.mark.simple
+def test_release(dbfile):
+    ''' the store is saved and closed when the last ORM using it is closed '''
+    trans, cats = MemoryTransaction(dbfile), MemoryCategory(dbfile)
+    trans.add(ROWS[0])
+    trans.close()
+    cats.add({'name': 'car', 'desc': ''})
+    assert not cats.store.closed
+    cats.close()
+    assert cats.store.closed
+    with MemoryCategory(dbfile) as cats:
+        assert [cat['name'] for cat in cats.select_all()] == ['food', 'car']
+
+
+@pytest.mark.totals
+def test_same_as_sqlite(tmpdir):
+    ''' NULLs, bad dates and deleted categories read back as from SQLite '''
+    dbfile = str(tmpdir.join('test_memory.db'))
+    with Transaction(dbfile) as sql, MemoryTransaction() as mem:
+        sql_cats, mem_cats = Category(dbfile, pool=sql.pool), MemoryCategory(store=mem.store)
+        for trans, cats in ((sql, sql_cats), (mem, mem_cats)):
+            trans.add_many(ROWS, batch_size=2)
+            cats.delete(next(cat['rowid'] for cat in cats.select_all() if cat['name'] == 'car'))
+        assert mem.select_all() == sql.select_all()
+        assert sorted(cat['name'] for cat in mem_cats.select_all()) == \
+            sorted(cat['name'] for cat in sql_cats.select_all())
+        for name in ('totals_by_category', 'totals_by_year'):
+            assert getattr(mem, name)() == getattr(sql, name)()
+        assert mem.totals_by_month('2021') == sql.totals_by_month('2021')
+        assert mem.daily_totals(None, '12-31-2022') == sql.daily_totals(None, '12-31-2022')
+        for date in ('03-15-2021', 'some', '2021'):
+            assert mem.summarize_by_date(date) == sql.summarize_by_date(date)
+        assert mem.summarize_by_month('3') == sql.summarize_by_month('3')
+        assert list(mem.iter_between('01-01-2021', None, 'food')) == \
+            list(sql.iter_between('01-01-2021', None, 'food'))
+        for order in ('date', 'amount'):
+            for descending in (False, True):
+                assert mem.select_page(10, 1, order, descending) == \
+                    sql.select_page(10, 1, order, descending)
+                assert mem.select_page(10, 2, order, descending) == \
+                    sql.select_page(10, 2, order, descending)
@@ -0,0 +1,112 @@
+'''
+test_profiling runs integration tests on the ORM profiler
+'''
+
+import pytest
+from category import Category
+from profiling import PHASES, Profiler
+from tracker import main
+from transaction import Transaction
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return str(tmpdir.join('test_profiling.db'))
+
+
+@pytest.fixture
+def small_db(dbfile):
+    ''' create a small database with profiling enabled '''
+    db = Transaction(dbfile)
+    db.add_many([{'item_num': i, 'amount': i, 'category': 'food' if i % 2 else 'car',
+                  'date': '03-%02d-2022' % i, 'description': 'item %d' % i}
+                 for i in range(1, 11)])
+    db.enable_profiling(slow_ms=1000)
+    yield db
+    db.close()
+
+
+@pytest.mark.simple
+def test_method_phases(small_db):
+    ''' each call is counted with its rows and its time split into phases '''
+    small_db.select_all()
+    small_db.select_all()
+    assert len(list(small_db.iter_by_category('food'))) == 5
+    methods = small_db.profiler.methods
+    assert methods['Transaction.select_all']['calls'] == 2
+    assert methods['Transaction.select_all']['rows'] == 20
+    assert methods['Transaction.iter_by_category']['rows'] == 5
+    for totals in methods.values():
+        assert set(totals['phases']) == set(PHASES)
+        assert sum(totals['phases'].values()) == pytest.approx(totals['seconds'])
+
+
+@pytest.mark.add
+def test_nested_calls(small_db):
+    ''' time in a nested call is not counted twice '''
+    with small_db.pool.connection():
+        small_db.add({'item_num': 11, 'amount': 1, 'category': 'car', 'date': '03-11-2022',
+                      'description': 'air'})
+    small_db.submit({'item_num': 12, 'amount': 1, 'category': 'car', 'date': '03-12-2022',
+                     'description': 'air'}).result()
+    methods = small_db.profiler.methods
+    assert methods['Transaction.add']['calls'] == 2
+    submit = methods['Transaction.submit']
+    assert submit['phases']['execute'] == 0 and submit['rows'] == 0
+
+
+@pytest.mark.summarize_by_category
+def test_statements_and_plans(small_db):
+    ''' statements are counted and explained once '''
+    small_db.summarize_by_category('food')
+    small_db.summarize_by_category('car')
+    plans = [totals for sql, totals in small_db.profiler.statements.items()
+             if 'WHERE category_id IN' in sql]
+    assert len(plans) == 1 and plans[0]['calls'] == 2 and plans[0]['rows'] == 10
+    assert any('transactions_category' in step for step in plans[0]['plan'])
+    assert 'transactions_category' in small_db.profiler.report()
+
+
+@pytest.mark.totals
+def test_slow_log_and_sinks(dbfile):
+    ''' statements over the threshold are logged and passed to the sinks '''
+    events = []
+    category = Category(dbfile)
+    profiler = category.enable_profiling(Profiler(slow_ms=0, explain=False,
+                                                  sinks=[events.append]))
+    category.add({'name': 'food', 'desc': 'things to eat'})
+    assert [event['event'] for event in events] == ['call', 'slow']
+    assert events[1]['method'] == 'Category.add' and 'INSERT' in events[1]['sql']
+    assert events[1]['plan'] is None
+    assert list(profiler.slow) == events[1:]
+    category.disable_profiling()
+    category.select_all()
+    assert len(events) == 2
+    assert category.pool.profiler is None and 'select_all' not in vars(category)
+    category.close()
+
+
+@pytest.mark.totals
+def test_prometheus(small_db):
+    ''' the counters are written in the Prometheus text format '''
+    small_db.totals_by_month('2022')
+    text = small_db.profiler.prometheus()
+    assert 'tracker_method_calls_total{method="Transaction.totals_by_month"} 1\n' in text
+    assert 'tracker_method_seconds_total{method="Transaction.totals_by_month",phase="fetch"}' \
+        in text
+    assert '# TYPE tracker_statement_seconds_total counter' in text
+
+
+@pytest.mark.summarize_by_year
+def test_stats_command(dbfile, tmpdir, capsys):
+    ''' tracker.py stats runs a command and prints where its time went '''
+    main(['--db', dbfile, 'add', '--amount', '3', '--category', 'food', '--date',
+          '03-01-2022'])
+    metrics = tmpdir.join('metrics.txt')
+    assert main(['--db', dbfile, 'stats', '--prometheus', str(metrics),
+                 'summarize', '--year', '2022']) == 0
+    captured = capsys.readouterr()
+    assert '03-01-2022' in captured.out
+    assert 'Transaction.iter_between' in captured.err
+    assert 'tracker_method_calls_total' in metrics.read()
@@ -0,0 +1,102 @@
+'''
+test_query runs integration tests on the filtered query builder
+'''
+
+import pytest
+from query import compile_where
+from transaction import Transaction
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return str(tmpdir.join('test_query.db'))
+
+
+ROWS = [
+    {'item_num': 1, 'amount': 60, 'category': 'dining', 'date': '01-15-2022',
+     'description': 'birthday dinner'},
+    {'item_num': 2, 'amount': 20, 'category': 'dining', 'date': '02-01-2022',
+     'description': 'lunch'},
+    {'item_num': 3, 'amount': 90, 'category': 'dining', 'date': '04-01-2022',
+     'description': 'anniversary'},
+    {'item_num': 4, 'amount': 75, 'category': 'car', 'date': '03-03-2022',
+     'description': 'tires'},
+    {'item_num': 5, 'amount': 55, 'category': 'fun', 'date': '03-31-2022',
+     'description': 'concert'},
+    {'item_num': 6, 'amount': None, 'category': 'dining', 'date': '03-01-2022',
+     'description': 'unknown'},
+    {'item_num': 7, 'amount': 51, 'category': 'dining', 'date': '12-31-2021',
+     'description': 'new year'},
+]
+
+
+@pytest.fixture
+def small_db(dbfile):
+    ''' create a database of ROWS '''
+    db = Transaction(dbfile)
+    db.add_many(ROWS)
+    yield db
+    db.close()
+
+
+def item_nums(rows):
+    ''' return the item numbers of rows '''
+    return [row['item_num'] for row in rows]
+
+
+@pytest.mark.summarize_by_category
+def test_filters(small_db):
+    ''' the filters combine and each call returns a new query '''
+    dining = small_db.query().category('dining')
+    q1 = dining.between('01-01-2022', '03-31-2022')
+    assert item_nums(q1.all()) == [1, 2, 6]
+    assert item_nums(q1.amount(50).all()) == [1]
+    assert item_nums(dining.amount(maximum=60).all()) == [1, 2, 7]
+    assert item_nums(small_db.query().category(in_=['car', 'fun']).amount(70, 80)) == [4]
+    assert small_db.query().category(in_=[]).all() == []
+    assert item_nums(small_db.query().between(end='12-31-2021').all()) == [7]
+    with pytest.raises(ValueError):
+        small_db.query().between('Q1 2022')
+    with pytest.raises(ValueError):
+        small_db.query().category()
+
+
+@pytest.mark.select_all
+def test_order_and_limit(small_db):
+    ''' rows are sorted like select_page and limited '''
+    big = small_db.query().amount(50)
+    assert item_nums(big.order_by('amount', descending=True).limit(3).all()) == [3, 4, 1]
+    assert item_nums(big.order_by('date').all()) == [7, 1, 4, 5, 3]
+    assert item_nums(big.order_by('date').limit(2).iter(chunk_size=1)) == [7, 1]
+    assert item_nums(big.limit(None).all()) == [1, 3, 4, 5, 7]
+    with pytest.raises(ValueError):
+        big.order_by('description')
+
+
+@pytest.mark.totals
+def test_totals(small_db):
+    ''' totals are computed in SQL over the filtered rows '''
+    dining = small_db.query().category('dining')
+    assert dining.totals() == (5, 221.0, 55.25, 20.0, 90.0)
+    assert dining.between('01-01-2022').totals('month') == [
+        ('01-2022', 1, 60.0, 60.0, 60.0, 60.0), ('02-2022', 1, 20.0, 20.0, 20.0, 20.0),
+        ('03-2022', 1, None, None, None, None), ('04-2022', 1, 90.0, 90.0, 90.0, 90.0)]
+    assert small_db.query().amount(70).totals('category') == [
+        ('car', 1, 75.0, 75.0, 75.0, 75.0), ('dining', 1, 90.0, 90.0, 90.0, 90.0)]
+    assert small_db.query().totals('year') == small_db.totals_by_year()
+    with pytest.raises(ValueError):
+        dining.totals('week')
+
+
+@pytest.mark.simple
+def test_one_statement_per_shape(small_db):
+    ''' queries of the same shape share their SQL text, and use an index '''
+    first = small_db.query().category('dining').between('01-01-2022').amount(50)
+    second = small_db.query().category('car').between('06-01-2021').amount(10)
+    assert first.compile()[0] is second.compile()[0]
+    assert compile_where.cache_info().hits > 0
+    sql, params = first.compile()
+    with small_db.pool.connection() as con:
+        plan = con.execute('EXPLAIN QUERY PLAN '+sql, params).fetchall()
+    assert 'INDEX' in plan[0][3]
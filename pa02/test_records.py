@@ -0,0 +1,48 @@
+'''
+test_records runs unit tests on the compact Record rows
+'''
+
+import pickle
+import pytest
+from records import Record
+
+
+class Point(Record):
+    ''' a record type for the tests '''
+    __slots__ = ()
+    fields = ('rowid', 'x', 'y')
+
+
+@pytest.mark.simple
+def test_dict_access():
+    ''' a record reads like the equivalent dict '''
+    point = Point((1, 2.5, 'up'))
+    assert point['x'] == 2.5
+    assert point[2] == 'up'
+    assert point.get('y') == 'up'
+    assert point.get('z', 0) == 0
+    assert list(point) == ['rowid', 'x', 'y']
+    assert 'x' in point and 'z' not in point
+    assert point.keys() == ('rowid', 'x', 'y')
+    assert point.values() == (1, 2.5, 'up')
+    assert dict(point.items()) == point.to_dict()
+    assert len(point) == 3
+    with pytest.raises(KeyError):
+        point['z']  # pylint: disable=pointless-statement
+
+
+@pytest.mark.simple
+def test_equality():
+    ''' records compare equal to dicts and records with the same contents '''
+    point = Point((1, 2.5, 'up'))
+    assert point == {'rowid': 1, 'x': 2.5, 'y': 'up'}
+    assert point != {'rowid': 1, 'x': 2.5}
+    assert point == Point((1, 2.5, 'up'))
+    assert point != Point((2, 2.5, 'up'))
+
+
+@pytest.mark.simple
+def test_pickle():
+    ''' records survive being sent to another process '''
+    point = Point((1, 2.5, 'up'))
+    assert pickle.loads(pickle.dumps(point)) == point
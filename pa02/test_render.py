@@ -0,0 +1,80 @@
+'''
+test_render runs unit tests on the table renderer
+'''
+
+import io
+import os
+import pytest
+from render import CATEGORIES, TRANSACTIONS, Renderer, totals_columns
+from transaction import TransactionRecord
+
+
+class CountingWriter(io.StringIO):
+    ''' a StringIO that counts its writes '''
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def transactions(count):
+    ''' generate count transaction dicts '''
+    for i in range(count):
+        yield {'rowid': i + 1, 'item_num': 1.0, 'amount': i + 0.5 if i % 2 else float(i),
+               'category': 'food', 'date': '03-01-2022', 'description': 'lunch %d' % i}
+
+
+@pytest.mark.simple
+def test_table():
+    ''' columns fit the sample, numbers are right aligned, a missing number is blank '''
+    out = io.StringIO()
+    rows = [{'rowid': 1, 'name': 'food', 'desc': 'groceries'},
+            {'rowid': 12, 'name': 'car', 'desc': ''}]
+    assert Renderer(out).print_table(CATEGORIES, rows) == 2
+    assert out.getvalue().split('\n') == ['id name description', '-'*19,
+                                          ' 1 food groceries', '12 car  ', '']
+    out = io.StringIO()
+    Renderer(out).print_table(totals_columns('year'), [('2022', 2, 3.5, 1.75, 1.0, None)])
+    assert out.getvalue().split('\n')[2] == '2022     2  3.50    1.75 1.00    '
+    out = io.StringIO()
+    Renderer(out).print_table(TRANSACTIONS, [TransactionRecord(
+        (1, 2.0, 12.5, 'car', '03-01-2022', 'gas'))])
+    assert out.getvalue().split('\n')[2] == ' 1      2   12.5 car      03-01-2022 gas'
+
+
+@pytest.mark.simple
+def test_batches_and_count_only():
+    ''' rows are written a batch at a time, or only counted '''
+    out = CountingWriter()
+    assert Renderer(out, batch_size=100).print_table(TRANSACTIONS, transactions(1050)) == 1050
+    assert out.writes == 1 + 11
+    assert len(out.getvalue().split('\n')) == 1050 + 3
+    out = io.StringIO()
+    assert Renderer(out, count_only=True).print_table(TRANSACTIONS, transactions(7),
+                                                      'transactions') == 7
+    assert out.getvalue() == '7 transactions\n'
+    out = io.StringIO()
+    assert Renderer(out).print_table(TRANSACTIONS, iter([]), 'transactions') == 0
+    assert out.getvalue() == 'no transactions to print\n'
+
+
+@pytest.mark.simple
+def test_pager(tmpdir):
+    ''' a table longer than the terminal goes through the pager '''
+    pty = pytest.importorskip('pty')
+    fcntl = pytest.importorskip('fcntl')
+    termios = pytest.importorskip('termios')
+    leader, follower = pty.openpty()
+    fcntl.ioctl(follower, termios.TIOCSWINSZ, b'\x18\x00\x50\x00\x00\x00\x00\x00')
+    paged = tmpdir.join('paged.txt')
+    with os.fdopen(follower, 'w') as terminal:
+        renderer = Renderer(terminal, pager="sh -c 'cat > %s'" % paged)
+        renderer.print_table(TRANSACTIONS, transactions(10))
+        assert not paged.exists()
+        renderer.print_table(TRANSACTIONS, transactions(100))
+    os.close(leader)
+    assert len(paged.read().split('\n')) == 100 + 3
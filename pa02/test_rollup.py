@@ -0,0 +1,83 @@
+'''
+test_rollup runs integration tests on the rollup tables
+'''
+
+import pytest
+from transaction import Transaction
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return tmpdir.join('test_rollup.db')
+
+
+@pytest.fixture
+def small_db(dbfile):
+    ''' create a small database with rollups enabled after the first rows '''
+    db = Transaction(dbfile)
+    db.add_many([
+        {'item_num': 1, 'amount': 10, 'category': 'food', 'date': '03-01-2022',
+         'description': 'lunch'},
+        {'item_num': 2, 'amount': 30, 'category': 'food', 'date': '03-20-2022',
+         'description': 'dinner'},
+    ])
+    db.enable_rollups()
+    db.add_many([
+        {'item_num': 3, 'amount': 40, 'category': 'car', 'date': '04-02-2022',
+         'description': 'gas'},
+        {'item_num': 4, 'amount': 5, 'category': 'food', 'date': '01-05-2023',
+         'description': 'snack'},
+        {'item_num': 5, 'amount': 7, 'category': 'fun', 'date': 'someday',
+         'description': 'no date'},
+    ])
+    yield db
+    db.close()
+
+
+@pytest.mark.totals
+def test_rollup_queries(small_db):
+    ''' the rollups agree with the totals computed from the transactions '''
+    assert small_db.rollup_by_month('2022') == [('03', 2, 40, 20), ('04', 1, 40, 40)]
+    assert small_db.rollup_by_year() == [('2022', 3, 80, 80/3), ('2023', 1, 5, 5)]
+    assert small_db.rollup_by_category() == [('car', 1, 40, 40), ('food', 3, 45, 15),
+                                             ('fun', 1, 7, 7)]
+    assert small_db.rollup_by_category('2023') == [('food', 1, 5, 5)]
+    assert small_db.check_rollups() == []
+
+
+@pytest.mark.delete
+def test_rollups_follow_changes(small_db):
+    ''' deletes and updates made directly in SQL are rolled up too '''
+    small_db.delete(3)
+    with small_db.pool.connection() as con:
+        con.execute("UPDATE transactions SET amount=12, "
+                    "category_id=(SELECT id FROM categories WHERE name='fun') WHERE rowid=1")
+    assert small_db.rollup_by_month('2022') == [('03', 2, 42, 21)]
+    assert small_db.rollup_by_category('2022') == [('food', 1, 30, 30), ('fun', 1, 12, 12)]
+    assert small_db.check_rollups() == []
+
+
+@pytest.mark.update
+def test_check_and_rebuild(small_db):
+    ''' check finds a damaged rollup table and rebuild repairs it '''
+    with small_db.pool.connection() as con:
+        con.execute("UPDATE transaction_rollups SET total=total+1 "
+                    "WHERE category_id=(SELECT id FROM categories WHERE name='car')")
+        con.execute("DELETE FROM transaction_rollups WHERE year='2023'")
+    assert small_db.check_rollups() == [
+        ('2022', '04', 'car', (1, 41.0), (1, 40.0)),
+        ('2023', '01', 'food', None, (1, 5.0))]
+    small_db.rebuild_rollups()
+    assert small_db.check_rollups() == []
+
+
+@pytest.mark.totals
+def test_disabled_rollups(small_db):
+    ''' without the rollup table the queries group the transactions '''
+    expected = small_db.rollup_by_category()
+    small_db.disable_rollups()
+    small_db.add({'item_num': 6, 'amount': 1, 'category': 'car', 'date': '04-03-2022',
+                  'description': 'air'})
+    assert small_db.rollup_by_category()[0] == ('car', 2, 41, 20.5)
+    assert small_db.rollup_by_category()[1:] == expected[1:]
@@ -0,0 +1,132 @@
+'''
+test_sharding runs integration tests on the year sharded transactions
+'''
+
+import os
+import pytest
+from sharding import SHARD_SPAN, ShardedTransaction, shard_of
+from transaction import Transaction
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return str(tmpdir.join('test_sharding.db'))
+
+
+ROWS = [
+    {'item_num': 1, 'amount': 10, 'category': 'food', 'date': '03-01-2022',
+     'description': 'lunch'},
+    {'item_num': 2, 'amount': 40, 'category': 'car', 'date': '03-15-2021',
+     'description': 'gas'},
+    {'item_num': 3, 'amount': 30, 'category': 'food', 'date': '12-31-2021',
+     'description': 'dinner'},
+    {'item_num': 4, 'amount': 5, 'category': 'food', 'date': '03-02-2022',
+     'description': 'snack'},
+    {'item_num': 5, 'amount': None, 'category': 'fun', 'date': 'someday',
+     'description': 'no date'},
+]
+
+
+@pytest.fixture(params=[0, 2], ids=['in process', 'workers'])
+def sharded(dbfile, request):
+    ''' create a sharded database of ROWS, queried in this process and
+        with worker processes '''
+    db = ShardedTransaction(dbfile, workers=request.param)
+    db.add_many(ROWS, batch_size=2)
+    yield db
+    db.close()
+
+
+@pytest.mark.add
+def test_shard_files_and_rowids(sharded, dbfile):
+    ''' each year has its own file and the rowids say which '''
+    stem = os.path.splitext(dbfile)[0]
+    for name in ('2021', '2022', 'undated'):
+        assert os.path.exists('%s.%s.db' % (stem, name))
+    rowids = [row['rowid'] for row in sharded.select_all()]
+    assert rowids == sorted(rowids)
+    assert [shard_of(rowid) for rowid in rowids] == [0, 2021, 2021, 2022, 2022]
+    assert rowids[1] == 2021 * SHARD_SPAN + 1
+    rowid = sharded.add({'item_num': 6, 'amount': 1, 'category': 'car',
+                         'date': '01-01-2022', 'description': 'air'})
+    assert rowid == 2022 * SHARD_SPAN + 3
+    sharded.delete(rowid)
+    sharded.delete(1999 * SHARD_SPAN + 1)
+    assert len(sharded.select_all()) == 5
+
+
+@pytest.mark.summarize_by_category
+def test_fan_out_matches_one_file(sharded, tmpdir):
+    ''' the merged results are those of an unsharded Transaction '''
+    with Transaction(str(tmpdir.join('one.db'))) as one:
+        one.add_many(ROWS)
+
+        def without_rowids(rows):
+            return [{key: row[key] for key in row if key != 'rowid'} for row in rows]
+
+        assert sorted(without_rowids(sharded.summarize_by_category('food')),
+                      key=lambda row: row['item_num']) == \
+            without_rowids(one.summarize_by_category('food'))
+        assert without_rowids(sharded.summarize_by_year('2021')) == \
+            without_rowids(one.summarize_by_year('2021'))
+        assert sharded.totals_by_category() == one.totals_by_category()
+        assert sharded.totals_by_category('03-01-2021', '12-31-2021') == \
+            one.totals_by_category('03-01-2021', '12-31-2021')
+        assert sharded.totals_by_year() == one.totals_by_year()
+        assert sharded.totals_by_month('2022') == one.totals_by_month('2022')
+        assert sharded.daily_totals('12-31-2021', '03-01-2022') == \
+            one.daily_totals('12-31-2021', '03-01-2022')
+
+
+@pytest.mark.summarize_by_year
+def test_reopen(sharded, dbfile):
+    ''' a new ShardedTransaction finds the shards and numbers on from them '''
+    sharded.close()
+    with ShardedTransaction(dbfile, workers=0) as again:
+        assert sorted(again.shards) == [0, 2021, 2022]
+        assert [row['item_num'] for row in again.iter_between('01-01-2022')] == [1, 4]
+        assert again.summarize_by_year('2020') == []
+        assert again.add(ROWS[0]) == 2022 * SHARD_SPAN + 3
+
+
+@pytest.mark.update
+def test_same_methods_as_transaction(sharded, tmpdir):
+    ''' paging, the date and month iterators, update and delete_many work
+        across the shards like on one file '''
+    assert sharded.add_many([]) == []
+    assert sharded.add_many([ROWS[0], ROWS[1], ROWS[3]]) == [
+        (2021 * SHARD_SPAN + 3, 2021 * SHARD_SPAN + 3),
+        (2022 * SHARD_SPAN + 3, 2022 * SHARD_SPAN + 4)]
+    with Transaction(str(tmpdir.join('one.db'))) as one:
+        one.add_many(ROWS + [ROWS[0], ROWS[1], ROWS[3]])
+
+        def pages(db, order, descending=False, **filters):
+            ''' the item numbers of every page of two rows '''
+            items, after = [], None
+            while True:
+                page = db.select_page(2, after, order, descending, **filters)
+                if not page:
+                    return items
+                items.append([row['item_num'] for row in page])
+                after = page[-1]['rowid']
+
+        assert pages(sharded, 'rowid') == [[5, 2], [3, 2], [1, 4], [1, 4]]
+        for order in ('date', 'amount'):
+            for descending in (False, True):
+                assert pages(sharded, order, descending) == pages(one, order, descending)
+        assert pages(sharded, 'amount', start='01-01-2022', category='food') == \
+            pages(one, 'amount', start='01-01-2022', category='food')
+        assert [row['item_num'] for row in sharded.iter_by_date('03-01-2022')] == [1, 1]
+        assert [row['item_num'] for row in sharded.iter_by_month('3')] == [2, 2, 1, 4, 1, 4]
+    rowid = 2021 * SHARD_SPAN + 1
+    assert sharded.update(rowid, {'amount': 45}) == rowid
+    moved = sharded.update(rowid, {'date': '01-02-2022', 'category': 'travel'})
+    assert shard_of(moved) == 2022
+    assert [(row['amount'], row['category']) for row in sharded.summarize_by_date('1-2-2022')] \
+        == [(45, 'travel')]
+    assert sharded.summarize_by_year('2021')[0]['item_num'] == 3
+    with pytest.raises(ValueError):
+        sharded.update(moved, {'rowid': 1})
+    assert sharded.delete_many([moved, 1, 1999 * SHARD_SPAN + 1], batch_size=2) == 2
+    assert len(sharded.select_all()) == 6
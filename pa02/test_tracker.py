@@ -0,0 +1,196 @@
+'''
+test_tracker runs integration tests on the tracker.py command line
+'''
+
+import pytest
+from tracker import Database, main, toplevel
+from transaction import Transaction
+
+
+@pytest.fixture
+def dbfile(tmpdir):
+    ''' create a database file in a temporary file system '''
+    return str(tmpdir.join('test_tracker.db'))
+
+
+def add(dbfile, amount, category, date):
+    ''' run "tracker.py add" '''
+    return main(['--db', dbfile, 'add', '--amount', str(amount), '--category', category,
+                 '--date', date])
+
+
+@pytest.mark.add
+def test_add_and_summarize(dbfile, capsys):
+    ''' add prints the rowid and summarize combines its filters '''
+    assert add(dbfile, 12, 'food', '03-01-2022') == 0
+    assert add(dbfile, 40, 'car', '03-15-2022') == 0
+    assert add(dbfile, 5, 'food', '04-01-2022') == 0
+    assert capsys.readouterr().out.split() == ['1', '2', '3']
+    main(['--db', dbfile, 'summarize', '--month', '03', '--year', '2022', '--category', 'food'])
+    out = capsys.readouterr().out
+    assert '03-01-2022' in out
+    assert '03-15-2022' not in out and '04-01-2022' not in out
+    assert main(['--db', dbfile, 'summarize', '--year', '20x2']) == 2
+    assert main(['--db', dbfile, 'summarize', '--start', '03-01-2022', '--end', 'May']) == 2
+    assert "'May' is not a MM-DD-YYYY date" in capsys.readouterr().err
+
+
+@pytest.mark.add
+def test_run_script(dbfile, tmpdir, capsys):
+    ''' a script runs in one database transaction '''
+    script = tmpdir.join('script.txt')
+    script.write('# two adds\n'
+                 'add --amount 1 --category food --date 03-01-2022\n'
+                 '\n'
+                 'add-category food "things to eat"\n'
+                 'add --amount 2 --category food --date 03-02-2022 --description "a b"\n')
+    assert main(['--db', dbfile, 'run-script', str(script)]) == 0
+    with Transaction(dbfile) as trans:
+        assert [row['description'] for row in trans.select_all()] == ['', 'a b']
+    capsys.readouterr()
+
+
+@pytest.mark.delete
+def test_run_script_rolls_back(dbfile, tmpdir, capsys):
+    ''' a failing command undoes the commands before it '''
+    script = tmpdir.join('script.txt')
+    script.write('add --amount 1 --category food --date 03-01-2022\n'
+                 'export %s\n' % tmpdir.join('missing', 'out.csv'))
+    assert main(['--db', dbfile, 'run-script', str(script)]) == 1
+    assert 'line 2' in capsys.readouterr().err
+    script.write('add --amount 1 --category food --date 03-01-2022\n'
+                 'delete one\n')
+    assert main(['--db', dbfile, 'run-script', str(script)]) == 2
+    with Transaction(dbfile) as trans:
+        assert trans.select_all() == []
+
+
+@pytest.mark.summarize_by_category
+def test_query(dbfile, capsys):
+    ''' query combines dates, categories and amounts in one statement '''
+    add(dbfile, 60, 'dining', '01-15-2022')
+    add(dbfile, 20, 'dining', '02-01-2022')
+    add(dbfile, 75, 'car', '03-03-2022')
+    add(dbfile, 55, 'fun', '12-31-2021')
+    capsys.readouterr()
+    assert main(['--db', dbfile, 'query', '--start', '01-01-2022', '--end', '03-31-2022',
+                 '--category', 'dining', '--category', 'car', '--min', '50']) == 0
+    out = capsys.readouterr().out
+    assert '01-15-2022' in out and '03-03-2022' in out
+    assert '02-01-2022' not in out and '12-31-2021' not in out
+    assert main(['--db', dbfile, 'query', '--min', '50', '--totals', 'year']) == 0
+    assert capsys.readouterr().out.split()[-12:-6] == ['2021', '1', '55.00', '55.00',
+                                                       '55.00', '55.00']
+    assert main(['--db', dbfile, 'query', '--start', 'last week']) == 2
+
+
+@pytest.mark.select_all
+def test_list(dbfile, capsys):
+    ''' list prints a page and the option for the next, a bad date is an error '''
+    add(dbfile, 60, 'dining', '01-15-2022')
+    add(dbfile, 20, 'dining', '02-01-2022')
+    capsys.readouterr()
+    assert main(['--db', dbfile, 'list', '--limit', '1', '--order', 'amount']) == 0
+    captured = capsys.readouterr()
+    assert '02-01-2022' in captured.out and '01-15-2022' not in captured.out
+    assert captured.err == 'next page: --after 2\n'
+    assert main(['--db', dbfile, 'list', '--start', '01-01-2022', '--end', 'March']) == 2
+    assert "'March' is not a MM-DD-YYYY date" in capsys.readouterr().err
+
+
+@pytest.mark.add
+def test_menu_shows_new_categories(dbfile, monkeypatch, capsys):
+    ''' a category created by adding a transaction is shown at once '''
+    answers = iter(['1', '5', '1', '12', 'food', '03-01-2022', 'lunch', '1', '0'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    db = Database(dbfile)
+    try:
+        toplevel(db)
+    finally:
+        db.close()
+    out = capsys.readouterr().out
+    assert 'no categories to print' in out
+    assert ' 1 food' in out.rsplit('add transaction', 1)[1]
+
+
+@pytest.mark.totals
+def test_menu_reports_bad_dates(dbfile, monkeypatch, capsys):
+    ''' a date that cannot be read is reported and the menu goes on '''
+    add(dbfile, 12, 'food', '03-01-2022')
+    answers = iter(['13', 'March', '', '14', '', '', '14', '', '3-32-2022', '0'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    db = Database(dbfile)
+    try:
+        toplevel(db)
+    finally:
+        db.close()
+    out = capsys.readouterr().out
+    assert "'March' is not a MM-DD-YYYY date" in out
+    assert '03-01-2022     1' in out
+    assert "'3-32-2022' is not a MM-DD-YYYY date" in out
+    assert out.endswith('bye\n')
+
+
+
+@pytest.mark.select_all
+def test_menu_reports_bad_order(dbfile, monkeypatch, capsys):
+    ''' an order that cannot be paged is reported and the menu goes on '''
+    add(dbfile, 12, 'food', '03-01-2022')
+    answers = iter(['4', 'description', '4', 'amount', '0'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    db = Database(dbfile)
+    try:
+        toplevel(db)
+    finally:
+        db.close()
+    out = capsys.readouterr().out
+    assert "cannot order by 'description'" in out
+    assert '03-01-2022' in out.rsplit('cannot order by', 1)[1]
+    assert out.endswith('bye\n')
+
+
+
+@pytest.mark.add
+def test_menu_reports_missing_statements(dbfile, tmpdir, monkeypatch, capsys):
+    ''' a statement that cannot be read is reported and the menu goes on '''
+    missing = str(tmpdir.join('missing.csv'))
+    answers = iter(['15', missing, '0'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    db = Database(dbfile)
+    try:
+        toplevel(db)
+    finally:
+        db.close()
+    out = capsys.readouterr().out
+    assert 'skipped %s: No such file or directory' % missing in out
+    assert 'imported 0 transactions, rejected 0' in out
+    assert out.endswith('bye\n')
+
+
+@pytest.mark.simple
+def test_export_bad_date(dbfile, tmpdir, monkeypatch, capsys):
+    ''' export reports a bad date on stderr, and in the menu, without a traceback '''
+    path = str(tmpdir.join('out.csv'))
+    assert main(['--db', dbfile, 'export', path, '--start', 'March']) == 2
+    assert "'March' is not a MM-DD-YYYY date" in capsys.readouterr().err
+    answers = iter(['16', path, '', 'April', '0'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    db = Database(dbfile)
+    try:
+        toplevel(db)
+    finally:
+        db.close()
+    assert "'April' is not a MM-DD-YYYY date" in capsys.readouterr().out
+
+
+@pytest.mark.simple
+def test_export_parquet_without_pyarrow(dbfile, tmpdir, monkeypatch, capsys):
+    ''' the command writes the binary format and says where '''
+    import exporter  # pylint: disable=import-outside-toplevel
+    monkeypatch.setattr(exporter, 'pyarrow', None)
+    add(dbfile, 12, 'food', '03-01-2022')
+    capsys.readouterr()
+    assert main(['--db', dbfile, 'export', str(tmpdir.join('out.parquet'))]) == 0
+    out, err = capsys.readouterr()
+    assert 'needs pyarrow' in err
+    assert out == 'exported 1 transactions to %s\n' % tmpdir.join('out.trx')
@@ -2,8 +2,11 @@
 test_transaction runs unit and integration tests on the transaction module
 '''
 
+import sqlite3
 import pytest
-from transaction import Transaction, to_trans_dict
+from category import Category
+from engines import ENGINES, open_category, open_transaction
+from transaction import Transaction, column_names, page_keys, to_trans_dict, to_iso_date
 
 
 @pytest.fixture
@@ -12,11 +15,18 @@ def dbfile(tmpdir):
     return tmpdir.join('test_tracker1.db')
 
 
+@pytest.fixture(params=ENGINES)
+def engine(request):
+    ''' run the tests on each storage engine '''
+    return request.param
+
+
 @pytest.fixture
-def empty_db(dbfile):
+def empty_db(dbfile, engine):
     ''' create an empty database '''
-    db = Transaction(dbfile)
+    db = open_transaction(dbfile, engine)
     yield db
+    db.close()
 
 
 @pytest.fixture
@@ -70,6 +80,23 @@ def test_add_transactions3(small_db):
     actual = small_db.select_all()
     assert expected == actual
 
+@pytest.mark.add
+def test_add_many(small_db):
+    ''' add a generator of transactions in small batches '''
+    trans = ({'item_num': i, 'amount': i, 'category': 'bulk',
+              'date': '01-01-2020', 'description': 'bulk '+str(i)} for i in range(25))
+    assert small_db.add_many(trans, batch_size=10) == (3, 27)
+    actual = small_db.summarize_by_category('bulk')
+    assert len(actual) == 25
+    assert actual[-1]['rowid'] == 27
+    assert actual[-1]['description'] == 'bulk 24'
+
+@pytest.mark.add
+def test_add_many_empty(small_db):
+    ''' adding nothing returns None and leaves the table alone '''
+    assert small_db.add_many([]) is None
+    assert len(small_db.select_all()) == 2
+
 @pytest.mark.delete
 def test_delete_transactions(small_db):
     small_db.delete(2)
@@ -140,3 +167,255 @@ def test_summarize_by_category(small_db):
     assert len(expected[1]) == len(actual[1])
     assert expected[0] == actual[0]
     assert expected[1] == actual[1]
+
+
+@pytest.mark.simple
+def test_to_iso_date():
+    assert to_iso_date('06-06-2001') == '2001-06-06'
+    assert to_iso_date('3/21/2022') == '2022-03-21'
+    assert to_iso_date('13-01-2022') == ''
+    assert to_iso_date('yesterday') == ''
+
+
+@pytest.mark.summarize_by_year
+def test_migrate_old_table(dbfile):
+    ''' a table made before iso_date existed is backfilled and indexed '''
+    con = sqlite3.connect(dbfile)
+    con.execute('''CREATE TABLE transactions
+                (item_num real, amount real, category text, date text, description text)''')
+    con.execute("INSERT INTO transactions VALUES(1, 5, 'food', '02-03-2021', 'lunch')")
+    con.commit()
+    con.close()
+    with Transaction(dbfile) as db:
+        assert [t['description'] for t in db.summarize_by_year('2021')] == ['lunch']
+        assert [t['description'] for t in db.summarize_by_month('2')] == ['lunch']
+        assert [t['description'] for t in db.summarize_by_date('2-3-2021')] == ['lunch']
+
+
+@pytest.mark.update
+def test_category_ids(dbfile):
+    ''' transactions refer to their category by id, so a rename renames them all '''
+    con = sqlite3.connect(dbfile)
+    con.execute("CREATE TABLE categories (name text, desc text)")
+    con.execute("INSERT INTO categories VALUES('food', 'things to eat'), ('car', 'driving')")
+    con.execute('''CREATE TABLE transactions
+                (item_num real, amount real, category text, date text, description text)''')
+    con.execute('''INSERT INTO transactions VALUES(1, 5, 'car', '02-03-2021', 'gas'),
+                   (2, 6, 'fun', '02-04-2021', 'film'), (3, 7, 'food', '02-05-2021', 'lunch'),
+                   (4, 8, NULL, '02-06-2021', 'lost')''')
+    con.commit()
+    con.close()
+    with Transaction(dbfile) as db:
+        cats = Category(dbfile, pool=db.pool)
+        assert [(cat['rowid'], cat['name']) for cat in cats.select_all()] == [
+            (1, 'food'), (2, 'car'), (3, 'fun')]
+        assert [row['category'] for row in db.select_all()] == ['car', 'fun', 'food', None]
+        with db.pool.connection() as con:
+            assert 'category' not in column_names(con, 'transactions')
+        db.add({'item_num': 5, 'amount': 9, 'category': 'gifts', 'date': '02-07-2021',
+                'description': 'flowers'})
+        assert cats.select_one(4)['name'] == 'gifts'
+        cats.update(3, {'name': 'films', 'desc': ''})
+        assert [row['description'] for row in db.summarize_by_category('films')] == ['film']
+        assert db.summarize_by_category('fun') == []
+        assert [total[:3] for total in db.totals_by_category()] == [
+            (None, 1, 8.0), ('car', 1, 5.0), ('films', 1, 6.0), ('food', 1, 7.0),
+            ('gifts', 1, 9.0)]
+
+
+@pytest.mark.summarize_by_date
+def test_summaries_use_indexes(small_db, engine):
+    ''' the summaries are index lookups rather than table scans '''
+    if engine != 'sqlite':
+        pytest.skip('query plans are SQLite only')
+    queries = [("iso_date=?", ('2001-06-06',)),
+               ("substr(iso_date, 6, 2)=?", ('06',)),
+               ("iso_date BETWEEN ? AND ?", ('2001-01-01', '2001-12-31')),
+               ("category_id=?", (1,))]
+    with small_db.pool.connection() as con:
+        for where, params in queries:
+            plan = con.execute("EXPLAIN QUERY PLAN SELECT rowid FROM transactions WHERE "+where,
+                               params).fetchall()
+            assert 'INDEX' in plan[0][3]
+
+
+@pytest.mark.totals
+def test_totals(small_db):
+    ''' the totals are computed per group in SQL '''
+    small_db.add({'item_num': 1, 'amount': 7, 'category': 'food',
+                  'date': '06-20-2001', 'description': 'lunch'})
+    assert small_db.totals_by_month('2001') == [('05', 1, 1.0, 1.0, 1.0, 1.0),
+                                                ('06', 2, 20.0, 10.0, 7.0, 13.0)]
+    assert small_db.totals_by_year() == [('2001', 3, 21.0, 7.0, 1.0, 13.0)]
+    assert small_db.totals_by_category('06-01-2001', '06-30-2001') == [
+        ('food', 1, 7.0, 7.0, 7.0, 7.0), ('parking', 1, 13.0, 13.0, 13.0, 13.0)]
+    assert small_db.daily_totals('05-05-2001', '06-06-2001') == [
+        ('05-05-2001', 1, 1.0, 1.0, 1.0, 1.0), ('06-06-2001', 1, 13.0, 13.0, 13.0, 13.0)]
+    with pytest.raises(ValueError):
+        small_db.daily_totals('last week', None)
+
+
+@pytest.mark.select_all
+def test_iterators(small_db):
+    ''' the iterators yield the same rows as the list methods '''
+    small_db.add_many({'item_num': i, 'amount': i, 'category': 'bulk',
+                       'date': '06-0%d-2001' % (i % 9 + 1), 'description': 'bulk'}
+                      for i in range(20))
+    assert list(small_db.iter_all(chunk_size=3)) == small_db.select_all()
+    assert list(small_db.iter_by_date('06-06-2001', 3)) == small_db.summarize_by_date('06-06-2001')
+    assert list(small_db.iter_by_month('06', 3)) == small_db.summarize_by_month('06')
+    assert list(small_db.iter_by_year('2001', 3)) == small_db.summarize_by_year('2001')
+    assert list(small_db.iter_by_category('bulk', 3)) == small_db.summarize_by_category('bulk')
+
+
+@pytest.mark.select_all
+def test_iterator_is_lazy(small_db):
+    ''' rows are produced one at a time and the iterator can stop early '''
+    rows = small_db.iter_all(chunk_size=1)
+    assert next(rows)['rowid'] == 1
+    rows.close()
+    assert len(small_db.select_all()) == 2
+
+
+@pytest.mark.select_all
+def test_compact_rows(small_db, dbfile, engine):
+    ''' compact rows hold the same data as the dicts '''
+    compact = open_transaction(dbfile, engine, compact=True)
+    rows = compact.select_all()
+    assert rows == small_db.select_all()
+    assert rows[0]['amount'] == 13
+    assert list(compact.iter_by_category('parking')) == rows
+    assert tuple(rows[1].values()) == (2, 10, 1, 'parking', '05-05-2001',
+                                       'the parking ticket actually, why????')
+
+
+def read_pages(db, limit, **kwargs):
+    ''' page through the transactions, return the pages '''
+    pages, after_rowid = [], None
+    while True:
+        page = db.select_page(limit, after_rowid, **kwargs)
+        if not page:
+            return pages
+        pages.append(page)
+        after_rowid = page[-1]['rowid']
+
+
+@pytest.mark.select_all
+def test_select_page(small_db):
+    ''' keyset pages cover every row once, in order, with ties split by rowid '''
+    small_db.add_many({'item_num': i, 'amount': i % 4, 'category': 'bulk',
+                       'date': '06-0%d-2001' % (i % 3 + 1), 'description': 'bulk'}
+                      for i in range(20))
+    rows = small_db.select_all()
+    by_rowid = [row['rowid'] for row in rows]
+    assert [row['rowid'] for page in read_pages(small_db, 5) for row in page] == by_rowid
+    for order, key in (('amount', lambda row: (row['amount'], row['rowid'])),
+                       ('date', lambda row: (row['date'][6:]+row['date'][:5],
+                                             row['amount'], row['rowid']))):
+        pages = read_pages(small_db, 3, order=order)
+        assert [len(page) for page in pages] == [3] * 7 + [1]
+        assert [row for page in pages for row in page] == sorted(rows, key=key)
+        pages = read_pages(small_db, 4, order=order, descending=True)
+        assert [row for page in pages for row in page] == sorted(rows, key=key, reverse=True)
+    pages = read_pages(small_db, 2, order='amount', category='parking')
+    assert [row['rowid'] for page in pages for row in page] == [2, 1]
+    with pytest.raises(ValueError):
+        small_db.select_page(order='description')
+
+
+
+@pytest.mark.select_all
+def test_select_page_deleted_cursor(small_db):
+    ''' the next page is found from the keys of the last row after it is deleted '''
+    small_db.add_many({'item_num': i, 'amount': i % 4, 'category': 'bulk',
+                       'date': '06-0%d-2001' % (i % 3 + 1), 'description': 'bulk'}
+                      for i in range(20))
+    for order in ('rowid', 'date', 'amount'):
+        for descending in (False, True):
+            first, second = read_pages(small_db, 4, order=order, descending=descending)[:2]
+            last = first[-1]
+            small_db.delete(last['rowid'])
+            assert small_db.select_page(4, order=order, descending=descending,
+                                        after_keys=page_keys(last, order)) == second
+            if order == 'rowid':
+                assert small_db.select_page(4, last['rowid'], descending=descending) == second
+            small_db.add(last)
+    with pytest.raises(ValueError):
+        page_keys(last, 'description')
+
+
+@pytest.mark.update
+def test_update(small_db):
+    ''' update changes only the columns given, the date with its iso_date '''
+    small_db.update(2, {'amount': 4, 'category': 'fines', 'date': '07-07-2002'})
+    assert small_db.select_all()[1] == {
+        'rowid': 2, 'item_num': 10.0, 'amount': 4.0, 'category': 'fines',
+        'date': '07-07-2002', 'description': 'the parking ticket actually, why????'}
+    assert [row['rowid'] for row in small_db.summarize_by_year('2002')] == [2]
+    assert [row['rowid'] for row in small_db.summarize_by_month('7')] == [2]
+    assert [row['rowid'] for row in small_db.summarize_by_category('parking')] == [1]
+    small_db.update(1, {'category': 'fines'})
+    assert [row['rowid'] for row in small_db.summarize_by_category('fines')] == [1, 2]
+    with pytest.raises(ValueError):
+        small_db.update(1, {'rowid': 5})
+    with pytest.raises(ValueError):
+        small_db.update(1, {})
+
+
+@pytest.mark.delete
+def test_delete_many(small_db):
+    ''' delete_many counts the rows it deleted, batch by batch '''
+    first, last = small_db.add_many({'item_num': i, 'amount': i, 'category': 'bulk',
+                                     'date': '01-01-2020', 'description': 'bulk'}
+                                    for i in range(10))
+    assert small_db.delete_many(range(first, last + 5), batch_size=3) == 10
+    assert small_db.delete_many(iter([])) == 0
+    assert [row['rowid'] for row in small_db.select_all()] == [1, 2]
+
+
+@pytest.mark.delete
+def test_delete_and_update_where(small_db, engine):
+    ''' the rows matching a query are changed a batch at a time '''
+    if engine != 'sqlite':
+        pytest.skip('queries are SQLite only')
+    small_db.enable_rollups()
+    small_db.add_many({'item_num': i, 'amount': i, 'category': 'import',
+                       'date': '01-0%d-2020' % (i % 9 + 1), 'description': 'bad'}
+                      for i in range(25))
+    bad = small_db.query().category('import')
+    assert small_db.update_where(bad.amount(20), {'category': 'big'}, dry_run=True) == 5
+    assert small_db.query().category('big').count() == 0
+    assert small_db.update_where(bad.amount(20), {'category': 'big', 'date': '02-02-2020'},
+                                 batch_size=2) == 5
+    assert [row['item_num'] for row in small_db.query().category('big')] == [20, 21, 22, 23, 24]
+    assert small_db.summarize_by_date('02-02-2020')[0]['category'] == 'big'
+    assert small_db.delete_where(bad, dry_run=True) == 20
+    assert small_db.delete_where(bad, batch_size=7) == 20
+    assert small_db.delete_where(bad) == 0
+    assert small_db.check_rollups() == []
+    assert small_db.totals_by_category() == [('big', 5, 110.0, 22.0, 20.0, 24.0),
+                                             ('parking', 2, 14.0, 7.0, 1.0, 13.0)]
+    with pytest.raises(ValueError):
+        small_db.delete_where(bad.limit(10))
+
+
+@pytest.mark.delete
+def test_delete_category(small_db, dbfile, engine):
+    ''' the transactions of a deleted category have none, even once a new
+        category is given its id '''
+    if engine == 'sqlite':
+        small_db.enable_rollups()
+    small_db.add({'item_num': 3, 'amount': 5, 'category': 'food', 'date': '01-01-2020',
+                  'description': 'lunch'})
+    cats = open_category(dbfile, engine)
+    food = cats.select_all()[-1]['rowid']
+    cats.delete(food)
+    assert cats.add({'name': 'rent', 'desc': 'monthly'}) == food
+    assert [row['category'] for row in small_db.select_all()] == ['parking', 'parking', None]
+    assert small_db.summarize_by_category('rent') == []
+    assert [total[:3] for total in small_db.totals_by_category()] == [
+        (None, 1, 5.0), ('parking', 2, 14.0)]
+    cats.delete_many([cats.select_all()[0]['rowid']])
+    assert [row['category'] for row in small_db.select_all()] == [None, None, None]
+    if engine == 'sqlite':
+        assert small_db.check_rollups() == []
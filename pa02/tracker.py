@@ -28,16 +28,65 @@ In place of SQL queries, we will have method calls.
 This app will store the data in a SQLite database ~/tracker.db
 
 Note the actual implementation of the ORM is hidden and so it
-could be replaced with PostgreSQL or Pandas or straight python lists
+could be replaced with PostgreSQL or Pandas or straight python lists,
+as the in-memory engine of memory.py is, see engines.py
 
-'''
+Without arguments, or with "interactive", tracker.py shows the menu.
+Scripts can use the subcommands instead, and run-script runs a whole
+file of them in one process and one database transaction:
+
+    python tracker.py add --amount 12.50 --category food --date 03-01-2022
+    python tracker.py summarize --month 03 --year 2022
+    python tracker.py run-script march.txt
+    python tracker.py stats --slow-ms 5 summarize --year 2022
+    python tracker.py query --category dining --start 01-01-2022 --min 50
 
-#from transactions import Transaction
-from category import Category
-from transaction import Transaction
+'''
 
-transaction = Transaction('tracker.db')
-category = Category('tracker.db')
+import argparse
+import shlex
+import sys
+
+DBFILE = 'tracker.db'
+PAGE_SIZE = 20
+
+
+class Database():
+    ''' Database opens the Transaction and Category ORMs of dbfile the first
+        time they are used, so commands that never touch the database, and
+        --help, do not pay for importing and opening them '''
+
+    def __init__(self, dbfile=DBFILE):
+        self.dbfile = dbfile
+        self._transaction = None
+        self._category = None
+        self.profiler = None
+
+    @property
+    def transaction(self):
+        ''' the Transaction ORM '''
+        if self._transaction is None:
+            from transaction import Transaction  # pylint: disable=import-outside-toplevel
+            # write-ahead logging lets several trackers share tracker.db
+            self._transaction = Transaction(self.dbfile, profile='durable')
+            if self.profiler is not None:
+                self._transaction.enable_profiling(self.profiler)
+        return self._transaction
+
+    @property
+    def category(self):
+        ''' the Category ORM, sharing the connections of the Transaction '''
+        if self._category is None:
+            from category import Category  # pylint: disable=import-outside-toplevel
+            self._category = Category(self.dbfile, pool=self.transaction.pool)
+            if self.profiler is not None:
+                self._category.enable_profiling(self.profiler)
+        return self._category
+
+    def close(self):
+        ''' close the database if it was opened '''
+        if self._transaction is not None:
+            self._transaction.close()
 
 
 # here is the menu for the tracker app
@@ -55,25 +104,33 @@ menu = '''
 9. summarize transactions by year (YYYY)
 10. summarize transactions by category
 11. print this menu
+12. totals by month for a year (YYYY)
+13. totals by category between two dates (MM-DD-YYYY)
+14. daily totals between two dates (MM-DD-YYYY)
+15. import bank statements (CSV, OFX, QIF)
+16. export transactions (CSV, JSON Lines, Parquet, Arrow, binary)
+17. search descriptions (words, "phrases", prefix*)
+18. show query statistics (start with "tracker.py stats")
+19. advanced filter (dates, categories, amounts)
 '''
 
 
 
 
-def process_choice(choice):
+def process_choice(db, choice):
 
     if choice=='0':
         return
 
     elif choice=='1':
-        cats = category.select_all()
+        cats = db.category.select_all()
         print_categories(cats)
 
     elif choice=='2':
         name = input("category name: ")
         desc = input("category description: ")
         cat = {'name':name, 'desc':desc}
-        category.add(cat)
+        db.category.add(cat)
 
     elif choice=='3':
         print("modifying category")
@@ -81,51 +138,129 @@ def process_choice(choice):
         name = input("new category name: ")
         desc = input("new category description: ")
         cat = {'name':name, 'desc':desc}
-        category.update(rowid,cat)
+        db.category.update(rowid,cat)
 
     elif choice == '4':
         print("show transactions")
-        trans = transaction.select_all()
-        print_transactions(trans)
+        from transaction import page_keys  # pylint: disable=import-outside-toplevel
+        order = input("order by rowid, date or amount (blank for rowid): ") or 'rowid'
+        # the page after the sort keys of the last row, even if it is deleted meanwhile
+        try:
+            print_pages(lambda last: db.transaction.select_page(
+                PAGE_SIZE, order=order,
+                after_keys=None if last is None else page_keys(last, order)))
+        except ValueError as error:
+            print(error)
 
     elif choice == '5':
         print('add transaction')
         item_num = int(input("transaction item no: "))
         amount = int(input("amount: "))
-        category = input("category name: ")
+        cat_name = input("category name: ")
         date = input("date: ")
         description = input("category description: ")
-        trans = {'item_num':item_num,'amount':amount, 'category': category,
+        trans = {'item_num':item_num,'amount':amount, 'category': cat_name,
         'date': date, 'description': description}
-        transaction.add(trans)
+        db.transaction.add(trans)
 
     elif choice == '6':
         print('delete transactions')
         row_id = int(input("rowid: "))
-        transaction.delete(row_id)
+        db.transaction.delete(row_id)
 
     elif choice == '7':
         print("summarize transactions by date")
         date = input("Enter a date in MM-DD-YYYY:")
-        items = transaction.summarize_by_date(date)
-        print_transactions(items)
+        print_transactions(db.transaction.iter_by_date(date))
     elif choice == '8':
         print('summarize transactions by month (MM)')
         month = input("Enter a month in MM: ")
-        items = transaction.summarize_by_month(month)
-        print_transactions(items)
+        print_transactions(db.transaction.iter_by_month(month))
     elif choice == '9':
         print('summarize transactions by year in YYYY')
         year = input("Enter a year in YYYY: ")
-        items = transaction.summarize_by_year(year)
-        print_transactions(items)
+        print_transactions(db.transaction.iter_by_year(year))
     elif choice == '10':
         print('summarize transactions by category')
-        category = input("Enter a category: ")
-        items = transaction.summarize_by_category(category)
-        print_transactions(items)
+        cat_name = input("Enter a category: ")
+        print_transactions(db.transaction.iter_by_category(cat_name))
     elif choice == '11':
         print(menu)
+    elif choice == '12':
+        print('totals by month')
+        year = input("Enter a year in YYYY: ")
+        print_totals('month', db.transaction.totals_by_month(year))
+    elif choice == '13':
+        print('totals by category')
+        start = input("Enter a start date in MM-DD-YYYY (blank for all): ") or None
+        end = input("Enter an end date in MM-DD-YYYY (blank for all): ") or None
+        try:
+            print_totals('category', db.transaction.totals_by_category(start, end))
+        except ValueError as error:
+            print(error)
+    elif choice == '14':
+        print('daily totals')
+        start = input("Enter a start date in MM-DD-YYYY (blank for all): ") or None
+        end = input("Enter an end date in MM-DD-YYYY (blank for all): ") or None
+        try:
+            print_totals('date', db.transaction.daily_totals(start, end))
+        except ValueError as error:
+            print(error)
+    elif choice == '15':
+        print('import bank statements')
+        paths = input("statement files, directories or zip archives: ").split()
+        import importer  # pylint: disable=import-outside-toplevel
+        totals = importer.import_statements(db.transaction, paths,
+                                            progress=importer.print_progress)
+        print()
+        importer.print_skipped(totals, sys.stdout)
+        print('imported %d transactions, rejected %d'%(totals['imported'],totals['rejected']))
+    elif choice == '16':
+        print('export transactions')
+        path = input("file to write (the suffix picks the format, e.g. 2022.csv.gz): ")
+        start = input("Enter a start date in MM-DD-YYYY (blank for all): ") or None
+        end = input("Enter an end date in MM-DD-YYYY (blank for all): ") or None
+        import exporter  # pylint: disable=import-outside-toplevel
+        try:
+            path, fmt, compression = exporter.choose_format(path)
+            count = db.transaction.export(path, fmt, start, end, compression=compression)
+        except (ImportError, ValueError) as error:
+            print(error)
+        else:
+            print('exported %d transactions to %s'%(count,path))
+    elif choice == '17':
+        print('search descriptions')
+        query = input("Enter words, a \"phrase\" or a prefix*: ")
+        # the first search indexes the descriptions, triggers keep them indexed after that
+        db.transaction.enable_search()
+        try:
+            print_transactions(db.transaction.search(query, PAGE_SIZE))
+        except ValueError as error:
+            print(error)
+    elif choice == '18':
+        if db.profiler is None:
+            print('profiling is off, run "tracker.py stats" to turn it on')
+        else:
+            print(db.profiler.report())
+    elif choice == '19':
+        print('advanced filter')
+        start = input("Enter a start date in MM-DD-YYYY (blank for all): ") or None
+        end = input("Enter an end date in MM-DD-YYYY (blank for all): ") or None
+        names = input("Enter categories separated by commas (blank for all): ")
+        minimum = input("Enter the smallest amount (blank for any): ")
+        maximum = input("Enter the largest amount (blank for any): ")
+        order = input("order by rowid, date or amount (blank for rowid): ") or 'rowid'
+        try:
+            query = build_query(db.transaction, start, end,
+                                [name.strip() for name in names.split(',') if name.strip()],
+                                float(minimum) if minimum else None,
+                                float(maximum) if maximum else None, order)
+        except ValueError as error:
+            print(error)
+        else:
+            print_transactions(query.iter())
+            count, total = query.totals()[:2]
+            print('%d transactions, total %.2f'%(count, total or 0))
 
     else:
         print("choice",choice,"not yet implemented")
@@ -134,14 +269,14 @@ def process_choice(choice):
     return(choice)
 
 
-def toplevel():
+def toplevel(db):
     ''' handle the user's choice '''
 
     ''' read the command args and process them'''
     print(menu)
     choice = input("> ")
     while choice !='0' :
-        choice = process_choice(choice)
+        choice = process_choice(db, choice)
     print('bye')
 
 #
@@ -149,28 +284,372 @@ def toplevel():
 #
 
 def print_transactions(items):
-    ''' print the transactions '''
-    if len(items)==0:
-        print('no items to print')
-        return
-    print('\n')
-    print("%-3s %-10s %-10s %-10s %-10s %-30s"%(
-        'id', 'item #','amount','category','date','description'))
-    print('-'*60)
-    for item in items:
-        values = tuple(item.values())
-        print("%-3s %-10d %-10d %-10s %-10s %-30s"%values)
-
-def print_category(cat):
-    print("%-3d %-10s %-30s"%(cat['rowid'],cat['name'],cat['desc']))
+    ''' print the transactions as they arrive from a list or iterator,
+        a batch at a time, see render.py '''
+    import render  # pylint: disable=import-outside-toplevel
+    render.default.print_table(render.TRANSACTIONS, items, 'transactions', before='\n\n')
+
+def print_pages(fetch):
+    ''' print transactions a page at a time, fetch(last) returns the page
+        after the row last, the last row of the page before, or None '''
+    last = None
+    while True:
+        page = fetch(last)
+        if not page and last is not None:
+            break
+        print_transactions(page)
+        if len(page) < PAGE_SIZE or input("Enter for more, q to stop: ").strip() == 'q':
+            break
+        last = page[-1]
+
+def print_totals(key, totals):
+    ''' print (key, count, sum, avg, min, max) tuples '''
+    import render  # pylint: disable=import-outside-toplevel
+    render.default.print_table(render.totals_columns(key), totals, 'totals')
+
+def build_query(trans, start=None, end=None, categories=None, minimum=None, maximum=None,
+                order='rowid', descending=False):
+    ''' return a query.Query of the transactions with the filters that are
+        given, raising ValueError for a bad date or order '''
+    query = trans.query().between(start, end).amount(minimum, maximum)
+    if categories:
+        query = query.category(in_=categories)
+    return query.order_by(order, descending)
 
 def print_categories(cats):
-    print("%-3s %-10s %-30s"%("id","name","description"))
-    print('-'*45)
-    for cat in cats:
-        print_category(cat)
+    ''' print the categories, see render.py '''
+    import render  # pylint: disable=import-outside-toplevel
+    render.default.print_table(render.CATEGORIES, cats, 'categories')
+
+
+#
+# here are the commands for scripting the tracker
+#
+
+def add_command(db, args):
+    ''' handle "tracker.py add", printing the rowid of the new transaction '''
+    print(db.transaction.add({'item_num':args.item_num, 'amount':args.amount,
+                              'category':args.category, 'date':args.date,
+                              'description':args.description}))
+    return 0
+
+def add_category_command(db, args):
+    ''' handle "tracker.py add-category" '''
+    db.category.add({'name':args.name, 'desc':args.desc})
+    return 0
+
+def delete_command(db, args):
+    ''' handle "tracker.py delete" '''
+    db.transaction.delete(args.rowid)
+    return 0
+
+def categories_command(db, _):
+    ''' handle "tracker.py categories" '''
+    print_categories(db.category.select_all())
+    return 0
+
+def summarize_command(db, args):
+    ''' handle "tracker.py summarize", the filters can be combined '''
+    trans = db.transaction
+    cat_name = args.category
+    try:
+        if args.date:
+            items = trans.iter_by_date(args.date)
+        elif args.month and not args.year:
+            items = trans.iter_by_month(args.month)
+        elif args.year or args.start or args.end:
+            start, end = args.start, args.end
+            if args.year:
+                start = '%s-01-%s'%(args.month or '01', args.year)
+                end = '%s-31-%s'%(args.month or '12', args.year)
+            items, cat_name = trans.iter_between(start, end, args.category), None
+        elif args.category:
+            items, cat_name = trans.iter_by_category(args.category), None
+        else:
+            items = trans.iter_all()
+        if cat_name is not None:
+            items = (item for item in items if item['category'] == cat_name)
+        print_transactions(items)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    return 0
+
+def list_command(db, args):
+    ''' handle "tracker.py list", printing one page of transactions and, on
+        stderr, the --after option for the next page '''
+    try:
+        page = db.transaction.select_page(args.limit, args.after, args.order, args.desc,
+                                          args.start, args.end, args.category)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    print_transactions(page)
+    if len(page) == args.limit:
+        print('next page: --after %d'%page[-1]['rowid'], file=sys.stderr)
+    return 0
+
+def query_command(db, args):
+    ''' handle "tracker.py query", printing the matching transactions or
+        with --totals their totals '''
+    try:
+        query = build_query(db.transaction, args.start, args.end, args.category, args.min,
+                            args.max, args.order, args.desc).limit(args.limit)
+        if args.totals:
+            print_totals(args.totals, query.totals(args.totals))
+        else:
+            print_transactions(query.iter())
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    return 0
+
+def search_command(db, args):
+    ''' handle "tracker.py search", indexing the descriptions the first time '''
+    db.transaction.enable_search()
+    try:
+        print_transactions(db.transaction.search(args.query, args.limit,
+                                                 'newest' if args.newest else 'rank'))
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    return 0
+
+def search_index_command(db, args):
+    ''' handle "tracker.py search-index" '''
+    {'enable': db.transaction.enable_search, 'disable': db.transaction.disable_search,
+     'rebuild': db.transaction.rebuild_search}[args.action]()
+    return 0
+
+def rollups_command(db, args):
+    ''' handle "tracker.py rollups", check exits with 1 if the rollups are wrong '''
+    trans = db.transaction
+    if args.action == 'check':
+        try:
+            errors = trans.check_rollups()
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            return 2
+        for year, month, cat_name, have, want in errors:
+            print('%s-%s %s: rollup has %s, transactions have %s'%(
+                year, month, cat_name, have, want))
+        print('%d rollup rows are wrong'%len(errors))
+        return 1 if errors else 0
+    {'enable': trans.enable_rollups, 'disable': trans.disable_rollups,
+     'rebuild': trans.rebuild_rollups}[args.action]()
+    return 0
+
+def stats_command(db, args):
+    ''' handle "tracker.py stats COMMAND", running COMMAND, the menu by
+        default, with the ORMs profiled and printing the statistics on
+        stderr when it is done '''
+    import profiling  # pylint: disable=import-outside-toplevel
+    command = parse_command(make_parser(), args.words or ['interactive'])
+    db.profiler = profiling.Profiler(slow_ms=args.slow_ms, explain=not args.no_explain)
+    try:
+        return command.func(db, command)
+    finally:
+        print(db.profiler.report(), file=sys.stderr)
+        if args.prometheus:
+            with open(args.prometheus, 'w', encoding='utf-8') as metrics:
+                metrics.write(db.profiler.prometheus())
+
+def interactive_command(db, _):
+    ''' handle "tracker.py interactive", the menu driven tracker '''
+    toplevel(db)
+    return 0
+
+def import_command(db, args):
+    ''' handle "tracker.py import ..." '''
+    import importer  # pylint: disable=import-outside-toplevel
+    parser = argparse.ArgumentParser(prog='tracker.py import',
+                                     description='import bank statements into tracker.db')
+    importer.add_arguments(parser)
+    return importer.run(db.transaction, parser.parse_args(args.options))
+
+def export_command(db, args):
+    ''' handle "tracker.py export ..." '''
+    import exporter  # pylint: disable=import-outside-toplevel
+    parser = argparse.ArgumentParser(prog='tracker.py export',
+                                     description='export the transactions in tracker.db')
+    exporter.add_arguments(parser)
+    return exporter.run(db.transaction, parser.parse_args(args.options))
+
+def read_script(parser, lines, name):
+    ''' return (line number, parsed arguments) for each command in a script,
+        raising ValueError for a line that is not a command '''
+    commands = []
+    for number, line in enumerate(lines, 1):
+        words = shlex.split(line, comments=True)
+        if not words:
+            continue
+        if words[0] in ('interactive', 'run-script'):
+            raise ValueError('%s line %d: %s cannot be used in a script'%(name,number,words[0]))
+        try:
+            commands.append((number, parse_command(parser, words)))
+        except SystemExit as error:
+            raise ValueError('%s line %d: %s'%(name,number,line.strip())) from error
+    return commands
+
+def run_script_command(db, args):
+    ''' handle "tracker.py run-script FILE", running every command in FILE
+        (- for stdin) in one database transaction.  the whole script is
+        parsed first, and if any command fails nothing is changed '''
+    parser = make_parser()
+    try:
+        if args.file == '-':
+            commands = read_script(parser, sys.stdin, 'stdin')
+        else:
+            with open(args.file, encoding='utf-8') as lines:
+                commands = read_script(parser, lines, args.file)
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 2
+    number = 0
+    try:
+        with db.transaction.pool.connection():
+            for number, command in commands:
+                status = command.func(db, command)
+                if status:
+                    raise RuntimeError('exit status %d'%status)
+    except Exception as error:  # pylint: disable=broad-except
+        print('%s line %d: %s, nothing was changed'%(args.file,number,error), file=sys.stderr)
+        return 1
+    return 0
+
+def make_parser():
+    ''' return the argparse parser for the tracker command line '''
+    parser = argparse.ArgumentParser(prog='tracker.py',
+                                     description='keep track of personal transactions')
+    parser.add_argument('--db', default=DBFILE, help='the database file, %(default)s')
+    parser.add_argument('--no-render', action='store_true',
+                        help='print how many rows each command found instead of the rows')
+    parser.set_defaults(func=interactive_command)
+    commands = parser.add_subparsers(dest='command')
+
+    command = commands.add_parser('interactive', help='the menu driven tracker, the default')
+    command.set_defaults(func=interactive_command)
+
+    command = commands.add_parser('add', help='add a transaction')
+    command.add_argument('--amount', type=float, required=True)
+    command.add_argument('--category', required=True)
+    command.add_argument('--date', required=True, help='MM-DD-YYYY')
+    command.add_argument('--description', default='')
+    command.add_argument('--item-num', type=int, default=0)
+    command.set_defaults(func=add_command)
+
+    command = commands.add_parser('add-category', help='add a category')
+    command.add_argument('name')
+    command.add_argument('desc', nargs='?', default='')
+    command.set_defaults(func=add_category_command)
+
+    command = commands.add_parser('delete', help='delete a transaction')
+    command.add_argument('rowid', type=int)
+    command.set_defaults(func=delete_command)
+
+    command = commands.add_parser('categories', help='show the categories')
+    command.set_defaults(func=categories_command)
+
+    command = commands.add_parser('summarize', help='show transactions, optionally filtered')
+    command.add_argument('--date', help='MM-DD-YYYY')
+    command.add_argument('--month', help='MM, of any year unless --year is given')
+    command.add_argument('--year', help='YYYY')
+    command.add_argument('--start', help='first date, MM-DD-YYYY')
+    command.add_argument('--end', help='last date, MM-DD-YYYY')
+    command.add_argument('--category')
+    command.set_defaults(func=summarize_command)
+
+    command = commands.add_parser('list', help='show a page of transactions')
+    command.add_argument('--limit', type=int, default=PAGE_SIZE)
+    command.add_argument('--after', type=int, help='the last rowid of the previous page')
+    command.add_argument('--order', choices=['rowid', 'date', 'amount'], default='rowid')
+    command.add_argument('--desc', action='store_true', help='largest or latest first')
+    command.add_argument('--start', help='first date, MM-DD-YYYY')
+    command.add_argument('--end', help='last date, MM-DD-YYYY')
+    command.add_argument('--category')
+    command.set_defaults(func=list_command)
+
+    command = commands.add_parser('query', help='show the transactions matching every filter')
+    command.add_argument('--start', help='first date, MM-DD-YYYY')
+    command.add_argument('--end', help='last date, MM-DD-YYYY')
+    command.add_argument('--category', action='append',
+                         help='a category, give it more than once for any of several')
+    command.add_argument('--min', type=float, help='the smallest amount')
+    command.add_argument('--max', type=float, help='the largest amount')
+    command.add_argument('--order', choices=['rowid', 'date', 'amount'], default='rowid')
+    command.add_argument('--desc', action='store_true', help='largest or latest first')
+    command.add_argument('--limit', type=int, help='show at most this many')
+    command.add_argument('--totals', choices=['category', 'year', 'month', 'date'],
+                         help='show the totals of each group instead of the transactions')
+    command.set_defaults(func=query_command)
+
+    command = commands.add_parser('search', help='search the transaction descriptions')
+    command.add_argument('query', help='words, "a phrase", a prefix* or OR, NOT and ()')
+    command.add_argument('--limit', type=int, default=PAGE_SIZE)
+    command.add_argument('--newest', action='store_true',
+                         help='latest first instead of best match first, much faster for '
+                              'words in many descriptions')
+    command.set_defaults(func=search_command)
+
+    command = commands.add_parser('search-index', help='manage the full-text search index')
+    command.add_argument('action', choices=['enable', 'disable', 'rebuild'])
+    command.set_defaults(func=search_index_command)
+
+    command = commands.add_parser('rollups', help='manage the per month and category rollups')
+    command.add_argument('action', choices=['enable', 'disable', 'rebuild', 'check'])
+    command.set_defaults(func=rollups_command)
+
+    command = commands.add_parser('run-script',
+                                  help='run a file of commands in one database transaction')
+    command.add_argument('file', help='one command per line, - for stdin')
+    command.set_defaults(func=run_script_command)
+
+    command = commands.add_parser('stats', help='run a command and show where its time went')
+    command.add_argument('--slow-ms', type=float, default=100,
+                         help='log statements slower than this, %(default)s')
+    command.add_argument('--no-explain', action='store_true',
+                         help='do not show the query plans')
+    command.add_argument('--prometheus', metavar='FILE',
+                         help='also write the counters in the Prometheus text format')
+    command.add_argument('words', nargs=argparse.REMAINDER, metavar='COMMAND',
+                         help='the command to run, interactive by default')
+    command.set_defaults(func=stats_command)
+
+    for name, func, text in (('import', import_command, 'import bank statements'),
+                             ('export', export_command, 'export the transactions')):
+        # the options are parsed by the importer and exporter, see parse_command
+        command = commands.add_parser(name, help=text+', see "tracker.py %s --help"'%name,
+                                      add_help=False)
+        command.set_defaults(func=func, options=[])
+    return parser
+
+def parse_command(parser, argv):
+    ''' parse a command line, leaving the options of import and export in
+        args.options for their own parsers '''
+    args, options = parser.parse_known_args(argv)
+    if options and args.func not in (import_command, export_command):
+        parser.error('unrecognized arguments: %s'%' '.join(options))
+    args.options = options
+    return args
+
+def main(argv=None):
+    ''' run the command on the command line, the menu if there is none '''
+    args = parse_command(make_parser(), argv)
+    renderer = None
+    if args.no_render:
+        import render  # pylint: disable=import-outside-toplevel
+        renderer = render.default
+        renderer.count_only = True
+    db = Database(args.db)
+    try:
+        return args.func(db, args)
+    finally:
+        db.close()
+        if renderer is not None:
+            renderer.count_only = False
 
 
 # here is the main call!
 
-toplevel()
+if __name__ == '__main__':
+    sys.exit(main())
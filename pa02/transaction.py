@@ -3,12 +3,195 @@ transaction.py is a Object Relational Mapping to the transactions table
 
 The ORM will work map SQL rows with the schema
     (rowid, item_num, amount, category, date, description)
-to Python Dictionaries.
+to Python Dictionaries, or to the more compact TransactionRecord rows
+when the Transaction is created with compact=True.
+
+Dates are entered as MM-DD-YYYY.  Each row also stores the date as
+YYYY-MM-DD in the iso_date column (or '' if the date could not be read)
+so that the date, month and year summaries are indexed lookups.
+
+The category is stored as category_id, the id of its row in the
+categories table that category.Category manages, and read back as its
+name, so rows still have a 'category'.  Adding a transaction with a
+category that does not exist yet creates it, and clears the cache of
+the Categories sharing the pool, see connection.py.  Renaming a category
+with Category.update renames it for every transaction without touching
+them.  Deleting a category leaves its transactions with no category, a
+trigger sets their category_id to NULL.  Tables made before category_id
+existed are migrated when they are opened.
+
+With rollups=True the per (year, month, category) counts and sums are
+kept in a rollup table by triggers, and the rollup_by_* methods read it
+instead of the transactions, see rollup.py.
+
+With search=True the descriptions are indexed for full-text search with
+SQLite FTS5, see fulltext.py and the search method.
+
+Under many concurrent writers, enable_group_commit() makes add() share
+commits with the other adds queued at the same time.
+
+update() changes some of the columns of a transaction.  delete_many,
+delete_where and update_where change many rows a batch at a time, each
+batch in a database transaction of its own, so a clean up of a bad
+import does not hold the write lock until it is done.
+
+For very large tables, sharding.ShardedTransaction has the methods that
+engines.py lists with the transactions of each year in a database file
+of their own.
 
 This app will store the data in a SQLite database ~/tracker.db
 
 '''
-import sqlite3
+import re
+from category import create_schema as create_category_schema
+from connection import change_many, change_where, get_pool, insert_many
+import fulltext
+from records import Record
+import rollup
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 500
+PAGE_SIZE = 20
+
+# the name of the category of a transaction, a primary key lookup
+CATEGORY = "(SELECT name FROM categories WHERE id=category_id)"
+
+COLUMNS = "rowid, item_num, amount, "+CATEGORY+" AS category, date, description"
+
+# the transactions in the category named by the parameter, found with the
+# categories_name and transactions_category indexes
+IN_CATEGORY = "category_id IN (SELECT id FROM categories WHERE name=?)"
+
+TOTALS = "count(*), sum(amount), avg(amount), min(amount), max(amount)"
+
+TABLE = '''CREATE TABLE IF NOT EXISTS transactions
+           (item_num real, amount real, category_id integer REFERENCES categories(id),
+            date text, description text, iso_date text NOT NULL DEFAULT '')'''
+
+# the parameters are those of to_trans_row, the category is given by name
+INSERT = '''INSERT INTO transactions
+            (item_num, amount, category_id, date, description, iso_date)
+            VALUES(?,?,(SELECT min(id) FROM categories WHERE name=?),?,?,?)'''
+
+# category ids are reused once the largest is deleted, so the transactions
+# of a deleted category lose it rather than pass to the next one added
+ORPHAN_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS categories_delete
+                    AFTER DELETE ON categories BEGIN
+                      UPDATE transactions SET category_id=NULL WHERE category_id=old.id;
+                    END'''
+
+ADD_CATEGORY = '''INSERT INTO categories(name, desc)
+                  SELECT ?, '' WHERE NOT EXISTS (SELECT 1 FROM categories WHERE name=?)'''
+
+# the columns that update can change, in the order of the SET clause
+UPDATABLE = ('item_num', 'amount', 'category', 'date', 'description')
+
+DELETE = "DELETE FROM transactions WHERE rowid=?"
+
+# the sort keys of each page order, each ends with rowid so that the keys
+# of a row are unique and a page can start right after the row before it
+ORDERS = {'rowid': ('rowid',),
+          'date': ('iso_date', 'amount', 'rowid'),
+          'amount': ('amount', 'rowid')}
+
+DATE_RE = re.compile(r'^\s*(\d{1,2})[-/](\d{1,2})[-/](\d{4})\s*$')
+
+def to_iso_date(date):
+    ''' convert a MM-DD-YYYY date to YYYY-MM-DD.
+        slashes and single digit months and days are accepted,
+        anything else gives the empty string '''
+    match = DATE_RE.match(str(date))
+    if match is None:
+        return ''
+    month, day, year = (int(part) for part in match.groups())
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return ''
+    return '%04d-%02d-%02d' % (year, month, day)
+
+def to_date_range(start, end):
+    ''' return a where clause and parameters limiting iso_date to the
+        MM-DD-YYYY dates start and end, inclusive.  either may be None '''
+    clauses, params = [], []
+    for date, clause in ((start, 'iso_date>=?'), (end, 'iso_date<=?')):
+        if date is None:
+            continue
+        iso_date = to_iso_date(date)
+        if not iso_date:
+            raise ValueError('%r is not a MM-DD-YYYY date' % (date,))
+        clauses.append(clause)
+        params.append(iso_date)
+    if not clauses:
+        return '', ()
+    return 'WHERE '+' AND '.join(clauses), tuple(params)
+
+def to_filter(start=None, end=None, category=None):
+    ''' return the where clause and parameters for the transactions between
+        the MM-DD-YYYY dates start and end and in a category, all optional '''
+    where, params = to_date_range(start, end)
+    if category is not None:
+        where = (where+' AND ' if where else 'WHERE ')+IN_CATEGORY
+        params += (category,)
+    return where, params
+
+def page_filter(where, params, order='rowid', after_rowid=None, descending=False,
+                after_keys=None):
+    ''' add a keyset condition to a where clause so that it selects the rows
+        after the row after_rowid in the order, and return the where clause
+        with its ORDER BY and the parameters.  after_keys, the sort keys of
+        a row that is in another table or has been deleted, can be given
+        instead of after_rowid '''
+    if order not in ORDERS:
+        raise ValueError('cannot order by %r, use one of %s' % (order, ', '.join(ORDERS)))
+    keys = ', '.join(ORDERS[order])
+    if after_keys is None and after_rowid is not None and order == 'rowid':
+        # compared directly, a deleted cursor row has no keys to look up
+        after_keys = (after_rowid,)
+    if after_rowid is not None or after_keys is not None:
+        # the sort keys of the cursor row are looked up, so the page is found
+        # with one index seek however deep it is, unlike OFFSET
+        if after_keys is None:
+            cursor = '(SELECT %s FROM transactions WHERE rowid=?)' % keys
+            params += (after_rowid,)
+        else:
+            cursor = '(%s)' % ', '.join('?'*len(after_keys))
+            params += tuple(after_keys)
+        keyset = '(%s) %s %s' % (keys, '<' if descending else '>', cursor)
+        where = (where+' AND ' if where else 'WHERE ')+keyset
+    direction = ' DESC' if descending else ''
+    return where+' ORDER BY '+', '.join(key+direction for key in ORDERS[order]), params
+
+def page_keys(row, order='rowid'):
+    ''' return the sort keys of a transaction row in a page order, the
+        after_keys of select_page for the page after the row '''
+    if order not in ORDERS:
+        raise ValueError('cannot order by %r, use one of %s' % (order, ', '.join(ORDERS)))
+    keys = {'rowid': row['rowid'], 'iso_date': to_iso_date(row['date']), 'amount': row['amount']}
+    return tuple(keys[key] for key in ORDERS[order])
+
+def date_filter(date):
+    ''' return the where clause and parameters for the transactions on a
+        MM-DD-YYYY date, a partial date falls back to a substring match '''
+    iso_date = to_iso_date(date)
+    if not iso_date:
+        return "WHERE date LIKE ?", ('%'+date+'%',)
+    return "WHERE iso_date=? ORDER BY rowid", (iso_date,)
+
+def month_filter(month):
+    ''' return the where clause and parameters for the transactions in a
+        month of any year '''
+    if not month.isdigit():
+        return "WHERE 0", ()
+    return "WHERE substr(iso_date, 6, 2)=? ORDER BY rowid", ('%02d' % int(month),)
+
+def year_filter(year):
+    ''' return the where clause and parameters for the transactions in a year '''
+    if not year.isdigit():
+        return "WHERE 0", ()
+    return "WHERE iso_date BETWEEN ? AND ? ORDER BY rowid", (year+'-01-01', year+'-12-31')
+
+def category_filter(category):
+    ''' return the where clause and parameters for the transactions in a category '''
+    return "WHERE "+IN_CATEGORY+" ORDER BY rowid", (category,)
 
 def to_trans_dict(trans_tuple):
     '''to_trans_dict is a transaction tuple
@@ -27,86 +210,455 @@ def to_trans_dict_list(trans_tuples):
     ''' convert a list of transaction tuples into a list of dictionaries'''
     return [to_trans_dict(trans) for trans in trans_tuples]
 
+class TransactionRecord(Record):
+    ''' a compact transaction row that can be read like the dict from to_trans_dict '''
+    __slots__ = ()
+    fields = ('rowid', 'item_num', 'amount', 'category', 'date', 'description')
+
+def add_categories(con, rows):
+    ''' create the categories named in a list of to_trans_row parameters
+        that do not exist yet and return the number created '''
+    names = {row[2] for row in rows if row[2] is not None}
+    if not names:
+        return 0
+    return con.executemany(ADD_CATEGORY, [(name, name) for name in names]).rowcount
+
+def to_trans_row(transaction):
+    ''' convert a transaction dict into the parameters for INSERT '''
+    return (transaction['item_num'], transaction['amount'], transaction['category'],
+            transaction['date'], transaction['description'],
+            to_iso_date(transaction['date']))
+
+def to_changes(changes):
+    ''' return the SET clause and parameters for a dict of new values of
+        some of the columns of to_trans_dict.  a new date also sets the
+        iso_date, a new category is given by name '''
+    unknown = set(changes) - set(UPDATABLE)
+    if unknown or not changes:
+        raise ValueError('cannot update %s, give some of %s' % (
+            ', '.join(sorted(unknown)) or 'nothing', ', '.join(UPDATABLE)))
+    sets, params = [], []
+    for column in UPDATABLE:
+        if column not in changes:
+            continue
+        if column == 'category':
+            sets.append("category_id=(SELECT min(id) FROM categories WHERE name=?)")
+        else:
+            sets.append(column+'=?')
+        params.append(changes[column])
+        if column == 'date':
+            sets.append('iso_date=?')
+            params.append(to_iso_date(changes['date']))
+    return 'SET '+', '.join(sets), tuple(params)
+
+def bulk_filter(query):
+    ''' return the where clause and parameters of a query.Query to delete
+        or update, which cannot have a limit since the rows are changed
+        in rowid order '''
+    if query.max_rows is not None:
+        raise ValueError('a query with a limit cannot be used to change transactions')
+    return query.where()
+
 class Transaction():
     ''' Transaction represents a table of transaction'''
-    def __init__(self, dbfile):
-        con = sqlite3.connect(dbfile)
-        cur = con.cursor()
-        cur.execute('''CREATE TABLE IF NOT EXISTS transactions
-                    (item_num real, amount real, category text, date text, description text)''')
-        con.commit()
-        con.close()
+    def __init__(self, dbfile, pool=None, compact=False, profile=None, rollups=False,
+                 search=False):
         self.dbfile = dbfile
+        self.to_row = TransactionRecord if compact else to_trans_dict
+        self.pool = pool if pool is not None else get_pool(dbfile, profile=profile)
+        self.owns_pool = pool is None
+        self.writer = None
+        self.profiler = None
+        with self.pool.connection() as con:
+            create_schema(con)
+            if rollups:
+                rollup.enable(con)
+            if search:
+                fulltext.enable(con)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        ''' close the connections to the database file, unless the pool was
+            passed in or is still used by another ORM '''
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.owns_pool:
+            self.owns_pool = False
+            self.pool.release()
+
+    def enable_group_commit(self, max_rows=None, max_delay_ms=None):
+        ''' make add() queue its row for a background writer that commits
+            the queue once max_rows rows are waiting or max_delay_ms has
+            passed, see group_commit.py for the defaults
+        '''
+        # imported here, concurrent.futures would double the startup time of tracker.py
+        # pylint: disable=import-outside-toplevel
+        from group_commit import GroupCommitWriter, MAX_ROWS, MAX_DELAY_MS
+        if self.writer is None:
+            self.writer = GroupCommitWriter(
+                self, MAX_ROWS if max_rows is None else max_rows,
+                MAX_DELAY_MS if max_delay_ms is None else max_delay_ms)
+        return self.writer
+
+    def submit(self, transaction):
+        ''' add a transaction and return a concurrent.futures.Future for its
+            rowid.  with group commit the Future is resolved when the row
+            is committed, otherwise the row is added before returning
+        '''
+        to_trans_row(transaction)
+        if self.writer is not None and self.pool.held() is None:
+            return self.writer.submit(transaction)
+        from concurrent.futures import Future  # pylint: disable=import-outside-toplevel
+        future = Future()
+        future.set_result(self.add(transaction))
+        return future
+
+    def enable_profiling(self, profiler=None, **options):
+        ''' time the methods of this object with a profiling.Profiler,
+            a new one made with options if profiler is None, and return it '''
+        import profiling  # pylint: disable=import-outside-toplevel
+        if self.profiler is not None:
+            profiling.uninstrument(self)
+        return profiling.instrument(self, profiler or profiling.Profiler(**options))
+
+    def disable_profiling(self):
+        ''' stop timing the methods of this object '''
+        if self.profiler is not None:
+            import profiling  # pylint: disable=import-outside-toplevel
+            profiling.uninstrument(self)
+
+    def _select(self, where='', params=()):
+        ''' return the transactions matching the where clause as a list of rows '''
+        with self.pool.connection() as con:
+            cur = con.execute("SELECT "+COLUMNS+" FROM transactions "+where, params)
+            tuples = cur.fetchall()
+        return list(map(self.to_row, tuples))
+
+    def _iter(self, where, params, chunk_size):
+        ''' yield the transactions matching the where clause as dicts.
+            the rows are read with fetchmany on a private connection,
+            so only chunk_size rows are in memory at once
+        '''
+        with self.pool.connection(private=True) as con:
+            cur = con.execute("SELECT "+COLUMNS+" FROM transactions "+where, params)
+            while True:
+                tuples = cur.fetchmany(chunk_size)
+                if not tuples:
+                    break
+                yield from map(self.to_row, tuples)
 
     def select_all(self):
         ''' return all of the transactions as a list of dicts.'''
-        con = sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        cur.execute("SELECT rowid,* from transactions")
-        tuples = cur.fetchall()
-        con.commit()
-        con.close()
-        return to_trans_dict_list(tuples)
+        return self._select()
+
+    def select_page(self, limit=PAGE_SIZE, after_rowid=None, order='rowid', descending=False,
+                    start=None, end=None, category=None, after_keys=None):
+        ''' return up to limit transactions in the order 'rowid', 'date' or
+            'amount', starting after the transaction after_rowid, which is
+            the rowid of the last row of the previous page.  start, end and
+            category filter the rows like iter_between.
+            after_keys, the page_keys of the last row, can be given instead
+            of after_rowid, and finds the next page even if that row has
+            been deleted since, as after_rowid does only in rowid order.
+            rows with a NULL amount are only paged in rowid order
+        '''
+        where, params = page_filter(*to_filter(start, end, category), order, after_rowid,
+                                    descending, after_keys)
+        return self._select(where+' LIMIT ?', params+(limit,))
 
     def add(self, transaction):
         ''' add a transaction to the transactions table.'''
-        con = sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        cur.execute("INSERT INTO transactions VALUES(?,?,?,?,?)",
-                    (transaction['item_num'], transaction['amount'], transaction['category'],
-                        transaction['date'], transaction['description']))
-        con.commit()
-        cur.execute('SELECT last_insert_rowid()')
-        last_rowid = cur.fetchone()
-        con.commit()
-        con.close()
-        return last_rowid[0]
+        # inside an open transaction the row has to join it, not wait for the writer
+        if self.writer is not None and self.pool.held() is None:
+            to_trans_row(transaction)
+            return self.writer.submit(transaction).result()
+        row = to_trans_row(transaction)
+        with self.pool.connection() as con:
+            created = add_categories(con, [row])
+            cur = con.execute(INSERT, row)
+        if created:
+            self.pool.changed('categories')
+        return cur.lastrowid
+
+    def add_many(self, transactions, batch_size=BATCH_SIZE):
+        ''' add any iterable of transactions in one database transaction,
+            batch_size rows at a time.
+            this returns the (first, last) rowids added, or None if there
+            were no transactions
+        '''
+        rows = (to_trans_row(trans) for trans in transactions)
+        created = []
+        with self.pool.connection() as con:
+            rowids = insert_many(con, INSERT, rows, batch_size,
+                                 prepare=lambda con, batch: created.append(
+                                     add_categories(con, batch)))
+        if any(created):
+            self.pool.changed('categories')
+        return rowids
 
     def delete(self, rowid):
         ''' delete a transaction with a specified rowid '''
-        con = sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        cur.execute("DELETE FROM transactions WHERE rowid=(?)", (rowid,))
-        con.commit()
-        con.close()
+        with self.pool.connection() as con:
+            con.execute("DELETE FROM transactions WHERE rowid=(?)", (rowid,))
+
+    def update(self, rowid, changes):
+        ''' change some of the columns of a transaction, changes is a dict
+            with some of the keys of to_trans_dict other than the rowid '''
+        sets, params = to_changes(changes)
+        with self.pool.connection() as con:
+            created = add_categories(con, [(None, None, changes.get('category'))])
+            con.execute("UPDATE transactions "+sets+" WHERE rowid=?", params+(rowid,))
+        if created:
+            self.pool.changed('categories')
+
+    def delete_many(self, rowids, batch_size=BATCH_SIZE):
+        ''' delete the transactions with any iterable of rowids, batch_size
+            in each database transaction, and return the number deleted '''
+        return change_many(self.pool, DELETE, ((rowid,) for rowid in rowids), batch_size)
+
+    def delete_where(self, query, batch_size=BATCH_SIZE, dry_run=False):
+        ''' delete the transactions matching a query.Query, batch_size in
+            each database transaction, and return the number deleted.
+            with dry_run nothing is deleted and the number that would be is
+            counted, with the index of the filters when they have one '''
+        where, params = bulk_filter(query)
+        if dry_run:
+            return query.count()
+        return change_where(self.pool, 'transactions', where, params,
+                            lambda con, rowids: con.executemany(
+                                DELETE, [(rowid,) for rowid in rowids]).rowcount,
+                            batch_size)
+
+    def update_where(self, query, changes, batch_size=BATCH_SIZE, dry_run=False):
+        ''' change some of the columns, as in update, of the transactions
+            matching a query.Query, batch_size in each database transaction,
+            and return the number changed.  dry_run is as in delete_where '''
+        sets, set_params = to_changes(changes)
+        where, params = bulk_filter(query)
+        if dry_run:
+            return query.count()
+
+        created = []
+
+        def apply(con, rowids):
+            created.append(add_categories(con, [(None, None, changes.get('category'))]))
+            return con.executemany("UPDATE transactions "+sets+" WHERE rowid=?",
+                                   [set_params+(rowid,) for rowid in rowids]).rowcount
+
+        try:
+            return change_where(self.pool, 'transactions', where, params, apply, batch_size)
+        finally:
+            if any(created):
+                self.pool.changed('categories')
 
     def summarize_by_date(self, date):
         ''' return a list of transactions grouped by date '''
-        con = sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        #date format is MM-DD-YYYY
-        cur.execute("SELECT rowid,* FROM transactions WHERE date LIKE ?", ('%'+date+'%',))
-        tuples = cur.fetchall()
-        con.commit()
-        con.close()
-        return to_trans_dict_list(tuples)
+        return self._select(*date_filter(date))
 
     def summarize_by_month(self, month):
         '''return a list of transactions grouped by month from date'''
-        con = sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        cur.execute("SELECT rowid,* FROM transactions WHERE date LIKE ?", (month+'-%',))
-        tuples = cur.fetchall()
-        con.commit()
-        con.close()
-        return to_trans_dict_list(tuples)
+        return self._select(*month_filter(month))
 
     def summarize_by_year(self, year):
         '''return a list of transactions grouped by year from date'''
-        con = sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        cur.execute("SELECT rowid,* FROM transactions WHERE date LIKE ?", ('%-'+year,))
-        tuples = cur.fetchall()
-        con.commit()
-        con.close()
-        return to_trans_dict_list(tuples)
+        return self._select(*year_filter(year))
 
     def summarize_by_category(self, category):
         '''return a list of transactions grouped by category'''
-        con = sqlite3.connect(self.dbfile)
-        cur = con.cursor()
-        cur.execute("SELECT rowid,* FROM transactions WHERE category=(?)", (category,))
-        tuples = cur.fetchall()
-        con.commit()
-        con.close()
-        return to_trans_dict_list(tuples)
+        return self._select(*category_filter(category))
+
+    def iter_all(self, chunk_size=CHUNK_SIZE):
+        ''' yield all of the transactions as dicts, reading chunk_size rows at a time '''
+        return self._iter('', (), chunk_size)
+
+    def iter_by_date(self, date, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions on a date, like summarize_by_date '''
+        return self._iter(*date_filter(date), chunk_size)
+
+    def iter_by_month(self, month, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions in a month, like summarize_by_month '''
+        return self._iter(*month_filter(month), chunk_size)
+
+    def iter_by_year(self, year, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions in a year, like summarize_by_year '''
+        return self._iter(*year_filter(year), chunk_size)
+
+    def iter_by_category(self, category, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions in a category, like summarize_by_category '''
+        return self._iter(*category_filter(category), chunk_size)
+
+    def iter_between(self, start=None, end=None, category=None, chunk_size=CHUNK_SIZE):
+        ''' yield the transactions between the MM-DD-YYYY dates start and end
+            and in a category, each of them optional '''
+        where, params = to_filter(start, end, category)
+        return self._iter(where+' ORDER BY rowid', params, chunk_size)
+
+    def query(self):
+        ''' return a query.Query of all the transactions, to be narrowed with
+            its between, category, amount, order_by and limit methods '''
+        import query  # pylint: disable=import-outside-toplevel
+        return query.Query(self)
+
+    def to_columns(self, start=None, end=None, category=None):
+        ''' return the transactions as a dict of NumPy arrays, see analytics.to_columns '''
+        import analytics  # pylint: disable=import-outside-toplevel
+        return analytics.to_columns(self, start, end, category)
+
+    def export(self, path, fmt=None, start=None, end=None, category=None, compression=None):
+        ''' write the transactions to a csv, jsonl, parquet, arrow or binary
+            file and return the number written, see exporter.export '''
+        import exporter  # pylint: disable=import-outside-toplevel
+        return exporter.export(self, path, fmt, start, end, category, compression)
+
+    def _totals(self, key, where='', params=(), group_by='1', order_by=None):
+        ''' return (key, count, sum, avg, min, max) tuples for each group,
+            ordered by group_by unless order_by is given '''
+        with self.pool.connection() as con:
+            cur = con.execute("SELECT "+key+", "+TOTALS+" FROM transactions "+where+
+                              " GROUP BY "+group_by+" ORDER BY "+(order_by or group_by), params)
+            return cur.fetchall()
+
+    def totals_by_month(self, year):
+        '''return (month, count, sum, avg, min, max) for each month of a year'''
+        return self._totals("substr(iso_date, 6, 2)", "WHERE iso_date BETWEEN ? AND ?",
+                            (year+'-01-01', year+'-12-31'))
+
+    def totals_by_year(self):
+        '''return (year, count, sum, avg, min, max) for each year'''
+        return self._totals("substr(iso_date, 1, 4)", "WHERE iso_date>''")
+
+    def totals_by_category(self, start=None, end=None):
+        '''return (category, count, sum, avg, min, max) for each category,
+           optionally between the MM-DD-YYYY dates start and end'''
+        where, params = to_date_range(start, end)
+        # grouping by id reads the covering index, the names are looked up once per group
+        return self._totals(CATEGORY, where, params, group_by='category_id', order_by='1')
+
+    def daily_totals(self, start, end):
+        '''return (date, count, sum, avg, min, max) for each day between the
+           MM-DD-YYYY dates start and end'''
+        where, params = to_date_range(start, end)
+        where = (where+' AND ' if where else 'WHERE ')+"iso_date>''"
+        return self._totals("substr(iso_date, 6, 2)||'-'||substr(iso_date, 9, 2)||'-'||"
+                            "substr(iso_date, 1, 4)", where, params, group_by='iso_date')
+
+    def enable_rollups(self):
+        ''' create the rollup table and the triggers that maintain it '''
+        with self.pool.connection() as con:
+            rollup.enable(con)
+
+    def disable_rollups(self):
+        ''' drop the rollup table and its triggers '''
+        with self.pool.connection() as con:
+            rollup.disable(con)
+
+    def rebuild_rollups(self):
+        ''' recompute the rollup table from the transactions '''
+        with self.pool.connection() as con:
+            rollup.rebuild(con)
+
+    def check_rollups(self):
+        ''' return the rollup rows that disagree with the transactions, see rollup.check '''
+        with self.pool.connection() as con:
+            return rollup.check(con)
+
+    def rollup_by_month(self, year):
+        '''return (month, count, sum, avg) for each month of a year from the rollups'''
+        with self.pool.connection() as con:
+            return rollup.totals_by_month(con, year)
+
+    def rollup_by_year(self):
+        '''return (year, count, sum, avg) for each year from the rollups'''
+        with self.pool.connection() as con:
+            return rollup.totals_by_year(con)
+
+    def rollup_by_category(self, year=None):
+        '''return (category, count, sum, avg) for each category from the rollups,
+           optionally for one year'''
+        with self.pool.connection() as con:
+            return rollup.totals_by_category(con, year)
+
+    def enable_search(self):
+        ''' create the full-text index of the descriptions and its triggers '''
+        with self.pool.connection() as con:
+            fulltext.enable(con)
+
+    def disable_search(self):
+        ''' drop the full-text index and its triggers '''
+        with self.pool.connection() as con:
+            fulltext.disable(con)
+
+    def rebuild_search(self):
+        ''' index every description again '''
+        with self.pool.connection() as con:
+            fulltext.rebuild(con)
+
+    def search(self, query, limit=PAGE_SIZE, order='rank'):
+        ''' return up to limit transactions whose description matches the
+            FTS5 query, best match first or, with order='newest', latest
+            added first.  see fulltext.py for the syntax '''
+        with self.pool.connection() as con:
+            tuples = fulltext.search(con, COLUMNS, query, limit, order)
+        return list(map(self.to_row, tuples))
+
+def column_names(con, table):
+    ''' return the names of the columns in a table '''
+    return [row[1] for row in con.execute("PRAGMA table_info(%s)" % table)]
+
+def migrate_category_ids(con):
+    ''' replace the category text of a table made by an older version of
+        this module with category_id, creating the categories it names.
+        this returns the enable functions of the rollups and search index
+        to call once the indexes exist, their triggers go with the table '''
+    features = [feature for feature in (rollup, fulltext) if feature.is_enabled(con)]
+    for feature in features:
+        feature.disable(con)
+    con.execute('''INSERT INTO categories(name, desc)
+                   SELECT category, '' FROM transactions
+                   WHERE category IS NOT NULL AND category NOT IN (SELECT name FROM categories)
+                   GROUP BY category ORDER BY min(rowid)''')
+    con.execute("ALTER TABLE transactions RENAME TO transactions_old")
+    con.execute(TABLE)
+    # rowids are copied so that they stay the same
+    con.execute('''INSERT INTO transactions
+                   (rowid, item_num, amount, category_id, date, description, iso_date)
+                   SELECT rowid, item_num, amount,
+                          (SELECT min(id) FROM categories WHERE name=category),
+                          date, description, iso_date
+                   FROM transactions_old''')
+    con.execute("DROP TABLE transactions_old")
+    return [feature.enable for feature in features]
+
+def create_schema(con):
+    ''' create the transactions table and its indexes, migrating a table
+        made by an older version of this module '''
+    create_category_schema(con)
+    con.execute(TABLE)
+    columns = column_names(con, 'transactions')
+    if 'iso_date' not in columns:
+        con.execute("ALTER TABLE transactions ADD COLUMN iso_date text NOT NULL DEFAULT ''")
+        con.create_function('to_iso_date', 1, to_iso_date, deterministic=True)
+        con.execute("UPDATE transactions SET iso_date=to_iso_date(date)")
+    enables = migrate_category_ids(con) if 'category' in columns else []
+    con.execute('''CREATE INDEX IF NOT EXISTS transactions_iso_date
+                   ON transactions(iso_date, amount)''')
+    con.execute('''CREATE INDEX IF NOT EXISTS transactions_month
+                   ON transactions(substr(iso_date, 6, 2))''')
+    con.execute('''CREATE INDEX IF NOT EXISTS transactions_category
+                   ON transactions(category_id, amount)''')
+    con.execute('''CREATE INDEX IF NOT EXISTS transactions_amount
+                   ON transactions(amount)''')
+    if not con.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' "
+                       "AND name='categories_delete'").fetchone():
+        # categories deleted before the trigger existed left their ids behind
+        con.execute('''UPDATE transactions SET category_id=NULL
+                       WHERE category_id NOT IN (SELECT id FROM categories)''')
+        con.execute(ORPHAN_TRIGGER)
+    for enable in enables:
+        enable(con)